@@ -15,22 +15,55 @@
 """Convert COCO annotations to have contiguous class ids"""
 
 import os
-import json
+import sys
 import numpy as np
 from tqdm import tqdm
-from pycocotools.coco import COCO
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.coco_index import contiguous_category_table, load_coco_index, remap_category_ids  # noqa: E402
+from common.coco_index_cache import DEFAULT_MAX_CACHE_GB, load_coco_index_cached  # noqa: E402
+from common.coco_writer import dump_json_arrays  # noqa: E402
+from common.framed_io import DEFAULT_FRAME_RECORDS, compressed_path, strip_compression  # noqa: E402
 
-def convert_coco_to_contiguous(annotation_json_path, results_dir, use_all_categories=False, verbose=False):
+
+def iter_remapped_annotations(coco, labels, chunk_size=65536):
+    """Yield the annotation dicts grouped by image in file order, with category_id replaced by labels."""
+    num_rows = len(coco.image_ann_rows)
+    with tqdm(total=num_rows) as pbar:
+        for start in range(0, num_rows, chunk_size):
+            rows = np.asarray(coco.image_ann_rows[start:start + chunk_size])
+            for ann_row, label in zip(rows.tolist(), labels[rows].tolist()):
+                ann = coco.ann_record(ann_row)
+                ann['category_id'] = label
+                yield ann
+            pbar.update(len(rows))
+
+
+def convert_coco_to_contiguous(annotation_json_path, results_dir, use_all_categories=False, verbose=False,
+                               streaming=False, spill_dir=None, cache_dir=None, cache_max_gb=DEFAULT_MAX_CACHE_GB,
+                               compression=None, frame_records=DEFAULT_FRAME_RECORDS):
     """Function to convert COCO to COCO Contiguous.
 
     Args:
-        cfg (dataclas): Hydra Config.
+        annotation_json_path (str): Path to the COCO JSON file.
+        results_dir (str): Path to the results directory.
+        use_all_categories (bool): Whether to use all categories. Default is False.
         verbose (bool): verbosity. Default is False.
+        streaming (bool): Parse the annotation file incrementally to bound memory use. Default is False.
+        spill_dir (str): Directory for the temporary streaming index. Default is the system temp dir.
+        cache_dir (str): Reuse a binary index of the COCO JSON cached in this directory. Default is no cache.
+        cache_max_gb (float): Size limit of cache_dir in GiB.
+        compression (str): "gzip" or "zstd" to write *_remapped.json.gz or .zst. Default is plain JSON.
+        frame_records (int): Annotations per independently decompressible frame of compressed output.
     """
-    output_path = os.path.join(results_dir, os.path.basename(annotation_json_path).replace(".json", "_remapped.json"))
+    output_name = os.path.basename(strip_compression(annotation_json_path)).replace(".json", "_remapped.json")
+    output_path = compressed_path(os.path.join(results_dir, output_name), compression)
 
-    coco = COCO(annotation_json_path)
+    if cache_dir:
+        coco = load_coco_index_cached(annotation_json_path, cache_dir, cache_max_gb, keep_records=True,
+                                      streaming=streaming)
+    else:
+        coco = load_coco_index(annotation_json_path, keep_dataset=True, streaming=streaming, spill_dir=spill_dir)
     cats = coco.loadCats(coco.getCatIds())
     names = {cat['id']: cat['name'] for cat in cats}
 
@@ -38,49 +71,30 @@ def convert_coco_to_contiguous(annotation_json_path, results_dir, use_all_catego
         cat_ids = list(names.keys())
     else:
         # Get category ids that are actually present in the dataset.
-        cat_ids, cat_cnts = np.unique([a['category_id'] for a in coco.dataset['annotations']], return_counts=True)
+        cat_ids, cat_cnts = np.unique(coco.ann_category_ids, return_counts=True)
         for cat_id, cat_cnt in zip(cat_ids, cat_cnts):
             if verbose:
                 print(f"{names[cat_id]} ({cat_id}): {cat_cnt}")
 
     # Now do the remapping of category ids to be contiguous.
-    id_map = {}
-    for idx, ci in enumerate(cat_ids):
-        id_map[idx] = ci
+    id_table = contiguous_category_table(cat_ids)
 
     if verbose:
-        print(f"Remapped total {len(names)} to {len(id_map)} so that classes are contiguous")
-
-    key_list = list(id_map.keys())
-    val_list = list(id_map.values())
-
-    cats_list, anns_list = [], []
-    for img_id in tqdm(coco.imgs.keys()):
-        ann_ids = coco.getAnnIds(imgIds=[img_id])
-        instance_list = []
-        for ann_id in ann_ids:
-            ann = coco.anns[ann_id]
-            label = ann['category_id']
-            ind = val_list.index(label)
-            label_trans = key_list[ind]
-            ann['category_id'] = label_trans
-            instance_list.append(ann)
-        anns_list.extend(instance_list)
-
-    for cat in coco.dataset["categories"]:
-        label = cat['id']
-        ind = val_list.index(label)
-        label_trans = key_list[ind]
-        cat['id'] = label_trans
-        cats_list.append(cat)
-
-    result = {
-        "images": coco.dataset["images"],
-        "annotations": anns_list,
-        "categories": cats_list
-    }
-
-    with open(output_path, "w", encoding='utf-8') as f:
-        json.dump(result, f)
+        print(f"Remapped total {len(names)} to {len(cat_ids)} so that classes are contiguous")
+
+    # Annotations are passed through unchanged apart from the category id,
+    # grouped by image in file order.
+    labels = remap_category_ids(id_table, coco.ann_category_ids)
+
+    cats_list = coco.categories
+    cat_labels = remap_category_ids(id_table, [cat['id'] for cat in cats_list]).tolist()
+    for cat, label in zip(cats_list, cat_labels):
+        cat['id'] = label
+
+    dump_json_arrays(output_path, [
+        ("images", (coco.image_record(row) for row in range(coco.num_images))),
+        ("annotations", iter_remapped_annotations(coco, labels)),
+        ("categories", cats_list)
+    ], frame_records)
 
     print(f"Remapped COCO json file is stored at {output_path}")
@@ -14,13 +14,23 @@
 
 """Convert COCO annotations to ODVG format"""
 
+import argparse
+import multiprocessing
 import os
+import sys
 import json
 import numpy as np
 
-from pycocotools.coco import COCO
 from tqdm.auto import tqdm
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.coco_index import contiguous_category_table, load_coco_index, remap_category_ids  # noqa: E402
+from common.coco_index_cache import DEFAULT_MAX_CACHE_GB, load_coco_index_cached  # noqa: E402
+from common.tokenizer import WordPieceTokenizer, char_spans_to_token_ranges  # noqa: E402
+from common.framed_io import (  # noqa: E402
+    COMPRESSION_EXTENSIONS, DEFAULT_FRAME_RECORDS, FramedReader, FramedWriter, compressed_path, strip_compression
+)
+
 
 def xywh_to_xyxy(bbox):
     """Convert xywh to xyxy."""
@@ -42,22 +52,207 @@ def clean_span(span):
     return span
 
 
-def dump_label_map(cat_map, key_list, val_list, output):
-    """Dump label mapping JSON file."""
+def dump_label_map(cat_map, id_table, output):
+    """Dump label mapping JSON file.
+
+    Args:
+        cat_map (dict): Category id to name.
+        id_table (np.ndarray): Category id to contiguous label, see contiguous_category_table.
+        output (str): Output JSON file.
+    """
     new_map = {}
     for key, value in cat_map.items():
         label = int(key)
-        if label not in val_list:
+        if label < 0 or label >= len(id_table) or id_table[label] < 0:
             continue
-        ind = val_list.index(label)
-        label_trans = key_list[ind]
-        new_map[label_trans] = value
+        new_map[int(id_table[label])] = value
 
     with open(output, "w", encoding="utf-8") as f:
         json.dump(new_map, f)
 
 
-def convert_coco_to_odvg(coco_json_path, results_dir, use_all_categories=False, verbose=False):
+class OdvgRecordBuilder(object):
+    """Build the ODVG record of an image row of a CocoIndex."""
+
+    def __init__(self, coco, is_grounding, names=None, labels=None, verbose=False, tokenizer=None):
+        """Initialize.
+
+        Args:
+            coco (CocoIndex): Source annotations.
+            is_grounding (bool): Build grounding records from captions instead of detection records.
+            names (dict): Category id to name, for detection records.
+            labels (list): Contiguous label of every annotation row, for detection records.
+            verbose (bool): Report skipped images.
+            tokenizer (WordPieceTokenizer): Store caption token ids and the positive token
+                ranges of every region in grounding records.
+        """
+        self.coco = coco
+        self.is_grounding = is_grounding
+        self.names = names
+        self.labels = labels
+        self.verbose = verbose
+        self.tokenizer = tokenizer
+        self.bboxes = coco.bbox_lists()
+        self.category_ids = coco.ann_category_ids.tolist()
+        self.has_mask = coco.segmentations.has_value()
+
+    def record(self, img_row):
+        """Return the ODVG record of an image row, or None if the image is skipped."""
+        coco = self.coco
+        caption = None
+        if self.is_grounding:
+            caption = clean_span(coco.captions.get(img_row))
+
+        ann_rows = coco.image_annotation_rows(img_row).tolist()
+        if self.is_grounding and self.tokenizer is not None:
+            input_ids, token_offsets = self.tokenizer.encode(caption)
+
+        detection_list, grounding_list = [], []
+        for ann_row in ann_rows:
+            bbox_xyxy = xywh_to_xyxy(self.bboxes[ann_row])
+            mask = coco.segmentations.get_json(ann_row) if self.has_mask[ann_row] else None
+            if self.is_grounding:
+                token_positives = coco.tokens_positive.get_json(ann_row)
+                phrase = ' '.join([caption[t[0]: t[1]] for t in token_positives])
+                grounding_annot = {
+                    "bbox": bbox_xyxy,
+                    "phrase": phrase,
+                }
+                if self.tokenizer is not None:
+                    grounding_annot["positive_tokens"] = char_spans_to_token_ranges(
+                        token_offsets, token_positives, len(caption))
+                if mask:
+                    grounding_annot["mask"] = mask
+                grounding_list.append(grounding_annot)
+            else:
+                category = self.names[self.category_ids[ann_row]]
+                dt_annot = {
+                    "bbox": bbox_xyxy,
+                    "label": self.labels[ann_row],
+                    "category": category
+                }
+                if mask:
+                    dt_annot["mask"] = mask
+                detection_list.append(dt_annot)
+
+        # For GoldG, skip if there are no annotations
+        if len(ann_rows) == 0 and len(grounding_list) == 0:
+            if self.verbose:
+                print(f"Image ID {coco.image_ids[img_row]} is being skipped.", caption)
+            return None
+
+        meta = {
+            "file_name": coco.file_names.get(img_row),
+            "height": int(coco.image_heights[img_row]),
+            "width": int(coco.image_widths[img_row])
+        }
+
+        if self.is_grounding:
+            meta["grounding"] = {
+                "caption": caption,
+                "regions": grounding_list
+            }
+            if self.tokenizer is not None:
+                meta["grounding"]["input_ids"] = input_ids
+        else:
+            meta["detection"] = {
+                "instances": detection_list
+            }
+        return meta
+
+    def lines(self, start, stop):
+        """Return the JSONL lines of the records of image rows [start, stop)."""
+        records = (self.record(img_row) for img_row in range(start, stop))
+        return [f"{json.dumps(meta)}\n" for meta in records if meta is not None]
+
+
+def odvg_shard_paths(odvg_jsonl_path, num_shards, compression=None):
+    """Return the output paths of num_shards shards; a single shard keeps the unsharded name."""
+    if num_shards == 1:
+        return [compressed_path(odvg_jsonl_path, compression)]
+    stem = odvg_jsonl_path[:-len(".jsonl")]
+    return [compressed_path(f"{stem}-{i:05d}-of-{num_shards:05d}.jsonl", compression) for i in range(num_shards)]
+
+
+def read_odvg_record(jsonl_path, k, reader=None):
+    """Read record k of a plain or compressed ODVG JSONL file through its index.
+
+    Args:
+        jsonl_path (str): ODVG file, optionally ending in .gz or .zst.
+        k (int): Record number.
+        reader (FramedReader): Open reader of jsonl_path, to reuse across calls.
+    """
+    if reader is not None:
+        return json.loads(reader.read_record(k))
+    with FramedReader(jsonl_path) as reader:
+        return json.loads(reader.read_record(k))
+
+
+def shard_image_rows(coco, num_shards):
+    """Split image rows into num_shards contiguous ranges of about equal annotation count.
+
+    Returns:
+        np.ndarray: (num_shards + 1,) row boundaries.
+    """
+    # Each image costs one unit plus one per annotation.
+    cost = coco.image_ann_ptr + np.arange(coco.num_images + 1)
+    bounds = np.searchsorted(cost, np.linspace(0, cost[-1], num_shards + 1))
+    bounds[0], bounds[-1] = 0, coco.num_images
+    return bounds
+
+
+def write_odvg_jsonl(builder, start, stop, jsonl_path, progress=False, frame_records=DEFAULT_FRAME_RECORDS,
+                     pool=None, batch_size=256):
+    """Write the records of image rows [start, stop) and their index.
+
+    A .gz or .zst jsonl_path is compressed in frames of frame_records records.
+
+    Args:
+        pool (multiprocessing.Pool): Build batches of batch_size images in this pool,
+            initialized with _init_worker(builder). Lines are written in order.
+
+    Returns:
+        int: Number of records written.
+    """
+    batches = [(begin, min(begin + batch_size, stop)) for begin in range(start, stop, batch_size)]
+    if pool is None:
+        batch_lines = (builder.lines(begin, end) for begin, end in batches)
+    else:
+        batch_lines = pool.imap(_build_odvg_lines_worker, batches)
+    with FramedWriter(jsonl_path, frame_records, write_index=True) as writer, \
+            tqdm(total=stop - start, disable=not progress) as pbar:
+        for (begin, end), lines in zip(batches, batch_lines):
+            for line in lines:
+                writer.write(line)
+                writer.end_record()
+            pbar.update(end - begin)
+    return writer.num_records
+
+
+_worker_builder = None
+
+
+def _init_worker(builder):
+    """Keep the record builder once per worker process."""
+    global _worker_builder
+    _worker_builder = builder
+
+
+def _build_odvg_lines_worker(batch):
+    """Pool entry point for OdvgRecordBuilder.lines."""
+    return _worker_builder.lines(*batch)
+
+
+def _write_odvg_shard_worker(task):
+    """Pool entry point for write_odvg_jsonl."""
+    start, stop, jsonl_path, frame_records = task
+    return write_odvg_jsonl(_worker_builder, start, stop, jsonl_path, frame_records=frame_records)
+
+
+def convert_coco_to_odvg(coco_json_path, results_dir, use_all_categories=False, verbose=False,
+                         num_shards=1, workers=1, streaming=False, spill_dir=None,
+                         cache_dir=None, cache_max_gb=DEFAULT_MAX_CACHE_GB,
+                         compression=None, frame_records=DEFAULT_FRAME_RECORDS, tokenizer_vocab=None):
     """Function to convert COCO annotations to ODVG format.
 
     Args:
@@ -65,13 +260,28 @@ def convert_coco_to_odvg(coco_json_path, results_dir, use_all_categories=False,
         results_dir (str): Path to the results directory.
         use_all_categories (bool): Whether to use all categories. Default is False.
         verbose (bool): verbosity. Default is False.
+        num_shards (int): Number of *_odvg-XXXXX-of-YYYYY.jsonl shards. Default is 1, a single *_odvg.jsonl.
+        workers (int): Number of processes writing shards, or building records in batches
+            when there is a single shard. Default is 1.
+        streaming (bool): Parse the COCO JSON incrementally to bound memory use. Default is False.
+        spill_dir (str): Directory for the temporary streaming index. Default is the system temp dir.
+        cache_dir (str): Reuse a binary index of the COCO JSON cached in this directory. Default is no cache.
+        cache_max_gb (float): Size limit of cache_dir in GiB.
+        compression (str): "gzip" or "zstd" to write *_odvg.jsonl.gz or *_odvg.jsonl.zst. Default is plain JSONL.
+        frame_records (int): Records per independently decompressible frame of compressed output.
+        tokenizer_vocab (str): BERT vocab.txt. When set, grounding records also store the caption's
+            input_ids and every region's positive_tokens, as [start, end) token index ranges.
     """
-    odvg_jsonl_path = os.path.join(results_dir, os.path.basename(coco_json_path).replace(".json", "_odvg.jsonl"))
+    odvg_jsonl_path = os.path.join(results_dir,
+                                   os.path.basename(strip_compression(coco_json_path)).replace(".json", "_odvg.jsonl"))
 
-    coco = COCO(coco_json_path)
+    if cache_dir:
+        coco = load_coco_index_cached(coco_json_path, cache_dir, cache_max_gb, streaming=streaming)
+    else:
+        coco = load_coco_index(coco_json_path, streaming=streaming, spill_dir=spill_dir)
 
     # check if the annotation is grounding dataset.
-    if 'caption' in coco.imgs[list(coco.imgs.keys())[0]]:
+    if coco.captions is not None and coco.num_images and coco.captions.get(0):
         is_grounding = True
         print("Processing grounding annotations")
     else:
@@ -85,88 +295,117 @@ def convert_coco_to_odvg(coco_json_path, results_dir, use_all_categories=False,
 
         if use_all_categories:
             cat_ids = list(names.keys())
-            cat_cnts = [0] * len(cat_ids)
-            for ann in coco.dataset['annotations']:
-                cat_cnts[ann['category_id']] += 1
+            present_ids, present_cnts = np.unique(coco.ann_category_ids, return_counts=True)
+            present = dict(zip(present_ids.tolist(), present_cnts.tolist()))
+            cat_cnts = [present.get(cat_id, 0) for cat_id in cat_ids]
         else:
             # Get category ids that are actually present in the dataset.
-            cat_ids, cat_cnts = np.unique([a['category_id'] for a in coco.dataset['annotations']], return_counts=True)
+            cat_ids, cat_cnts = np.unique(coco.ann_category_ids, return_counts=True)
 
         if verbose:
             for cat_id, cat_cnt in zip(cat_ids, cat_cnts):
                 print(f"{names[cat_id]} ({cat_id}): {cat_cnt}")
 
         # Now do the remapping of category ids to be contiguous.
-        id_map = {}
-        for idx, ci in enumerate(cat_ids):
-            id_map[idx] = ci
+        id_table = contiguous_category_table(cat_ids)
 
         if verbose:
-            print(f"Remapped total {len(names)} to {len(id_map)} so that class ids are contiguous")
-
-        key_list = list(id_map.keys())
-        val_list = list(id_map.values())
-
-        dump_label_map(names, key_list, val_list, odvg_jsonl_path.replace(".jsonl", "_labelmap.json"))
-
-    with open(odvg_jsonl_path, mode="w", encoding="utf-8") as writer:
-        # iterate every annotation
-        for img_id, img_info in tqdm(coco.imgs.items(), total=len(coco.imgs)):
-            if is_grounding:
-                caption = clean_span(img_info['caption'])
-
-            anns = coco.loadAnns(coco.getAnnIds(imgIds=[img_id]))
-
-            detection_list, grounding_list = [], []
-            for ann in anns:
-                bbox = ann['bbox']
-                mask = ann.get('segmentation', None)
-                bbox_xyxy = xywh_to_xyxy(bbox)
-                if is_grounding:
-                    token_positives = ann['tokens_positive']
-                    phrase = ' '.join([caption[t[0]: t[1]] for t in token_positives])
-                    grounding_annot = {
-                        "bbox": bbox_xyxy,
-                        "phrase": phrase,
-                    }
-                    if mask:
-                        grounding_annot["mask"] = mask
-                    grounding_list.append(grounding_annot)
-                else:
-                    label = ann['category_id']
-                    category = names[label]
-                    ind = val_list.index(label)
-                    label_trans = key_list[ind]
-                    dt_annot = {
-                        "bbox": bbox_xyxy,
-                        "label": label_trans,
-                        "category": category
-                    }
-                    if mask:
-                        dt_annot["mask"] = mask
-                    detection_list.append(dt_annot)
-
-            # For GoldG, skip if there are no annotations
-            if len(anns) == 0 and len(grounding_list) == 0:
-                if verbose:
-                    print(f"Image ID {img_id} is being skipped.", caption)
-                continue
-
-            meta = {
-                "file_name": img_info["file_name"],
-                "height": img_info["height"],
-                "width": img_info["width"]
-            }
+            print(f"Remapped total {len(names)} to {len(cat_ids)} so that class ids are contiguous")
+
+        dump_label_map(names, id_table, odvg_jsonl_path.replace(".jsonl", "_labelmap.json"))
+        labels = remap_category_ids(id_table, coco.ann_category_ids).tolist()
+        builder = OdvgRecordBuilder(coco, is_grounding, names, labels, verbose)
+    else:
+        tokenizer = WordPieceTokenizer(tokenizer_vocab) if tokenizer_vocab else None
+        builder = OdvgRecordBuilder(coco, is_grounding, verbose=verbose, tokenizer=tokenizer)
+
+    shard_paths = odvg_shard_paths(odvg_jsonl_path, num_shards, compression)
+    bounds = shard_image_rows(coco, num_shards)
+    tasks = [(bounds[i], bounds[i + 1], path, frame_records) for i, path in enumerate(shard_paths)]
+    if workers > 1 and num_shards == 1:
+        # Records are built in batches across the pool and written here in order.
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(builder,)) as pool:
+            write_odvg_jsonl(builder, 0, coco.num_images, shard_paths[0], progress=True,
+                             frame_records=frame_records, pool=pool)
+    elif workers <= 1:
+        for start, stop, path, _ in tasks:
+            write_odvg_jsonl(builder, start, stop, path, progress=True, frame_records=frame_records)
+    else:
+        workers = min(workers, num_shards)
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(builder,)) as pool:
+            for _ in tqdm(pool.imap_unordered(_write_odvg_shard_worker, tasks), total=len(tasks)):
+                pass
+
+    if num_shards == 1:
+        print(f"ODVG annotation file is stored at {shard_paths[0]}")
+    else:
+        print(f"ODVG annotation files are stored at {shard_paths[0]} ... {shard_paths[-1]}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Convert COCO annotations to ODVG format.")
+    parser.add_argument("coco_json_path", type=str, help="COCO annotation JSON file.")
+    parser.add_argument("results_dir", type=str, help="Output directory.")
+    parser.add_argument(
+        "--use_all_categories",
+        action="store_true",
+        help="Keep categories without annotations in the label map."
+    )
+    parser.add_argument(
+        "--num_shards",
+        type=int, default=1,
+        help="Split the output into this many *_odvg-XXXXX-of-YYYYY.jsonl shards."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int, default=1,
+        help="Number of processes writing shards, or building records in batches for a single output file."
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Parse the COCO JSON incrementally and spill segmentations to disk, for files larger than memory."
+    )
+    parser.add_argument(
+        "--spill_dir",
+        type=str, default=None,
+        help="Directory for the temporary streaming index. Defaults to the system temp directory."
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str, default=None,
+        help="Cache a binary index of the COCO JSON in this directory and reuse it while the file is unchanged."
+    )
+    parser.add_argument(
+        "--cache_max_gb",
+        type=float, default=DEFAULT_MAX_CACHE_GB,
+        help="Size limit of the index cache in GiB; least recently used entries are evicted."
+    )
+    parser.add_argument(
+        "--compression",
+        type=str, default=None, choices=list(COMPRESSION_EXTENSIONS),
+        help="Compress the output in independently decompressible frames, with a .fidx frame index."
+    )
+    parser.add_argument(
+        "--frame_records",
+        type=int, default=DEFAULT_FRAME_RECORDS,
+        help="Records per compressed frame."
+    )
+    parser.add_argument(
+        "--tokenizer_vocab",
+        type=str, default=None,
+        help="BERT vocab.txt; grounding records then also store caption token ids and positive token ranges."
+    )
+    parser.add_argument("--verbose", action="store_true", help="Print category statistics and skipped images.")
+    args = parser.parse_args()
+    if args.num_shards < 1:
+        parser.error("--num_shards must be at least 1")
+    return args
 
-            if is_grounding:
-                meta["grounding"] = {
-                    "caption": caption,
-                    "regions": grounding_list
-                }
-            else:
-                meta["detection"] = {
-                    "instances": detection_list
-                }
-            writer.write(f"{json.dumps(meta)}\n")
 
-    print(f"ODVG annotation file is stored at {odvg_jsonl_path}")
+if __name__ == "__main__":
+    args = parse_args()
+    convert_coco_to_odvg(args.coco_json_path, args.results_dir, args.use_all_categories, args.verbose,
+                         args.num_shards, args.workers, args.streaming, args.spill_dir,
+                         args.cache_dir, args.cache_max_gb, args.compression, args.frame_records,
+                         args.tokenizer_vocab)
@@ -0,0 +1,214 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Convert COCO annotations to Parquet tables"""
+
+import argparse
+import os
+import sys
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm.auto import tqdm
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.coco_index import load_coco_index  # noqa: E402
+from common.framed_io import strip_compression  # noqa: E402
+
+# Fields stored in their own columns; any other field goes to the "extra" JSON column.
+IMAGE_FIELDS = ("id", "file_name", "height", "width", "caption")
+ANNOTATION_FIELDS = ("id", "image_id", "category_id", "bbox", "area", "iscrowd", "segmentation", "tokens_positive")
+CATEGORY_FIELDS = ("id", "name", "supercategory")
+
+IMAGE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("file_name", pa.string()),
+    ("height", pa.int64()),
+    ("width", pa.int64()),
+    ("caption", pa.string()),
+    ("extra", pa.string()),
+])
+ANNOTATION_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("image_id", pa.int64()),
+    ("category_id", pa.int64()),
+    ("bbox_x", pa.float64()),
+    ("bbox_y", pa.float64()),
+    ("bbox_w", pa.float64()),
+    ("bbox_h", pa.float64()),
+    ("bbox_int", pa.bool_()),
+    ("area", pa.float64()),
+    ("iscrowd", pa.int8()),
+    ("segmentation", pa.string()),
+    ("tokens_positive", pa.string()),
+    ("extra", pa.string()),
+])
+CATEGORY_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("name", pa.string()),
+    ("supercategory", pa.string()),
+    ("extra", pa.string()),
+])
+
+DEFAULT_ROW_GROUP_SIZE = 1 << 20
+# Top-level members other than the tables, e.g. info and licenses.
+METADATA_FILE = "metadata.json"
+
+
+def parquet_table_paths(parquet_dir):
+    """Return the images, annotations and categories table paths of a Parquet export."""
+    return {name: os.path.join(parquet_dir, f"{name}.parquet") for name in ("images", "annotations", "categories")}
+
+
+def _column(values, records, key, arrow_type):
+    """Return values as an Arrow array, null where the record has no key."""
+    missing = np.array([key not in record for record in records], dtype=bool)
+    return pa.array(values, arrow_type, mask=missing)
+
+
+def _json_or_none(value):
+    return None if value is None else json.dumps(value, separators=(",", ":"))
+
+
+def _extra(record, fields):
+    """Return the JSON text of the fields of record that have no column, or None."""
+    extra = {key: value for key, value in record.items() if key not in fields}
+    return _json_or_none(extra) if extra else None
+
+
+def _image_batch(coco, start, stop):
+    records = [coco.image_record(row) for row in range(start, stop)]
+    return pa.record_batch([
+        pa.array(coco.image_ids[start:stop], pa.int64()),
+        pa.array([record.get("file_name") for record in records], pa.string()),
+        _column(coco.image_heights[start:stop], records, "height", pa.int64()),
+        _column(coco.image_widths[start:stop], records, "width", pa.int64()),
+        pa.array([record.get("caption") for record in records], pa.string()),
+        pa.array([_extra(record, IMAGE_FIELDS) for record in records], pa.string()),
+    ], schema=IMAGE_SCHEMA)
+
+
+def _annotation_batch(coco, start, stop):
+    records = [coco.ann_record(row) for row in range(start, stop)]
+    bboxes = coco.ann_bboxes[start:stop]
+    return pa.record_batch([
+        pa.array(coco.ann_ids[start:stop], pa.int64()),
+        pa.array(coco.ann_image_ids[start:stop], pa.int64()),
+        _column(coco.ann_category_ids[start:stop], records, "category_id", pa.int64()),
+        _column(bboxes[:, 0], records, "bbox", pa.float64()),
+        _column(bboxes[:, 1], records, "bbox", pa.float64()),
+        _column(bboxes[:, 2], records, "bbox", pa.float64()),
+        _column(bboxes[:, 3], records, "bbox", pa.float64()),
+        _column(coco.ann_int_bboxes[start:stop], records, "bbox", pa.bool_()),
+        _column(coco.ann_areas[start:stop], records, "area", pa.float64()),
+        _column(coco.ann_iscrowd[start:stop], records, "iscrowd", pa.int8()),
+        pa.array([_json_or_none(record.get("segmentation")) for record in records], pa.string()),
+        pa.array([_json_or_none(record.get("tokens_positive")) for record in records], pa.string()),
+        pa.array([_extra(record, ANNOTATION_FIELDS) for record in records], pa.string()),
+    ], schema=ANNOTATION_SCHEMA)
+
+
+def _write_table(path, schema, num_rows, make_batch, row_group_size, compression):
+    """Write num_rows rows built by make_batch(start, stop), one row group at a time."""
+    with pq.ParquetWriter(path, schema, compression=compression, write_statistics=True) as writer:
+        for start in tqdm(range(0, num_rows, row_group_size), desc=os.path.basename(path)):
+            writer.write_batch(make_batch(start, min(start + row_group_size, num_rows)),
+                               row_group_size=row_group_size)
+        if not num_rows:
+            writer.write_table(schema.empty_table())
+
+
+def convert_coco_to_parquet(coco_json_path, results_dir, row_group_size=DEFAULT_ROW_GROUP_SIZE,
+                            compression="zstd", streaming=False, spill_dir=None):
+    """Function to convert COCO annotations to Parquet tables.
+
+    Writes images.parquet, annotations.parquet and categories.parquet to
+    <results_dir>/<name>_parquet with per row group min/max statistics, so
+    readers can prune row groups and read only the columns they need. Boxes
+    are split into bbox_x, bbox_y, bbox_w and bbox_h columns, and bbox_int
+    flags the boxes of integers; segmentations, tokens_positive and fields
+    without a column are stored as JSON text. Fields missing from a record are
+    null. Other top-level members, e.g. info and licenses, go to metadata.json.
+
+    Args:
+        coco_json_path (str): Path to the COCO JSON file.
+        results_dir (str): Path to the results directory.
+        row_group_size (int): Rows per Parquet row group.
+        compression (str): Parquet column compression codec.
+        streaming (bool): Parse the COCO JSON incrementally to bound memory use. Default is False.
+        spill_dir (str): Directory for the temporary streaming index. Default is the system temp dir.
+
+    Returns:
+        str: The Parquet output directory.
+    """
+    name = os.path.splitext(os.path.basename(strip_compression(coco_json_path)))[0]
+    parquet_dir = os.path.join(results_dir, f"{name}_parquet")
+    os.makedirs(parquet_dir, exist_ok=True)
+    paths = parquet_table_paths(parquet_dir)
+
+    if compression == "none":
+        compression = None
+    coco = load_coco_index(coco_json_path, keep_dataset=True, streaming=streaming, spill_dir=spill_dir)
+    _write_table(paths["images"], IMAGE_SCHEMA, coco.num_images,
+                 lambda start, stop: _image_batch(coco, start, stop), row_group_size, compression)
+    _write_table(paths["annotations"], ANNOTATION_SCHEMA, coco.num_annotations,
+                 lambda start, stop: _annotation_batch(coco, start, stop), row_group_size, compression)
+
+    categories = coco.categories
+    pq.write_table(pa.table({
+        "id": pa.array([cat["id"] for cat in categories], pa.int64()),
+        "name": pa.array([cat.get("name") for cat in categories], pa.string()),
+        "supercategory": pa.array([cat.get("supercategory") for cat in categories], pa.string()),
+        "extra": pa.array([_extra(cat, CATEGORY_FIELDS) for cat in categories], pa.string()),
+    }, schema=CATEGORY_SCHEMA), paths["categories"], compression=compression)
+    with open(os.path.join(parquet_dir, METADATA_FILE), "w", encoding="utf-8") as f:
+        json.dump(coco.metadata, f)
+
+    print(f"Parquet tables are stored at {parquet_dir}")
+    return parquet_dir
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Convert COCO annotations to Parquet tables.")
+    parser.add_argument("coco_json_path", type=str, help="COCO annotation JSON file.")
+    parser.add_argument("results_dir", type=str, help="Output directory.")
+    parser.add_argument(
+        "--row_group_size",
+        type=int, default=DEFAULT_ROW_GROUP_SIZE,
+        help="Rows per Parquet row group."
+    )
+    parser.add_argument(
+        "--compression",
+        type=str, default="zstd",
+        help="Parquet column compression codec (zstd, snappy, gzip or none)."
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Parse the COCO JSON incrementally, for files larger than memory."
+    )
+    parser.add_argument(
+        "--spill_dir",
+        type=str, default=None,
+        help="Directory for the temporary --streaming index. Defaults to the system temp dir."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    convert_coco_to_parquet(args.coco_json_path, args.results_dir, args.row_group_size, args.compression,
+                            args.streaming, args.spill_dir)
@@ -0,0 +1,235 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Merge COCO annotation files and split them into train/val by image"""
+
+import argparse
+import hashlib
+import os
+import sys
+
+import numpy as np
+from tqdm.auto import tqdm
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.coco_writer import dump_json_arrays  # noqa: E402
+from common.framed_io import DEFAULT_FRAME_RECORDS, compressed_path  # noqa: E402
+from common.json_stream import iter_json_array, iter_json_events  # noqa: E402
+
+
+def is_val_image(file_name, val_fraction, split_seed=""):
+    """Deterministic hash rule: the image goes to val if the hash of seed and file name falls below val_fraction.
+
+    The rule only depends on the file name, so an image lands in the same split
+    whatever shard it comes from and whatever other files are merged.
+    """
+    digest = hashlib.sha1(f"{split_seed}{file_name}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") < val_fraction * (1 << 64)
+
+
+def merge_categories(category_lists):
+    """Unify categories by name.
+
+    A name keeps the id it has in the first file that defines it, unless that
+    id is already taken by another name; then it gets the next free id.
+
+    Args:
+        category_lists (list): Category list of every input file.
+
+    Returns:
+        tuple: (merged categories, per file dict of old category id to merged id).
+    """
+    merged, by_name, used_ids = [], {}, set()
+    for categories in category_lists:
+        for cat in categories:
+            if cat["name"] in by_name:
+                continue
+            cat = dict(cat)
+            if cat["id"] in used_ids:
+                cat["id"] = max(used_ids) + 1
+            used_ids.add(cat["id"])
+            by_name[cat["name"]] = cat["id"]
+            merged.append(cat)
+    id_maps = [{cat["id"]: by_name[cat["name"]] for cat in categories} for categories in category_lists]
+    return merged, id_maps
+
+
+class _FilePlan(object):
+    """Image id remapping and split assignment of one input file.
+
+    Only a few integers per image are kept, so planning N files holds no
+    annotation and no image record in memory.
+    """
+
+    def __init__(self, path, image_ids, split_ids, category_map):
+        self.path = path
+        order = np.argsort(image_ids, kind="stable")
+        self.sorted_ids = image_ids[order]
+        if len(self.sorted_ids) > 1 and (self.sorted_ids[1:] == self.sorted_ids[:-1]).any():
+            raise ValueError(f"{path} has duplicate image ids")
+        self.order = order
+        self.split_ids = split_ids
+        self.new_ids = np.zeros(len(image_ids), dtype=np.int64)
+        self.category_map = category_map
+
+    def image_rows(self, image_ids, ann_ids):
+        """Return the image rows of image_ids, raising for ids that are not in the file."""
+        pos = np.minimum(np.searchsorted(self.sorted_ids, image_ids), max(len(self.sorted_ids) - 1, 0))
+        missing = ~(self.sorted_ids[pos] == image_ids) if len(self.sorted_ids) else np.ones(len(image_ids), bool)
+        if missing.any():
+            idx = int(np.argmax(missing))
+            raise ValueError(f"Annotation {ann_ids[idx]} of {self.path} refers to missing image {image_ids[idx]}")
+        return self.order[pos]
+
+
+def plan_merge(coco_json_paths, val_fraction=0.0, split_seed=""):
+    """Read the images and categories of every file and assign merged ids and splits.
+
+    Returns:
+        tuple: (merged categories, list of _FilePlan, number of images per split).
+    """
+    category_lists, images = [], []
+    for path in tqdm(coco_json_paths, desc="Planning"):
+        ids, split_ids, categories = [], [], []
+        for key, event, value in iter_json_events(path, {"images", "categories"}):
+            if key == "categories" and event == "item":
+                categories.append(value)
+            elif key == "images" and event == "item":
+                ids.append(value["id"])
+                split_ids.append(int(val_fraction > 0 and
+                                     is_val_image(value.get("file_name", value["id"]), val_fraction, split_seed)))
+        category_lists.append(categories)
+        images.append((np.array(ids, dtype=np.int64), np.array(split_ids, dtype=np.int8)))
+
+    categories, category_maps = merge_categories(category_lists)
+    plans = [_FilePlan(path, ids, split_ids, category_map)
+             for path, (ids, split_ids), category_map in zip(coco_json_paths, images, category_maps)]
+    # Image ids are renumbered 1..n per split in input order.
+    counts = [0, 0]
+    for plan in plans:
+        for split in (0, 1):
+            rows = np.flatnonzero(plan.split_ids == split)
+            plan.new_ids[rows] = counts[split] + 1 + np.arange(len(rows))
+            counts[split] += len(rows)
+    return categories, plans, counts
+
+
+def _iter_split_images(plans, split):
+    for plan in plans:
+        for row, img in enumerate(iter_json_array(plan.path, "images")):
+            if plan.split_ids[row] == split:
+                img["id"] = int(plan.new_ids[row])
+                yield img
+
+
+def _iter_split_annotations(plans, split, chunk_size=65536):
+    ann_id = 0
+    for plan in plans:
+        anns = iter_json_array(plan.path, "annotations")
+        while True:
+            chunk = [ann for _, ann in zip(range(chunk_size), anns)]
+            if not chunk:
+                break
+            rows = plan.image_rows(np.array([ann["image_id"] for ann in chunk], dtype=np.int64),
+                                   [ann.get("id") for ann in chunk])
+            for ann, row in zip(chunk, rows.tolist()):
+                if plan.split_ids[row] != split:
+                    continue
+                if ann["category_id"] not in plan.category_map:
+                    raise ValueError(f"Annotation {ann.get('id')} of {plan.path} has unknown category "
+                                     f"{ann['category_id']}")
+                ann_id += 1
+                ann["id"] = ann_id
+                ann["image_id"] = int(plan.new_ids[row])
+                ann["category_id"] = plan.category_map[ann["category_id"]]
+                yield ann
+
+
+def merge_coco(coco_json_paths, results_dir, output_name="merged", val_fraction=0.0, split_seed="",
+               compression=None, frame_records=DEFAULT_FRAME_RECORDS):
+    """Function to merge COCO files and optionally split them into train and val.
+
+    Inputs are streamed element by element; only the image ids and split of
+    every image are kept in memory. Categories are unified by name, image and
+    annotation ids are renumbered from 1 in every output, and an image with
+    its annotations goes to val when is_val_image holds for its file name.
+    The outputs can be passed to convert_coco_to_contiguous and convert_coco_to_odvg.
+
+    Args:
+        coco_json_paths (list): COCO JSON files, optionally .gz or .zst compressed.
+        results_dir (str): Path to the results directory.
+        output_name (str): Output file stem.
+        val_fraction (float): Fraction of images sent to val. Default is 0, a single merged output.
+        split_seed (str): Salt of the split hash, to draw a different split.
+        compression (str): "gzip" or "zstd" to compress the outputs. Default is plain JSON.
+        frame_records (int): Array elements per independently decompressible frame of compressed output.
+
+    Returns:
+        list: Output paths, [<output_name>.json] or [<output_name>_train.json, <output_name>_val.json].
+    """
+    if not 0 <= val_fraction < 1:
+        raise ValueError(f"val_fraction must be in [0, 1), got {val_fraction}")
+    os.makedirs(results_dir, exist_ok=True)
+    categories, plans, counts = plan_merge(coco_json_paths, val_fraction, split_seed)
+
+    names = [output_name] if val_fraction == 0 else [f"{output_name}_train", f"{output_name}_val"]
+    output_paths = []
+    for split, name in enumerate(names):
+        output_path = compressed_path(os.path.join(results_dir, f"{name}.json"), compression)
+        dump_json_arrays(output_path, [
+            ("images", tqdm(_iter_split_images(plans, split), total=counts[split], desc=name)),
+            ("annotations", _iter_split_annotations(plans, split)),
+            ("categories", categories),
+        ], frame_records)
+        print(f"Merged COCO json file with {counts[split]} images is stored at {output_path}")
+        output_paths.append(output_path)
+    return output_paths
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Merge COCO annotation files and split them into train/val by image.")
+    parser.add_argument("coco_json_paths", type=str, nargs="+", help="COCO annotation JSON files.")
+    parser.add_argument("results_dir", type=str, help="Output directory.")
+    parser.add_argument(
+        "--output_name",
+        type=str, default="merged",
+        help="Output file stem."
+    )
+    parser.add_argument(
+        "--val_fraction",
+        type=float, default=0.0,
+        help="Fraction of images written to <output_name>_val.json; 0 writes a single <output_name>.json."
+    )
+    parser.add_argument(
+        "--split_seed",
+        type=str, default="",
+        help="Salt of the file name hash that assigns images to train or val."
+    )
+    parser.add_argument(
+        "--compression",
+        type=str, default=None, choices=["gzip", "zstd"],
+        help="Write the outputs as independently decompressible gzip or zstd frames."
+    )
+    parser.add_argument(
+        "--frame_records",
+        type=int, default=DEFAULT_FRAME_RECORDS,
+        help="Array elements per compressed frame."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    merge_coco(args.coco_json_paths, args.results_dir, args.output_name, args.val_fraction, args.split_seed,
+               args.compression, args.frame_records)
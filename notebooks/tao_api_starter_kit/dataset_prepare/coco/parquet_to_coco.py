@@ -0,0 +1,220 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Convert Parquet tables written by coco_to_parquet back to COCO annotations"""
+
+import argparse
+import os
+import sys
+import json
+
+import numpy as np
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.coco_index import SECTIONS, BlobColumn, CocoIndex  # noqa: E402
+from common.coco_writer import dump_json_arrays  # noqa: E402
+from common.framed_io import DEFAULT_FRAME_RECORDS  # noqa: E402
+from coco.coco_to_parquet import METADATA_FILE, parquet_table_paths  # noqa: E402
+
+
+def _expression(filters):
+    """Convert pyarrow DNF filters such as [("category_id", "in", [1, 2])] to an expression."""
+    return None if filters is None else pq.filters_to_expression(filters)
+
+
+def iter_parquet_rows(path, columns=None, filters=None, batch_size=65536):
+    """Yield the rows of a Parquet table as dicts.
+
+    Only the requested columns are read, and row groups whose statistics rule
+    out filters are skipped without being decompressed.
+
+    Args:
+        path (str): Parquet file.
+        columns (list): Columns to read. Default is all.
+        filters (list): pyarrow DNF filters on the rows.
+        batch_size (int): Rows decoded at a time.
+    """
+    dataset = ds.dataset(path, format="parquet")
+    for batch in dataset.to_batches(columns=columns, filter=_expression(filters), batch_size=batch_size):
+        yield from batch.to_pylist()
+
+
+def read_parquet_column(path, column, filters=None):
+    """Return one column of a Parquet table as a NumPy array."""
+    return ds.dataset(path, format="parquet").to_table(columns=[column], filter=_expression(filters))[column] \
+        .to_numpy(zero_copy_only=False)
+
+
+def _with_extra(record, extra):
+    if extra:
+        record.update(json.loads(extra))
+    return record
+
+
+def _with_values(record, row, keys):
+    """Copy the non-null values of keys from a row into record."""
+    for key in keys:
+        if row[key] is not None:
+            record[key] = row[key]
+    return record
+
+
+def image_dict(row):
+    """Build the COCO image dict of an images.parquet row."""
+    img = _with_values({"id": row["id"], "file_name": row["file_name"]}, row, ("height", "width", "caption"))
+    return _with_extra(img, row["extra"])
+
+
+def ann_dict(row):
+    """Build the COCO annotation dict of an annotations.parquet row."""
+    ann = _with_values({"id": row["id"], "image_id": row["image_id"]}, row, ("category_id",))
+    if row["bbox_x"] is not None:
+        bbox = [row["bbox_x"], row["bbox_y"], row["bbox_w"], row["bbox_h"]]
+        ann["bbox"] = [int(value) for value in bbox] if row["bbox_int"] else bbox
+    _with_values(ann, row, ("area", "iscrowd"))
+    for key in ("segmentation", "tokens_positive"):
+        if row[key] is not None:
+            ann[key] = json.loads(row[key])
+    return _with_extra(ann, row["extra"])
+
+
+def category_dict(row):
+    """Build the COCO category dict of a categories.parquet row."""
+    cat = {"id": row["id"], "name": row["name"]}
+    if row["supercategory"] is not None:
+        cat["supercategory"] = row["supercategory"]
+    return _with_extra(cat, row["extra"])
+
+
+def load_parquet_metadata(parquet_dir):
+    """Return the top-level members stored next to the tables, e.g. info and licenses."""
+    metadata_file = os.path.join(parquet_dir, METADATA_FILE)
+    if not os.path.exists(metadata_file):
+        return {}
+    with open(metadata_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parquet_coco_sections(parquet_dir, image_filters=None, annotation_filters=None):
+    """Return the lazily read (name, dicts) sections of a Parquet export, see dump_json_arrays.
+
+    The members of metadata.json come first, as plain values.
+
+    Args:
+        parquet_dir (str): Directory written by convert_coco_to_parquet.
+        image_filters (list): pyarrow DNF filters on images.parquet.
+        annotation_filters (list): pyarrow DNF filters on annotations.parquet.
+    """
+    paths = parquet_table_paths(parquet_dir)
+    return list(load_parquet_metadata(parquet_dir).items()) + [
+        ("images", (image_dict(row) for row in iter_parquet_rows(paths["images"], filters=image_filters))),
+        ("annotations", (ann_dict(row) for row in iter_parquet_rows(paths["annotations"],
+                                                                    filters=annotation_filters))),
+        ("categories", [category_dict(row) for row in iter_parquet_rows(paths["categories"])]),
+    ]
+
+
+def load_parquet_dataset(parquet_dir, image_filters=None, annotation_filters=None):
+    """Read a Parquet export into a COCO JSON dict."""
+    sections = parquet_coco_sections(parquet_dir, image_filters, annotation_filters)
+    return {name: list(dicts) if name in SECTIONS else dicts for name, dicts in sections}
+
+
+def load_coco_index_parquet(parquet_dir, image_filters=None, annotation_filters=None):
+    """Build a CocoIndex straight from the columns of a Parquet export.
+
+    Numeric columns are copied into the index arrays and JSON text columns
+    into blobs without being parsed, so this is much faster than going
+    through a COCO JSON file. Fields stored in the "extra" columns are not
+    loaded, and null values take the CocoIndex defaults.
+    """
+    paths = parquet_table_paths(parquet_dir)
+    images = pq.read_table(paths["images"], columns=["id", "file_name", "height", "width", "caption"],
+                           filters=image_filters)
+    anns = pq.read_table(paths["annotations"], filters=annotation_filters,
+                         columns=["id", "image_id", "category_id", "bbox_x", "bbox_y", "bbox_w", "bbox_h",
+                                  "bbox_int", "area", "iscrowd", "segmentation", "tokens_positive"])
+
+    def column(table, name, dtype, default=0):
+        return table[name].fill_null(default).to_numpy().astype(dtype, copy=False)
+
+    image_columns = {
+        "id": column(images, "id", np.int64),
+        "height": column(images, "height", np.int64),
+        "width": column(images, "width", np.int64),
+        "file_name": BlobColumn.from_strings(images["file_name"].to_pylist()),
+    }
+    if images["caption"].null_count < len(images):
+        image_columns["caption"] = BlobColumn.from_strings(images["caption"].to_pylist())
+    ann_columns = {
+        "id": column(anns, "id", np.int64),
+        "image_id": column(anns, "image_id", np.int64),
+        "category_id": column(anns, "category_id", np.int64),
+        "bbox": np.stack([column(anns, name, np.float64) for name in ("bbox_x", "bbox_y", "bbox_w", "bbox_h")],
+                         axis=1).reshape(-1, 4),
+        "int_bbox": column(anns, "bbox_int", bool, False),
+        "area": column(anns, "area", np.float64),
+        "iscrowd": column(anns, "iscrowd", np.int8),
+        "segmentation": BlobColumn.from_strings(anns["segmentation"].to_pylist()),
+    }
+    if anns["tokens_positive"].null_count < len(anns):
+        ann_columns["tokens_positive"] = BlobColumn.from_strings(anns["tokens_positive"].to_pylist())
+    categories = [category_dict(row) for row in iter_parquet_rows(paths["categories"])]
+    return CocoIndex(image_columns, ann_columns, categories, metadata=load_parquet_metadata(parquet_dir))
+
+
+def convert_parquet_to_coco(parquet_dir, output_path, category_ids=None, frame_records=DEFAULT_FRAME_RECORDS):
+    """Function to convert a Parquet export back to a COCO JSON file.
+
+    Rows are streamed from the tables, so memory use does not grow with the
+    dataset. Fields that were missing from the source records stay missing,
+    and integer boxes are written as integers.
+
+    Args:
+        parquet_dir (str): Directory written by convert_coco_to_parquet.
+        output_path (str): Output COCO JSON file; a .gz or .zst extension compresses it.
+        category_ids (list): Only keep annotations of these categories. Default is all.
+        frame_records (int): Array elements per compressed frame.
+    """
+    annotation_filters = [("category_id", "in", list(category_ids))] if category_ids else None
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    dump_json_arrays(output_path, parquet_coco_sections(parquet_dir, annotation_filters=annotation_filters),
+                     frame_records)
+    print(f"COCO json file is stored at {output_path}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Convert Parquet tables written by coco_to_parquet to COCO JSON.")
+    parser.add_argument("parquet_dir", type=str, help="Directory with images/annotations/categories.parquet.")
+    parser.add_argument("output_path", type=str, help="Output COCO JSON file.")
+    parser.add_argument(
+        "--category_ids",
+        type=int, nargs="+", default=None,
+        help="Only keep annotations of these category ids."
+    )
+    parser.add_argument(
+        "--frame_records",
+        type=int, default=DEFAULT_FRAME_RECORDS,
+        help="Array elements per independently decompressible frame of a .gz/.zst output."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    convert_parquet_to_coco(args.parquet_dir, args.output_path, args.category_ids, args.frame_records)
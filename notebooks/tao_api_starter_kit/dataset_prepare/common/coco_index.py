@@ -0,0 +1,543 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Columnar COCO annotation index, a lightweight replacement for pycocotools.coco.COCO."""
+
+import json
+import os
+import shutil
+import tempfile
+import weakref
+from array import array
+
+import numpy as np
+
+from common.framed_io import open_text
+from common.json_stream import iter_json_events
+
+
+# Top-level members held in columns; any other member is kept in CocoIndex.metadata.
+SECTIONS = ("images", "annotations", "categories")
+
+
+class BlobColumn(object):
+    """Variable-length UTF-8 strings stored in one blob with an offset array.
+
+    A zero-length entry stands for a missing value.
+    """
+
+    def __init__(self, blob, offsets):
+        """Initialize.
+
+        Args:
+            blob (bytes or np.ndarray): Concatenated UTF-8 strings.
+            offsets (np.ndarray): (N + 1,) int64; entry i is blob[offsets[i]:offsets[i + 1]].
+        """
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        """Build a column from a sequence of str or None."""
+        encoded = [s.encode("utf-8") if s else b"" for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(b"".join(encoded), offsets)
+
+    @classmethod
+    def from_json(cls, values):
+        """Build a column holding the compact JSON text of every value; None is missing."""
+        return cls.from_strings(None if v is None else json.dumps(v, separators=(",", ":")) for v in values)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getstate__(self):
+        # Memory-mapped blobs are reopened by path instead of being copied.
+        if isinstance(self.blob, np.memmap):
+            return {"blob_file": self.blob.filename, "offsets": self.offsets}
+        return {"blob": self.blob, "offsets": self.offsets}
+
+    def __setstate__(self, state):
+        self.offsets = state["offsets"]
+        if "blob_file" in state:
+            self.blob = np.memmap(state["blob_file"], dtype=np.uint8, mode="r")
+        else:
+            self.blob = state["blob"]
+
+    def save(self, prefix):
+        """Write the column to prefix.bin and prefix.offsets.npy."""
+        with open(prefix + ".bin", "wb") as f:
+            if isinstance(self.blob, bytes):
+                f.write(self.blob)
+            else:
+                self.blob.tofile(f)
+        np.save(prefix + ".offsets.npy", self.offsets)
+
+    @classmethod
+    def load(cls, prefix):
+        """Memory-map a column written by save."""
+        offsets = np.load(prefix + ".offsets.npy", mmap_mode="r")
+        blob = np.memmap(prefix + ".bin", dtype=np.uint8, mode="r") if offsets[-1] else b""
+        return cls(blob, offsets)
+
+    def get(self, idx):
+        """Return entry idx as str ('' if missing)."""
+        return bytes(self.blob[self.offsets[idx]:self.offsets[idx + 1]]).decode("utf-8")
+
+    def get_json(self, idx, default=None):
+        """Return entry idx parsed as JSON, or default if missing."""
+        text = self.get(idx)
+        return json.loads(text) if text else default
+
+    def has_value(self):
+        """Return a boolean mask of the entries that are not missing."""
+        return np.diff(self.offsets) > 0
+
+
+def _is_int_box(bbox):
+    return all(type(value) is int for value in bbox)
+
+
+class CocoIndex(object):
+    """COCO annotations held in NumPy columns.
+
+    Images and annotations are rows in the order of the JSON file. Segmentation,
+    tokens_positive and caption values are kept as JSON text blobs and only
+    parsed on access. Annotations are grouped by image in a CSR index:
+    image_ann_rows[image_ann_ptr[i]:image_ann_ptr[i + 1]] are the annotation rows
+    of image row i, in file order, as pycocotools' imgToAnns. Annotations whose
+    image_id matches no image are left out of the index.
+
+    Attributes:
+        image_ids, image_heights, image_widths (np.ndarray): int64 image columns.
+        file_names (BlobColumn): Image file names.
+        captions (BlobColumn): Image captions, or None if no image has one.
+        ann_ids, ann_image_ids, ann_category_ids (np.ndarray): int64 annotation columns.
+        ann_bboxes (np.ndarray): (N, 4) float64 xywh boxes.
+        ann_int_bboxes (np.ndarray): bool, whether every value of a box is an integer
+            in the file, so it is written back unchanged, see bbox and bbox_lists.
+        ann_areas (np.ndarray): float64 areas.
+        ann_iscrowd (np.ndarray): int8 crowd flags.
+        segmentations (BlobColumn): Segmentation JSON of every annotation.
+        tokens_positive (BlobColumn): tokens_positive JSON, or None if no annotation has it.
+        categories (list): Category dicts as in the JSON file.
+        metadata (dict): Top-level members other than images, annotations and
+            categories, e.g. info and licenses.
+        dataset (dict): The parsed JSON, only if kept at construction.
+        image_records, ann_records (BlobColumn): JSON text of every image and
+            annotation, only if kept by load_coco_index_streaming.
+    """
+
+    # Attributes written by save, apart from the categories.
+    COLUMNS = ("image_ids", "image_heights", "image_widths", "ann_ids", "ann_image_ids", "ann_category_ids",
+               "ann_bboxes", "ann_int_bboxes", "ann_areas", "ann_iscrowd")
+    BLOBS = ("file_names", "captions", "segmentations", "tokens_positive", "image_records", "ann_records")
+    INDEX_ARRAYS = ("ann_image_rows", "image_ann_rows", "image_ann_ptr",
+                    "_image_order", "_sorted_image_ids", "_ann_order", "_sorted_ann_ids")
+
+    def __init__(self, images, annotations, categories, dataset=None, metadata=None):
+        """Initialize from image and annotation column dicts, see from_dataset."""
+        self.image_ids = images["id"]
+        self.image_heights = images["height"]
+        self.image_widths = images["width"]
+        self.file_names = images["file_name"]
+        self.captions = images.get("caption")
+        self.ann_ids = annotations["id"]
+        self.ann_image_ids = annotations["image_id"]
+        self.ann_category_ids = annotations["category_id"]
+        self.ann_bboxes = annotations["bbox"]
+        self.ann_int_bboxes = annotations["int_bbox"]
+        self.ann_areas = annotations["area"]
+        self.ann_iscrowd = annotations["iscrowd"]
+        self.segmentations = annotations["segmentation"]
+        self.tokens_positive = annotations.get("tokens_positive")
+        self.image_records = images.get("record")
+        self.ann_records = annotations.get("record")
+        self.categories = categories
+        self.metadata = metadata or {}
+        self.dataset = dataset
+        self._build_index()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Only the process that spilled the index removes the spill directory.
+        state.pop("_spill_cleanup", None)
+        return state
+
+    @classmethod
+    def from_dataset(cls, dataset, keep_dataset=False, keep_records=False):
+        """Build the index from a parsed COCO JSON dict.
+
+        Args:
+            dataset (dict): Parsed COCO JSON.
+            keep_dataset (bool): Keep a reference to dataset, e.g. to pass records through unchanged.
+            keep_records (bool): Keep the JSON text of every image and annotation in blobs instead.
+        """
+        imgs = dataset.get("images", [])
+        anns = dataset.get("annotations", [])
+        images = {
+            "id": np.array([img["id"] for img in imgs], dtype=np.int64),
+            "height": np.array([img.get("height", 0) for img in imgs], dtype=np.int64),
+            "width": np.array([img.get("width", 0) for img in imgs], dtype=np.int64),
+            "file_name": BlobColumn.from_strings(img.get("file_name") for img in imgs),
+        }
+        if any("caption" in img for img in imgs):
+            images["caption"] = BlobColumn.from_strings(img.get("caption") for img in imgs)
+        annotations = {
+            "id": np.array([ann["id"] for ann in anns], dtype=np.int64),
+            "image_id": np.array([ann["image_id"] for ann in anns], dtype=np.int64),
+            "category_id": np.array([ann.get("category_id", 0) for ann in anns], dtype=np.int64),
+            "bbox": np.array([ann.get("bbox", (0, 0, 0, 0)) for ann in anns], dtype=np.float64).reshape(-1, 4),
+            "int_bbox": np.array([_is_int_box(ann.get("bbox", ())) for ann in anns], dtype=bool),
+            "area": np.array([ann.get("area", 0) for ann in anns], dtype=np.float64),
+            "iscrowd": np.array([ann.get("iscrowd", 0) for ann in anns], dtype=np.int8),
+            "segmentation": BlobColumn.from_json(ann.get("segmentation") for ann in anns),
+        }
+        if any("tokens_positive" in ann for ann in anns):
+            annotations["tokens_positive"] = BlobColumn.from_json(ann.get("tokens_positive") for ann in anns)
+        if keep_records:
+            images["record"] = BlobColumn.from_json(imgs)
+            annotations["record"] = BlobColumn.from_json(anns)
+        metadata = {key: value for key, value in dataset.items() if key not in SECTIONS}
+        return cls(images, annotations, dataset.get("categories", []), dataset if keep_dataset else None, metadata)
+
+    def save(self, directory):
+        """Write the columns, blobs and lookup arrays to a directory, see load."""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.COLUMNS + self.INDEX_ARRAYS:
+            np.save(os.path.join(directory, name.lstrip("_") + ".npy"), np.asarray(getattr(self, name)))
+        blobs = [name for name in self.BLOBS if getattr(self, name) is not None]
+        for name in blobs:
+            getattr(self, name).save(os.path.join(directory, name))
+        with open(os.path.join(directory, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"blobs": blobs, "categories": self.categories, "metadata": self.metadata}, f)
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map an index written by save; nothing is parsed or re-sorted."""
+        with open(os.path.join(directory, "index.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls.__new__(cls)
+        for name in cls.COLUMNS + cls.INDEX_ARRAYS:
+            setattr(index, name, np.load(os.path.join(directory, name.lstrip("_") + ".npy"), mmap_mode="r"))
+        for name in cls.BLOBS:
+            setattr(index, name, BlobColumn.load(os.path.join(directory, name)) if name in meta["blobs"] else None)
+        index.categories = meta["categories"]
+        index.metadata = meta["metadata"]
+        index.dataset = None
+        index._cats = {cat["id"]: cat for cat in index.categories}
+        return index
+
+    def _build_index(self):
+        """Build the image id lookup and the CSR image to annotation index."""
+        num_images = len(self.image_ids)
+        self._image_order = np.argsort(self.image_ids, kind="stable")
+        self._sorted_image_ids = self.image_ids[self._image_order]
+        self.ann_image_rows = self.image_rows(self.ann_image_ids)
+
+        valid = np.flatnonzero(self.ann_image_rows >= 0)
+        self.image_ann_rows = valid[np.argsort(self.ann_image_rows[valid], kind="stable")]
+        self.image_ann_ptr = np.zeros(num_images + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.ann_image_rows[valid], minlength=num_images), out=self.image_ann_ptr[1:])
+
+        self._ann_order = np.argsort(self.ann_ids, kind="stable")
+        self._sorted_ann_ids = self.ann_ids[self._ann_order]
+        self._cats = {cat["id"]: cat for cat in self.categories}
+
+    @staticmethod
+    def _lookup(sorted_ids, order, ids):
+        """Map ids to rows through a sorted id column; -1 where an id is unknown."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(sorted_ids):
+            return np.full(ids.shape, -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+        return np.where(sorted_ids[pos] == ids, order[pos], -1)
+
+    def image_rows(self, image_ids):
+        """Return the image rows of image ids (-1 if unknown)."""
+        return self._lookup(self._sorted_image_ids, self._image_order, image_ids)
+
+    def ann_rows(self, ann_ids):
+        """Return the annotation rows of annotation ids (-1 if unknown)."""
+        return self._lookup(self._sorted_ann_ids, self._ann_order, ann_ids)
+
+    def image_annotation_rows(self, image_row):
+        """Return the annotation rows of image row image_row."""
+        return self.image_ann_rows[self.image_ann_ptr[image_row]:self.image_ann_ptr[image_row + 1]]
+
+    @property
+    def num_images(self):
+        return len(self.image_ids)
+
+    @property
+    def num_annotations(self):
+        return len(self.ann_ids)
+
+    @staticmethod
+    def _check_rows(rows, ids, what):
+        """Return rows, raising KeyError with the ids whose rows are -1, as pycocotools does for unknown ids."""
+        missing = np.flatnonzero(np.asarray(rows) < 0)
+        if len(missing):
+            raise KeyError(f"Unknown {what} {np.asarray(ids).reshape(-1)[missing].tolist()}")
+        return rows
+
+    def image_dict(self, row):
+        """Build the COCO image dict of an image row."""
+        self._check_rows([row], [row], "image rows")
+        img = {"id": int(self.image_ids[row]), "file_name": self.file_names.get(row),
+               "height": int(self.image_heights[row]), "width": int(self.image_widths[row])}
+        if self.captions is not None and self.captions.get(row):
+            img["caption"] = self.captions.get(row)
+        return img
+
+    def ann_dict(self, row):
+        """Build the COCO annotation dict of an annotation row."""
+        self._check_rows([row], [row], "annotation rows")
+        ann = {"id": int(self.ann_ids[row]), "image_id": int(self.ann_image_ids[row]),
+               "category_id": int(self.ann_category_ids[row]), "bbox": self.bbox(row),
+               "area": float(self.ann_areas[row]), "iscrowd": int(self.ann_iscrowd[row])}
+        segmentation = self.segmentations.get_json(row)
+        if segmentation is not None:
+            ann["segmentation"] = segmentation
+        if self.tokens_positive is not None:
+            tokens_positive = self.tokens_positive.get_json(row)
+            if tokens_positive is not None:
+                ann["tokens_positive"] = tokens_positive
+        return ann
+
+    def bbox(self, row):
+        """Return the xywh box of an annotation row, with ints if the file had ints."""
+        bbox = self.ann_bboxes[row].tolist()
+        return [int(value) for value in bbox] if self.ann_int_bboxes[row] else bbox
+
+    def bbox_lists(self):
+        """Return the xywh box of every annotation row, as bbox."""
+        bboxes = self.ann_bboxes.tolist()
+        for row in np.flatnonzero(self.ann_int_bboxes).tolist():
+            bboxes[row] = [int(value) for value in bboxes[row]]
+        return bboxes
+
+    def image_record(self, row):
+        """Return the image dict of a row as in the JSON file; needs a kept dataset or records."""
+        if self.dataset is not None:
+            return self.dataset["images"][row]
+        return self.image_records.get_json(row)
+
+    def ann_record(self, row):
+        """Return the annotation dict of a row as in the JSON file; needs a kept dataset or records."""
+        if self.dataset is not None:
+            return self.dataset["annotations"][row]
+        return self.ann_records.get_json(row)
+
+    # Subset of the pycocotools COCO API used by the dataset_prepare scripts.
+
+    def getImgIds(self):
+        return self.image_ids.tolist()
+
+    def getCatIds(self):
+        return [cat["id"] for cat in self.categories]
+
+    def getAnnIds(self, imgIds=()):
+        """Return annotation ids of the given image ids, or all annotation ids if empty."""
+        if np.isscalar(imgIds):
+            imgIds = [imgIds]
+        if not len(imgIds):
+            return self.ann_ids.tolist()
+        rows = [self.image_annotation_rows(row) for row in self.image_rows(imgIds) if row >= 0]
+        return self.ann_ids[np.concatenate(rows)].tolist() if rows else []
+
+    def loadImgs(self, ids):
+        if np.isscalar(ids):
+            ids = [ids]
+        return [self.image_dict(row) for row in self._check_rows(self.image_rows(ids), ids, "image ids")]
+
+    def loadAnns(self, ids):
+        if np.isscalar(ids):
+            ids = [ids]
+        return [self.ann_dict(row) for row in self._check_rows(self.ann_rows(ids), ids, "annotation ids")]
+
+    def loadCats(self, ids):
+        if np.isscalar(ids):
+            ids = [ids]
+        return [self._cats[cat_id] for cat_id in ids]
+
+
+def contiguous_category_table(cat_ids):
+    """Build a lookup table that maps category ids to contiguous labels.
+
+    Args:
+        cat_ids (list): Original category ids; cat_ids[i] is mapped to label i.
+
+    Returns:
+        np.ndarray: int64 table indexed by original id, -1 for ids not in cat_ids.
+    """
+    cat_ids = np.asarray(cat_ids, dtype=np.int64)
+    if len(cat_ids) and cat_ids.min() < 0:
+        raise ValueError(f"Negative category id {cat_ids.min()}")
+    table = np.full(cat_ids.max() + 1 if len(cat_ids) else 0, -1, dtype=np.int64)
+    table[cat_ids] = np.arange(len(cat_ids), dtype=np.int64)
+    return table
+
+
+def remap_category_ids(table, category_ids):
+    """Translate category ids to contiguous labels with a contiguous_category_table.
+
+    Raises:
+        ValueError: If an id has no label in the table.
+    """
+    category_ids = np.asarray(category_ids, dtype=np.int64)
+    known = (category_ids >= 0) & (category_ids < len(table))
+    labels = np.full(category_ids.shape, -1, dtype=np.int64)
+    labels[known] = table[category_ids[known]]
+    if (labels < 0).any():
+        raise ValueError(f"Category id {category_ids[labels < 0][0]} is not in the category map")
+    return labels
+
+
+class _BlobSpill(object):
+    """Append-only BlobColumn backed by a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "wb")
+        self.offsets = array("q", [0])
+        self.num_values = 0
+
+    def append(self, text):
+        data = text.encode("utf-8") if text else b""
+        self.f.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+        self.num_values += bool(data)
+
+    def append_json(self, value):
+        self.append(None if value is None else json.dumps(value, separators=(",", ":")))
+
+    def close(self):
+        """Close the file and return it as a memory-mapped BlobColumn."""
+        self.f.close()
+        offsets = np.array(self.offsets, dtype=np.int64)
+        blob = np.memmap(self.path, dtype=np.uint8, mode="r") if offsets[-1] else b""
+        return BlobColumn(blob, offsets)
+
+
+def load_coco_index_streaming(annotation_file, keep_records=False, spill_dir=None):
+    """Load a COCO JSON file into a CocoIndex without parsing it whole.
+
+    Images and annotations are read one at a time. Numeric columns stay in
+    memory; strings, segmentations and the image to annotation grouping are
+    spilled to memory-mapped files in a temporary directory that is removed
+    with the index.
+
+    Args:
+        annotation_file (str): COCO JSON file.
+        keep_records (bool): Also spill the JSON text of every image and annotation,
+            see CocoIndex.image_record and CocoIndex.ann_record.
+        spill_dir (str): Parent of the temporary directory. Defaults to the system temp dir.
+    """
+    spill_path = tempfile.mkdtemp(prefix="coco_index_", dir=spill_dir)
+    try:
+        def spill(name):
+            return _BlobSpill(os.path.join(spill_path, name))
+
+        image_cols = {"id": array("q"), "height": array("q"), "width": array("q")}
+        image_blobs = {"file_name": spill("file_name.bin"), "caption": spill("caption.bin")}
+        ann_cols = {"id": array("q"), "image_id": array("q"), "category_id": array("q"),
+                    "bbox": array("d"), "int_bbox": array("b"), "area": array("d"), "iscrowd": array("b")}
+        ann_blobs = {"segmentation": spill("segmentation.bin"), "tokens_positive": spill("tokens_positive.bin")}
+        if keep_records:
+            image_blobs["record"] = spill("image_record.bin")
+            ann_blobs["record"] = spill("ann_record.bin")
+        categories = []
+        metadata = {}
+
+        for key, event, value in iter_json_events(annotation_file):
+            if key not in SECTIONS:
+                # Small members such as info and licenses are kept whole.
+                if event == "value":
+                    metadata[key] = value
+                elif event == "start_array":
+                    metadata[key] = []
+                elif event == "item":
+                    metadata[key].append(value)
+                continue
+            if event != "item":
+                continue
+            if key == "images":
+                image_cols["id"].append(value["id"])
+                image_cols["height"].append(value.get("height", 0))
+                image_cols["width"].append(value.get("width", 0))
+                image_blobs["file_name"].append(value.get("file_name"))
+                image_blobs["caption"].append(value.get("caption"))
+                if keep_records:
+                    image_blobs["record"].append_json(value)
+            elif key == "annotations":
+                ann_cols["id"].append(value["id"])
+                ann_cols["image_id"].append(value["image_id"])
+                ann_cols["category_id"].append(value.get("category_id", 0))
+                bbox = value.get("bbox", (0, 0, 0, 0))
+                ann_cols["bbox"].extend(bbox)
+                ann_cols["int_bbox"].append(_is_int_box(bbox))
+                ann_cols["area"].append(value.get("area", 0))
+                ann_cols["iscrowd"].append(value.get("iscrowd", 0))
+                ann_blobs["segmentation"].append_json(value.get("segmentation"))
+                ann_blobs["tokens_positive"].append_json(value.get("tokens_positive"))
+                if keep_records:
+                    ann_blobs["record"].append_json(value)
+            else:
+                categories.append(value)
+
+        images = {name: np.array(col, dtype=np.int64) for name, col in image_cols.items()}
+        has_caption = image_blobs["caption"].num_values > 0
+        images.update({name: blob.close() for name, blob in image_blobs.items()})
+        if not has_caption:
+            del images["caption"]
+
+        annotations = {name: np.array(ann_cols[name], dtype=np.int64) for name in ("id", "image_id", "category_id")}
+        annotations["bbox"] = np.array(ann_cols["bbox"], dtype=np.float64).reshape(-1, 4)
+        annotations["int_bbox"] = np.array(ann_cols["int_bbox"], dtype=bool)
+        annotations["area"] = np.array(ann_cols["area"], dtype=np.float64)
+        annotations["iscrowd"] = np.array(ann_cols["iscrowd"], dtype=np.int8)
+        has_tokens = ann_blobs["tokens_positive"].num_values > 0
+        annotations.update({name: blob.close() for name, blob in ann_blobs.items()})
+        if not has_tokens:
+            del annotations["tokens_positive"]
+        del image_cols, ann_cols
+
+        index = CocoIndex(images, annotations, categories, metadata=metadata)
+        for name in ("ann_image_rows", "image_ann_rows"):
+            array_path = os.path.join(spill_path, name + ".npy")
+            np.save(array_path, getattr(index, name))
+            setattr(index, name, np.load(array_path, mmap_mode="r"))
+    except BaseException:
+        shutil.rmtree(spill_path, ignore_errors=True)
+        raise
+    index._spill_cleanup = weakref.finalize(index, shutil.rmtree, spill_path, True)
+    return index
+
+
+def load_coco_index(annotation_file, keep_dataset=False, streaming=False, spill_dir=None):
+    """Load a COCO JSON file into a CocoIndex.
+
+    Args:
+        annotation_file (str): COCO JSON file, optionally .gz or .zst compressed.
+        keep_dataset (bool): Keep the original image and annotation dicts, see CocoIndex.image_record.
+        streaming (bool): Parse the file incrementally with bounded memory, see load_coco_index_streaming.
+        spill_dir (str): Parent of the streaming spill directory.
+    """
+    if streaming:
+        return load_coco_index_streaming(annotation_file, keep_records=keep_dataset, spill_dir=spill_dir)
+    with open_text(annotation_file) as f:
+        dataset = json.load(f)
+    return CocoIndex.from_dataset(dataset, keep_dataset=keep_dataset)
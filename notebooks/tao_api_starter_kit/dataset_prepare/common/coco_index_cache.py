@@ -0,0 +1,149 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""On-disk cache of binary CocoIndex builds, keyed by annotation file content."""
+
+import hashlib
+import json
+import os
+import shutil
+
+from common.coco_index import CocoIndex, load_coco_index_streaming
+from common.framed_io import open_text
+
+DEFAULT_MAX_CACHE_GB = 20
+
+
+def file_sha1(path, chunk_size=8 << 20):
+    """Return the SHA-1 hex digest of a file's content."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+class CocoIndexCache(object):
+    """Directory of memory-mappable CocoIndex builds.
+
+    Every entry is a CocoIndex.save directory named after the SHA-1 of the
+    annotation file it was built from and the cache layout version. sources.json remembers the size, mtime
+    and hash last seen for each annotation path, so an unchanged file is
+    looked up without being hashed again. A file whose size or mtime changed
+    is re-hashed, and rebuilt if its content changed. The least recently used
+    entries are removed to keep the directory under max_bytes.
+    """
+
+    VERSION = 4
+
+    def __init__(self, cache_dir, max_gb=DEFAULT_MAX_CACHE_GB):
+        """Initialize.
+
+        Args:
+            cache_dir (str): Cache directory, created if missing.
+            max_gb (float): Size limit of the cache directory in GiB.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_gb * (1 << 30))
+        self.sources_file = os.path.join(cache_dir, "sources.json")
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _load_sources(self):
+        if os.path.exists(self.sources_file):
+            with open(self.sources_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                return data["sources"]
+        return {}
+
+    def _save_sources(self, sources):
+        tmp_file = f"{self.sources_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "sources": sources}, f)
+        os.replace(tmp_file, self.sources_file)
+
+    def entry_dir(self, sha1, keep_records=False):
+        """Return the directory of the entry built from content sha1."""
+        return os.path.join(self.cache_dir, f"{sha1}-v{self.VERSION}" + ("-records" if keep_records else ""))
+
+    def lookup(self, annotation_file):
+        """Return the content hash of an annotation file, hashing it only if it changed on disk."""
+        path = os.path.abspath(annotation_file)
+        stat = os.stat(path)
+        sources = self._load_sources()
+        source = sources.get(path)
+        if source and source["size"] == stat.st_size and source["mtime_ns"] == stat.st_mtime_ns:
+            return source["sha1"]
+
+        sha1 = file_sha1(path)
+        sources[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": sha1}
+        self._save_sources(sources)
+        return sha1
+
+    def load(self, annotation_file, keep_records=False, streaming=False):
+        """Return the CocoIndex of an annotation file, building and caching it on a miss.
+
+        Args:
+            annotation_file (str): COCO JSON file.
+            keep_records (bool): Cache the raw image and annotation records too,
+                see CocoIndex.image_record.
+            streaming (bool): Build a missing entry with load_coco_index_streaming.
+        """
+        entry = self.entry_dir(self.lookup(annotation_file), keep_records)
+        if os.path.exists(os.path.join(entry, "index.json")):
+            os.utime(entry)
+            return CocoIndex.load(entry)
+
+        if streaming:
+            coco = load_coco_index_streaming(annotation_file, keep_records=keep_records)
+        else:
+            with open_text(annotation_file) as f:
+                coco = CocoIndex.from_dataset(json.load(f), keep_records=keep_records)
+        tmp_entry = f"{entry}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        coco.save(tmp_entry)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.rename(tmp_entry, entry)
+        self.evict(keep=entry)
+        return CocoIndex.load(entry)
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in max_bytes.
+
+        Args:
+            keep (str): Entry directory that is never removed, e.g. the one just built.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.isdir(path) and not name.endswith(".tmp"):
+                entries.append((os.stat(path).st_mtime, path, _dir_size(path)))
+        total = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def load_coco_index_cached(annotation_file, cache_dir, max_gb=DEFAULT_MAX_CACHE_GB,
+                           keep_records=False, streaming=False):
+    """Load a CocoIndex through a CocoIndexCache in cache_dir."""
+    return CocoIndexCache(cache_dir, max_gb).load(annotation_file, keep_records, streaming)
@@ -0,0 +1,119 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Streaming writer for COCO JSON files."""
+
+import json
+
+import ujson
+
+from common.framed_io import DEFAULT_FRAME_RECORDS, FramedWriter
+
+
+class CocoJsonWriter(object):
+    """Write a COCO JSON object one array element at a time.
+
+    The output is identical to ``ujson.dumps(coco_json, indent=indent)`` of the
+    equivalent dict, but only one element is held in memory at a time.
+
+    Usage:
+        with CocoJsonWriter(path) as writer:
+            writer.begin_array("images")
+            for image in images:
+                writer.write(image)
+            writer.end_array()
+            ...
+    """
+
+    def __init__(self, output_path, indent=4):
+        """Initialize.
+
+        Args:
+            output_path (str): Output JSON file.
+            indent (int): Indentation width. 0 writes compact JSON without whitespace.
+        """
+        self.indent = indent
+        self.f = open(output_path, "w", encoding="utf-8")
+        self.num_arrays = 0
+        self.num_elements = 0
+        self.f.write("{")
+
+    def _newline(self, level):
+        return "\n" + " " * (self.indent * level) if self.indent else ""
+
+    def begin_array(self, name):
+        """Start the top-level array ``name``."""
+        if self.num_arrays:
+            self.f.write(",")
+        self.f.write(self._newline(1) + ujson.dumps(name) + (": [" if self.indent else ":["))
+        self.num_arrays += 1
+        self.num_elements = 0
+
+    def write(self, element):
+        """Append one element to the current array."""
+        if self.num_elements:
+            self.f.write(",")
+        text = ujson.dumps(element, indent=self.indent)
+        if self.indent:
+            text = text.replace("\n", self._newline(2))
+        self.f.write(self._newline(2) + text)
+        self.num_elements += 1
+
+    def end_array(self):
+        """Close the current array."""
+        if self.num_elements:
+            self.f.write(self._newline(1))
+        self.f.write("]")
+
+    def close(self):
+        """Close the JSON object and the file."""
+        if self.f.closed:
+            return
+        if self.num_arrays:
+            self.f.write(self._newline(0))
+        self.f.write("}")
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def dump_json_arrays(output_path, sections, frame_records=DEFAULT_FRAME_RECORDS):
+    """Write an object of arrays whose elements are produced lazily.
+
+    The output is identical to ``json.dump(dict(sections), f)`` but only one
+    element is held in memory at a time. A .gz or .zst output_path is
+    compressed in frames of frame_records elements, see FramedWriter.
+
+    Args:
+        output_path (str): Output JSON file.
+        sections (list): (name, iterable of elements) pairs, in output order.
+            A dict, str or number is written whole as a plain member, e.g. info.
+        frame_records (int): Array elements per compressed frame.
+    """
+    with FramedWriter(output_path, frame_records) as f:
+        f.write("{")
+        for idx, (name, elements) in enumerate(sections):
+            if elements is None or isinstance(elements, (dict, str, int, float)):
+                f.write((", " if idx else "") + json.dumps(name) + ": " + json.dumps(elements))
+                continue
+            f.write((", " if idx else "") + json.dumps(name) + ": [")
+            for num, element in enumerate(elements):
+                f.write((", " if num else "") + json.dumps(element))
+                f.end_record()
+            f.write("]")
+        f.write("}")
@@ -0,0 +1,193 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Frame-bundle shards: KITTI frames packed into tar files with a JSON index.
+
+Every shard is a plain tar file holding the files of consecutive frames, one
+member group per frame, named <subdir>/<file name> as in the dataset tree, so
+`tar -xf` restores the directory layout. index.json maps every frame to its
+shard and to the data offset and size of each of its members, so a file can
+be read, or memory-mapped, straight from the shard without scanning the tar.
+"""
+
+import json
+import multiprocessing
+import os
+import tarfile
+
+import numpy as np
+
+KITTI_SUBDIRS = ("calib", "image_2", "label_2", "velodyne")
+SHARD_INDEX = "index.json"
+DEFAULT_FRAMES_PER_SHARD = 1000
+
+
+def is_shard_dir(path):
+    """Return whether path is a directory of frame shards."""
+    return os.path.isfile(os.path.join(path, SHARD_INDEX))
+
+
+def list_frame_files(source_dir, subdirs=KITTI_SUBDIRS):
+    """List every subdir of source_dir once.
+
+    Returns:
+        dict: subdir to dict of frame name to file name; missing subdirs are left out.
+    """
+    files = {}
+    for subdir in subdirs:
+        if os.path.isdir(os.path.join(source_dir, subdir)):
+            files[subdir] = {os.path.splitext(name)[0]: name for name in os.listdir(os.path.join(source_dir, subdir))}
+    return files
+
+
+def export_frame_shards(source_dir, frames, shard_dir, frames_per_shard=DEFAULT_FRAMES_PER_SHARD,
+                        subdirs=KITTI_SUBDIRS):
+    """Pack the files of frames under source_dir/<subdir> into shards in shard_dir.
+
+    Args:
+        source_dir (str): Directory holding the subdirs, e.g. KITTI training.
+        frames (list): Frame names, e.g. "000123"; a frame missing from a subdir
+            has no member for it.
+        shard_dir (str): Output directory of shard-NNNNN.tar files and index.json.
+        frames_per_shard (int): Frames per shard.
+        subdirs (tuple): Subdirectories to pack.
+
+    Returns:
+        int: Number of shards written.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    files = list_frame_files(source_dir, subdirs)
+    shards, index = [], {}
+    for start in range(0, len(frames), frames_per_shard):
+        shard = f"shard-{len(shards):05d}.tar"
+        shard_path = os.path.join(shard_dir, shard)
+        with tarfile.open(shard_path, "w") as tar:
+            for frame in frames[start:start + frames_per_shard]:
+                for subdir, names in files.items():
+                    if frame in names:
+                        tar.add(os.path.join(source_dir, subdir, names[frame]),
+                                arcname=f"{subdir}/{names[frame]}", recursive=False)
+        # Data offsets are only known once the headers are written.
+        with tarfile.open(shard_path, "r") as tar:
+            for member in tar:
+                subdir, name = member.name.split("/", 1)
+                entry = index.setdefault(os.path.splitext(name)[0], {"shard": len(shards), "members": {}})
+                entry["members"][subdir] = [member.name, member.offset_data, member.size]
+        shards.append(shard)
+
+    tmp_file = os.path.join(shard_dir, SHARD_INDEX + ".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "shards": shards, "frames": index}, f)
+    os.replace(tmp_file, os.path.join(shard_dir, SHARD_INDEX))
+    return len(shards)
+
+
+def _extract_shard(shard_path, output_dir):
+    """Write the members of one shard under output_dir; return their number."""
+    count = 0
+    with tarfile.open(shard_path, "r") as tar:
+        for member in tar:
+            parts = member.name.split("/")
+            if not member.isfile() or len(parts) != 2 or any(part in ("", ".", "..") for part in parts):
+                raise ValueError(f"Unexpected member {member.name} in {shard_path}")
+            os.makedirs(os.path.join(output_dir, parts[0]), exist_ok=True)
+            with open(os.path.join(output_dir, member.name), "wb") as f:
+                f.write(tar.extractfile(member).read())
+            count += 1
+    return count
+
+
+class FrameShards(object):
+    """Read access to the frames of a shard directory written by export_frame_shards."""
+
+    def __init__(self, shard_dir):
+        """Initialize.
+
+        Args:
+            shard_dir (str): Directory holding index.json and the shards.
+        """
+        self.shard_dir = shard_dir
+        with open(os.path.join(shard_dir, SHARD_INDEX), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.shards = [os.path.join(shard_dir, shard) for shard in index["shards"]]
+        self.index = index["frames"]
+        self._files = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def frames(self):
+        """Return the frame names in shard order."""
+        return list(self.index)
+
+    def file_names(self, subdir):
+        """Return the file names of subdir, as os.listdir of the extracted subdir."""
+        return [os.path.basename(entry["members"][subdir][0])
+                for entry in self.index.values() if subdir in entry["members"]]
+
+    def member(self, frame, subdir):
+        """Return (shard path, data offset, size) of the subdir file of a frame."""
+        entry = self.index.get(frame)
+        if entry is None or subdir not in entry["members"]:
+            raise KeyError(f"Frame {frame} has no {subdir} file in {self.shard_dir}")
+        _, offset, size = entry["members"][subdir]
+        return self.shards[entry["shard"]], offset, size
+
+    def open(self, frame, subdir):
+        """Return a binary file positioned at the start of the subdir file of a frame.
+
+        The file is shared by all reads of the shard; it is not bounded to the member.
+        """
+        shard_path, offset, _ = self.member(frame, subdir)
+        f = self._files.get(shard_path)
+        if f is None:
+            f = self._files[shard_path] = open(shard_path, "rb")
+        f.seek(offset)
+        return f
+
+    def read(self, frame, subdir):
+        """Return the content of the subdir file of a frame."""
+        _, _, size = self.member(frame, subdir)
+        return self.open(frame, subdir).read(size)
+
+    def memmap(self, frame, subdir, dtype):
+        """Memory-map the subdir file of a frame as a 1-D array of dtype."""
+        shard_path, offset, size = self.member(frame, subdir)
+        if size == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(shard_path, dtype=dtype, mode="r", offset=offset, shape=size // np.dtype(dtype).itemsize)
+
+    def extract(self, output_dir, workers=1):
+        """Restore the <subdir>/<file name> layout of every shard under output_dir.
+
+        Returns:
+            int: Number of files written.
+        """
+        jobs = [(shard_path, output_dir) for shard_path in self.shards]
+        if workers > 1:
+            with multiprocessing.Pool(workers) as pool:
+                return sum(pool.starmap(_extract_shard, jobs, chunksize=1))
+        return sum(_extract_shard(*job) for job in jobs)
+
+    def close(self):
+        """Close the shard files opened by read."""
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def __getstate__(self):
+        # Open files are not carried to worker processes.
+        state = self.__dict__.copy()
+        state["_files"] = {}
+        return state
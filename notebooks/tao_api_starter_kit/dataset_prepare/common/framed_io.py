@@ -0,0 +1,240 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Plain, gzip or zstd record files with a random-access index.
+
+Compressed files are written as a sequence of independently decompressible
+frames of a fixed number of records. Concatenated gzip members and zstd
+frames are still valid gzip/zstd streams, so the files can be read whole by
+any standard tool. Compression is selected by the file extension.
+"""
+
+import gzip
+import io
+import os
+
+import numpy as np
+
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+DEFAULT_FRAME_RECORDS = 1000
+
+
+def compression_of(path):
+    """Return "gzip", "zstd" or None from the extension of path."""
+    ext = os.path.splitext(path)[1]
+    for compression, compression_ext in COMPRESSION_EXTENSIONS.items():
+        if ext == compression_ext:
+            return compression
+    return None
+
+
+def compressed_path(path, compression):
+    """Append the extension of compression (None for plain) to path."""
+    if not compression:
+        return path
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise ValueError(f"Unsupported compression {compression}, expected one of {list(COMPRESSION_EXTENSIONS)}")
+    return path + COMPRESSION_EXTENSIONS[compression]
+
+
+def strip_compression(path):
+    """Remove a compression extension from path."""
+    return os.path.splitext(path)[0] if compression_of(path) else path
+
+
+def index_path(path):
+    """Return the index file of a record file.
+
+    Plain files use <stem>.idx holding N + 1 little-endian uint64 record
+    offsets. Compressed files use <path>.fidx, an .npz with the record
+    offsets into the decompressed stream ("records"), the compressed offset
+    of every frame plus the file size ("frames") and the first record of
+    every frame plus the record count ("frame_records").
+    """
+    if compression_of(path):
+        return path + ".fidx"
+    return os.path.splitext(path)[0] + ".idx"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd compression requires the zstandard package: pip install zstandard") from e
+    return zstandard
+
+
+def compress_frame(data, compression, level=None):
+    """Compress data into one self-contained gzip member or zstd frame."""
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6 if level is None else level, mtime=0)
+    if compression == "zstd":
+        return _zstd().ZstdCompressor(level=3 if level is None else level).compress(data)
+    raise ValueError(f"Unsupported compression {compression}")
+
+
+def decompress_frame(data, compression):
+    """Decompress one frame written by compress_frame."""
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        return _zstd().ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unsupported compression {compression}")
+
+
+def open_text(path):
+    """Open a plain, gzip or zstd file for reading as UTF-8 text."""
+    compression = compression_of(path)
+    if compression == "gzip":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if compression == "zstd":
+        reader = _zstd().ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(io.BufferedReader(reader), encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+class FramedWriter(object):
+    """Write records to a plain or compressed file and index them.
+
+    Usage:
+        with FramedWriter(path) as writer:
+            for line in lines:
+                writer.write(line)
+                writer.end_record()
+    """
+
+    def __init__(self, path, frame_records=DEFAULT_FRAME_RECORDS, level=None, write_index=None):
+        """Initialize.
+
+        Args:
+            path (str): Output file; a .gz or .zst extension selects compression.
+            frame_records (int): Records per compressed frame.
+            level (int): Compression level. Defaults to the codec default.
+            write_index (bool): Write the index file on close. Defaults to
+                True for compressed files and False for plain ones.
+        """
+        self.path = path
+        self.compression = compression_of(path)
+        self.frame_records = frame_records
+        self.level = level
+        self.write_index = bool(self.compression) if write_index is None else write_index
+        self.f = open(path, "wb")
+        self.record_offsets = [0]
+        self.frame_offsets = [0]
+        self.frame_first_records = [0]
+        self.buffer = []
+        self.pending = 0
+
+    @property
+    def num_records(self):
+        return len(self.record_offsets) - 1
+
+    def write(self, data):
+        """Append str or bytes to the current record."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if self.compression:
+            self.buffer.append(data)
+        else:
+            self.f.write(data)
+        self.pending += len(data)
+
+    def end_record(self):
+        """Close the current record; a frame is compressed every frame_records records."""
+        self.record_offsets.append(self.record_offsets[-1] + self.pending)
+        self.pending = 0
+        if self.compression and self.num_records - self.frame_first_records[-1] >= self.frame_records:
+            self._flush_frame()
+
+    def _flush_frame(self):
+        if not self.buffer:
+            return
+        frame = compress_frame(b"".join(self.buffer), self.compression, self.level)
+        self.f.write(frame)
+        self.frame_offsets.append(self.frame_offsets[-1] + len(frame))
+        self.frame_first_records.append(self.num_records)
+        self.buffer = []
+
+    def close(self):
+        """Flush the last frame, close the file and write the index."""
+        if self.f.closed:
+            return
+        self._flush_frame()
+        self.f.close()
+        if not self.write_index:
+            return
+        offsets = np.asarray(self.record_offsets, dtype="<u8")
+        if self.compression:
+            with open(index_path(self.path), "wb") as f:
+                np.savez(f, records=offsets, frames=np.asarray(self.frame_offsets, dtype="<u8"),
+                         frame_records=np.asarray(self.frame_first_records, dtype="<u8"))
+        else:
+            offsets.tofile(index_path(self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class FramedReader(object):
+    """Random access to the records of a file written by FramedWriter.
+
+    Only the frame holding a record is read and decompressed; the last
+    decompressed frame is kept for sequential reads.
+    """
+
+    def __init__(self, path):
+        """Initialize from path and its index file."""
+        self.path = path
+        self.compression = compression_of(path)
+        if self.compression:
+            with np.load(index_path(path)) as index:
+                self.records = index["records"]
+                self.frames = index["frames"]
+                self.frame_records = index["frame_records"]
+        else:
+            self.records = np.fromfile(index_path(path), dtype="<u8")
+        self.f = open(path, "rb")
+        self.frame_idx = None
+        self.frame_data = None
+
+    def __len__(self):
+        return len(self.records) - 1
+
+    def read_record(self, k):
+        """Return record k as bytes."""
+        start, end = int(self.records[k]), int(self.records[k + 1])
+        if not self.compression:
+            self.f.seek(start)
+            return self.f.read(end - start)
+
+        frame_idx = int(np.searchsorted(self.frame_records, k, side="right")) - 1
+        if frame_idx != self.frame_idx:
+            self.f.seek(int(self.frames[frame_idx]))
+            data = self.f.read(int(self.frames[frame_idx + 1] - self.frames[frame_idx]))
+            self.frame_data = decompress_frame(data, self.compression)
+            self.frame_idx = frame_idx
+        base = int(self.records[self.frame_records[frame_idx]])
+        return self.frame_data[start - base:end - base]
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,197 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Read image dimensions from file headers without decoding pixels."""
+
+import io
+import json
+import os
+import struct
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SOI = b"\xff\xd8"
+TIFF_LE = b"II*\x00"
+TIFF_BE = b"MM\x00*"
+
+# Start-of-frame markers carry the frame size. C4 (DHT), C8 (JPG) and CC (DAC)
+# share the range but are not frames.
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field.
+JPEG_STANDALONE_MARKERS = set(range(0xD0, 0xDA)) | {0x01}
+
+TIFF_IMAGE_WIDTH = 256
+TIFF_IMAGE_LENGTH = 257
+TIFF_ORIENTATION = 274
+
+
+def _read_tiff_tags(fp, tags):
+    """Read SHORT/LONG values of the requested tags from IFD0 of a TIFF stream."""
+    base = fp.tell()
+    header = fp.read(8)
+    if len(header) < 8 or header[:4] not in (TIFF_LE, TIFF_BE):
+        raise ValueError("Invalid TIFF header")
+    endian = "<" if header[:2] == b"II" else ">"
+    ifd_offset = struct.unpack(endian + "I", header[4:8])[0]
+    fp.seek(base + ifd_offset)
+    num_entries = struct.unpack(endian + "H", fp.read(2))[0]
+    entries = fp.read(12 * num_entries)
+
+    values = {}
+    for i in range(num_entries):
+        tag, field_type, _, value = struct.unpack(endian + "HHI4s", entries[12 * i: 12 * (i + 1)])
+        if tag not in tags:
+            continue
+        if field_type == 3:  # SHORT
+            values[tag] = struct.unpack(endian + "H", value[:2])[0]
+        elif field_type == 4:  # LONG
+            values[tag] = struct.unpack(endian + "I", value)[0]
+    return values
+
+
+def _png_size(fp):
+    """Read (height, width) from the PNG IHDR chunk."""
+    header = fp.read(24)
+    if len(header) < 24 or header[12:16] != b"IHDR":
+        raise ValueError("Invalid PNG header")
+    width, height = struct.unpack(">II", header[16:24])
+    return height, width
+
+
+def _jpeg_size(fp):
+    """Read (height, width) from the JPEG SOF segment, honouring EXIF orientation."""
+    fp.read(2)
+    orientation = 1
+    while True:
+        byte = fp.read(1)
+        while byte and byte != b"\xff":
+            byte = fp.read(1)
+        # Skip fill bytes between markers.
+        while byte == b"\xff":
+            byte = fp.read(1)
+        if not byte:
+            raise ValueError("Reached end of JPEG stream before SOF marker")
+        marker = byte[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        length = struct.unpack(">H", fp.read(2))[0]
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width = struct.unpack(">BHH", fp.read(5))
+            break
+        if marker == 0xE1:
+            segment = fp.read(length - 2)
+            if segment[:6] == b"Exif\x00\x00":
+                try:
+                    tags = _read_tiff_tags(io.BytesIO(segment[6:]), {TIFF_ORIENTATION})
+                    orientation = tags.get(TIFF_ORIENTATION, 1)
+                except (ValueError, struct.error):
+                    pass
+            continue
+        fp.seek(length - 2, os.SEEK_CUR)
+
+    # Orientations 5-8 transpose the image, as cv2.imread does on decode.
+    if orientation in (5, 6, 7, 8):
+        height, width = width, height
+    return height, width
+
+
+def _tiff_size(fp):
+    """Read (height, width) from the first TIFF IFD."""
+    tags = _read_tiff_tags(fp, {TIFF_IMAGE_WIDTH, TIFF_IMAGE_LENGTH})
+    if TIFF_IMAGE_WIDTH not in tags or TIFF_IMAGE_LENGTH not in tags:
+        raise ValueError("TIFF IFD0 has no image dimensions")
+    return tags[TIFF_IMAGE_LENGTH], tags[TIFF_IMAGE_WIDTH]
+
+
+def read_image_size(fp, name="<stream>"):
+    """Return (height, width) of the JPEG, PNG or TIFF image starting at the current position of fp.
+
+    Args:
+        fp (file): Binary file object, e.g. a shard positioned at a member.
+        name (str): Name used in error messages.
+    """
+    start = fp.tell()
+    magic = fp.read(8)
+    fp.seek(start)
+    try:
+        if magic.startswith(PNG_SIGNATURE):
+            return _png_size(fp)
+        if magic.startswith(JPEG_SOI):
+            return _jpeg_size(fp)
+        if magic[:4] in (TIFF_LE, TIFF_BE):
+            return _tiff_size(fp)
+    except struct.error as e:
+        raise ValueError(f"Truncated image header in {name}") from e
+    raise ValueError(f"Unsupported image format: {name}")
+
+
+def get_image_size(image_path):
+    """Return (height, width) of a JPEG, PNG or TIFF image by parsing its header.
+
+    Args:
+        image_path (str): Path to the image file.
+
+    Returns:
+        tuple: (height, width), the same as ``cv2.imread(image_path).shape[:2]``.
+    """
+    with open(image_path, "rb") as fp:
+        return read_image_size(fp, image_path)
+
+
+class ImageSizeCache(object):
+    """On-disk cache of image dimensions keyed by path, file size and mtime."""
+
+    VERSION = 1
+
+    def __init__(self, cache_file=None):
+        """Initialize.
+
+        Args:
+            cache_file (str): JSON file the cache is loaded from and saved to.
+                The cache is kept in memory only when None.
+        """
+        self.cache_file = cache_file
+        self.entries = {}
+        self.updates = {}
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.entries = data["entries"]
+
+    def get_size(self, image_path):
+        """Return (height, width) of an image, probing its header on a cache miss."""
+        image_path = os.path.abspath(image_path)
+        stat = os.stat(image_path)
+        entry = self.entries.get(image_path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2], entry[3]
+
+        height, width = get_image_size(image_path)
+        self.entries[image_path] = self.updates[image_path] = [stat.st_size, stat.st_mtime_ns, height, width]
+        return height, width
+
+    def merge(self, updates):
+        """Add entries probed by another cache instance, e.g. in a worker process."""
+        self.entries.update(updates)
+        self.updates.update(updates)
+
+    def save(self):
+        """Write the cache back to disk if it changed."""
+        if not (self.cache_file and self.updates):
+            return
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "entries": self.entries}, f)
+        os.replace(tmp_file, self.cache_file)
+        self.updates = {}
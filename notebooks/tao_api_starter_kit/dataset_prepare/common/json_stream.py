@@ -0,0 +1,151 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Event-based reader for large JSON objects such as COCO annotation files."""
+
+import json
+import re
+
+from common.framed_io import open_text
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+# A character that cannot continue a number; whitespace may still precede more digits in the next chunk.
+VALUE_END = re.compile(r"[^0-9+\-.eE \t\n\r]")
+
+
+class JsonStreamReader(object):
+    """Decode JSON values one at a time from a buffered text stream."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size):
+        """Drop consumed text and append up to size characters; False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it, '' at end of file."""
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def expect(self, chars):
+        """Consume one of the structural characters chars and return it."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in JSON stream, got {char or 'end of file'!r}")
+        self.pos += 1
+        return char
+
+    def skip(self, chars):
+        """Consume the next character if it is one of chars and return it, else return ''."""
+        char = self.peek()
+        if not char or char not in chars:
+            return ""
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode and consume the next complete JSON value."""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number cut by the end of the buffer decodes as a shorter one, e.g. "12." as 12,
+                # so the value is only complete once a character that cannot continue it follows.
+                if self.eof or VALUE_END.search(self.buf, end):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow the reads so a large value is not re-decoded for every chunk.
+            self._fill(size)
+            size *= 2
+
+
+def iter_json_events(json_path, keys=None, chunk_size=1 << 20):
+    """Iterate the members of a top-level JSON object without loading it whole.
+
+    Arrays are streamed element by element, other values are decoded whole.
+    Only one array element is held in memory at a time.
+
+    Args:
+        json_path (str): JSON file whose top level is an object, optionally .gz or .zst compressed.
+        keys (set): Only report these members, and stop reading once all of
+            them were seen. All members are reported when None.
+        chunk_size (int): Number of characters read at a time.
+
+    Yields:
+        tuple: (key, event, value) where event is "start_array", "item" or
+        "end_array" for arrays (value is the element for "item", else None),
+        and "value" for any other member.
+    """
+    pending = set(keys) if keys is not None else None
+    with open_text(json_path) as f:
+        reader = JsonStreamReader(f, chunk_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            wanted = keys is None or key in keys
+            if reader.skip("["):
+                if wanted:
+                    yield key, "start_array", None
+                if not reader.skip("]"):
+                    while True:
+                        item = reader.value()
+                        if wanted:
+                            yield key, "item", item
+                        if reader.expect(",]") == "]":
+                            break
+                if wanted:
+                    yield key, "end_array", None
+            else:
+                value = reader.value()
+                if wanted:
+                    yield key, "value", value
+
+            if pending is not None:
+                pending.discard(key)
+                if not pending:
+                    return
+            if reader.expect(",}") == "}":
+                return
+
+
+def iter_json_array(json_path, key, chunk_size=1 << 20):
+    """Iterate the elements of the top-level array member key of a JSON object."""
+    for _, event, value in iter_json_events(json_path, {key}, chunk_size):
+        if event == "item":
+            yield value
@@ -0,0 +1,135 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Persistent per-frame class counts of a KITTI label directory."""
+
+import os
+
+import numpy as np
+
+from common.kitti_label import parse_kitti_label_files
+
+
+class KittiLabelIndex(object):
+    """Class counts and file sizes of every frame of a KITTI label directory.
+
+    The index is built by scanning the label files once and saved as a small
+    .npz table, so tools can find the frames holding a class, test frame
+    membership and pick subsets without listing or parsing the directory again.
+    Tools that modify label files update the index they were given.
+
+    Attributes:
+        frames (np.ndarray): Sorted frame names, e.g. "000123".
+        class_names (list): Class name of every count column.
+        counts (np.ndarray): (len(frames), len(class_names)) int32 objects per frame and class.
+        sizes (np.ndarray): (len(frames),) int64 label file sizes in bytes.
+    """
+
+    def __init__(self, frames, class_names, counts, sizes):
+        """Initialize."""
+        self.frames = np.asarray(frames, dtype=str)
+        self.class_names = list(class_names)
+        self.counts = np.asarray(counts, dtype=np.int32).reshape(len(self.frames), len(self.class_names))
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        self._rows = {frame: row for row, frame in enumerate(self.frames.tolist())}
+        self._columns = {name: col for col, name in enumerate(self.class_names)}
+
+    @classmethod
+    def build(cls, label_dir, batch_size=4096):
+        """Scan the .txt files of label_dir once, parsing batch_size files at a time."""
+        frames = sorted(name[:-4] for name in os.listdir(label_dir) if name.endswith(".txt"))
+        class_names, rows, codes = [], [], []
+        sizes = np.zeros(len(frames), dtype=np.int64)
+        for start in range(0, len(frames), batch_size):
+            label_files = [os.path.join(label_dir, frame + ".txt") for frame in frames[start:start + batch_size]]
+            labels = parse_kitti_label_files(label_files, class_names)
+            class_names = labels.class_names
+            rows.append(start + np.repeat(np.arange(len(label_files)), np.diff(labels.offsets)))
+            codes.append(labels.objects["class_code"])
+            sizes[start:start + len(label_files)] = [os.path.getsize(f) for f in label_files]
+        counts = np.zeros((len(frames), len(class_names)), dtype=np.int32)
+        if rows:
+            np.add.at(counts, (np.concatenate(rows), np.concatenate(codes)), 1)
+        return cls(frames, class_names, counts, sizes)
+
+    @classmethod
+    def load(cls, index_file):
+        """Load an index written by save."""
+        with np.load(index_file) as index:
+            return cls(index["frames"], index["class_names"].tolist(), index["counts"], index["sizes"])
+
+    def save(self, index_file):
+        """Write the index to an .npz file, replacing it atomically."""
+        tmp_file = index_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            np.savez(f, frames=self.frames, class_names=np.array(self.class_names, dtype=str),
+                     counts=self.counts, sizes=self.sizes)
+        os.replace(tmp_file, index_file)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __contains__(self, frame):
+        return frame in self._rows
+
+    def row(self, frame):
+        """Return the row of a frame name, e.g. "000123"."""
+        row = self._rows.get(frame)
+        if row is None:
+            raise KeyError(f"Frame {frame} is not in the label index")
+        return row
+
+    def class_columns(self, classes):
+        """Return the count columns of the classes; classes without objects are skipped."""
+        return [self._columns[name] for name in classes if name in self._columns]
+
+    def frames_with_classes(self, classes):
+        """Return the (len(frames),) mask of frames with an object of any of the classes."""
+        return self.counts[:, self.class_columns(classes)].any(axis=1)
+
+    def select(self, rows):
+        """Return a new index of the given rows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        return KittiLabelIndex(self.frames[rows], self.class_names, self.counts[rows], self.sizes[rows])
+
+    def select_subset(self, num_frames, classes=None):
+        """Pick up to num_frames frames, in name order.
+
+        Without classes the first frames are taken. With classes, the frames
+        holding each class take turns, rarest class first, so every class is
+        represented as evenly as the data allows.
+
+        Raises:
+            ValueError: If a class has no object in the index, e.g. a misspelled name.
+        """
+        if not classes:
+            return self.frames[:num_frames].tolist()
+        unknown = [name for name in classes if name not in self._columns]
+        if unknown:
+            raise ValueError(f"Classes {unknown} have no objects in the label index; known classes are "
+                             f"{self.class_names}")
+        candidates = sorted((np.flatnonzero(self.counts[:, col]) for col in self.class_columns(classes)), key=len)
+        positions = [0] * len(candidates)
+        selected = set()
+        while len(selected) < num_frames:
+            added = False
+            for k, rows in enumerate(candidates):
+                while positions[k] < len(rows) and rows[positions[k]] in selected:
+                    positions[k] += 1
+                if positions[k] < len(rows) and len(selected) < num_frames:
+                    selected.add(rows[positions[k]])
+                    added = True
+            if not added:
+                break
+        return self.frames[sorted(selected)].tolist()
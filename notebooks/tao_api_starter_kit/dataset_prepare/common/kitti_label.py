@@ -0,0 +1,142 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Bulk columnar parser for KITTI label files."""
+
+import os
+
+import numpy as np
+
+# One row per object. Values are kept in float64 so they round-trip exactly
+# to the Python floats the per-line parsers produced.
+KITTI_LABEL_DTYPE = np.dtype([
+    ("class_code", np.int32),
+    ("truncation", np.float64),
+    ("occlusion", np.float64),
+    ("alpha", np.float64),
+    ("bbox", np.float64, (4,)),  # x1, y1, x2, y2
+    ("dimensions", np.float64, (3,)),  # h, w, l
+    ("location", np.float64, (3,)),  # x, y, z in camera coordinates
+    ("rotation_y", np.float64),
+    ("score", np.float64),
+])
+
+# Numeric fields after the class name; the score is optional.
+NUM_FIELDS = 15
+DEFAULT_SCORE = "-1"
+# Fields up to the 2D box: class name, truncation, occlusion, alpha and bbox.
+NUM_2D_FIELDS = 8
+
+
+class KittiLabels(object):
+    """Objects of several KITTI label files in one structured array.
+
+    Attributes:
+        files (list): Label file paths in parse order.
+        objects (np.ndarray): KITTI_LABEL_DTYPE array with one row per object.
+        offsets (np.ndarray): (len(files) + 1,) int64; the objects of files[i] are
+            objects[offsets[i]:offsets[i + 1]].
+        class_names (list): Class name of every class code.
+    """
+
+    def __init__(self, files, objects, offsets, class_names):
+        """Initialize."""
+        self.files = files
+        self.objects = objects
+        self.offsets = offsets
+        self.class_names = class_names
+
+    def __len__(self):
+        return len(self.files)
+
+    def file_objects(self, idx):
+        """Return the objects of the idx-th file."""
+        return self.objects[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def names(self):
+        """Return the class name of every object."""
+        return [self.class_names[code] for code in self.objects["class_code"].tolist()]
+
+
+def _read_text(label_file):
+    with open(label_file, "r") as f:
+        return f.read()
+
+
+def parse_kitti_label_files(label_files, class_names=None, read_file=None, min_fields=NUM_FIELDS):
+    """Parse KITTI label files into a KittiLabels structure.
+
+    Blank lines are skipped and a missing score column defaults to -1, as in
+    Object3d. Numeric columns of all files are parsed in a single pass.
+
+    Args:
+        label_files (list): Label file paths.
+        class_names (list): Initial class table. Unseen classes are appended to it.
+        read_file (callable): Function returning the text of a label file, e.g.
+            from frame shards. Default reads the path from disk.
+        min_fields (int): Fields a line must have, class name included. Lines
+            shorter than NUM_FIELDS get their missing 3D columns set to 0, e.g.
+            NUM_2D_FIELDS for 2D-only labels.
+
+    Returns:
+        KittiLabels
+    """
+    read_file = read_file or _read_text
+    class_names = list(class_names) if class_names else []
+    class_codes = {name: code for code, name in enumerate(class_names)}
+    codes = []
+    numeric_lines = []
+    offsets = np.zeros(len(label_files) + 1, dtype=np.int64)
+
+    for idx, label_file in enumerate(label_files):
+        lines = read_file(label_file).splitlines()
+        for line in lines:
+            tokens = line.split()
+            if not tokens:
+                continue
+            if len(tokens) < min_fields:
+                raise ValueError(f"Label file {label_file} has a line with {len(tokens)} fields: {line}")
+            code = class_codes.get(tokens[0])
+            if code is None:
+                code = class_codes[tokens[0]] = len(class_names)
+                class_names.append(tokens[0])
+            codes.append(code)
+            numeric = tokens[1:NUM_FIELDS + 1]
+            if len(numeric) < NUM_FIELDS - 1:
+                numeric.extend(["0"] * (NUM_FIELDS - 1 - len(numeric)))
+            if len(numeric) < NUM_FIELDS:
+                numeric.append(DEFAULT_SCORE)
+            numeric_lines.append(" ".join(numeric))
+        offsets[idx + 1] = len(codes)
+
+    # Raises ValueError on a non-numeric field.
+    values = np.array(" ".join(numeric_lines).split(), dtype=np.float64).reshape(-1, NUM_FIELDS)
+
+    objects = np.empty(len(codes), dtype=KITTI_LABEL_DTYPE)
+    objects["class_code"] = codes
+    objects["truncation"] = values[:, 0]
+    objects["occlusion"] = values[:, 1]
+    objects["alpha"] = values[:, 2]
+    objects["bbox"] = values[:, 3:7]
+    objects["dimensions"] = values[:, 7:10]
+    objects["location"] = values[:, 10:13]
+    objects["rotation_y"] = values[:, 13]
+    objects["score"] = values[:, 14]
+    return KittiLabels(list(label_files), objects, offsets, class_names)
+
+
+def parse_kitti_label_dir(label_dir, class_names=None):
+    """Parse every .txt label file of a directory, in sorted filename order."""
+    label_files = sorted(os.path.join(label_dir, f) for f in os.listdir(label_dir) if f.endswith(".txt"))
+    return parse_kitti_label_files(label_files, class_names)
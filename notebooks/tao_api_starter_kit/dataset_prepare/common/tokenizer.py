@@ -0,0 +1,163 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""BERT WordPiece tokenizer with character offsets, driven by a local vocab.txt.
+
+It follows the uncased BERT tokenizer that Grounding DINO uses as text
+encoder, so captions can be tokenized offline without the transformers package.
+"""
+
+import unicodedata
+
+CLS_TOKEN = "[CLS]"
+SEP_TOKEN = "[SEP]"
+UNK_TOKEN = "[UNK]"
+
+
+def _is_whitespace(char):
+    return char in " \t\n\r" or unicodedata.category(char) == "Zs"
+
+
+def _is_control(char):
+    if char in "\t\n\r":
+        return False
+    return unicodedata.category(char) in ("Cc", "Cf")
+
+
+def _is_punctuation(char):
+    cp = ord(char)
+    if 33 <= cp <= 47 or 58 <= cp <= 64 or 91 <= cp <= 96 or 123 <= cp <= 126:
+        return True
+    return unicodedata.category(char).startswith("P")
+
+
+def _is_cjk(char):
+    cp = ord(char)
+    return (0x4E00 <= cp <= 0x9FFF or 0x3400 <= cp <= 0x4DBF or 0x20000 <= cp <= 0x2A6DF or
+            0x2A700 <= cp <= 0x2B73F or 0x2B740 <= cp <= 0x2B81F or 0x2B820 <= cp <= 0x2CEAF or
+            0xF900 <= cp <= 0xFAFF or 0x2F800 <= cp <= 0x2FA1F)
+
+
+class WordPieceTokenizer(object):
+    """Uncased BERT tokenizer: basic splitting, accent stripping and greedy WordPiece."""
+
+    def __init__(self, vocab_file, lower_case=True, max_chars_per_word=100):
+        """Initialize.
+
+        Args:
+            vocab_file (str): BERT vocab.txt with one token per line.
+            lower_case (bool): Lowercase and strip accents, as bert-base-uncased.
+            max_chars_per_word (int): Longer words become [UNK].
+        """
+        with open(vocab_file, "r", encoding="utf-8") as f:
+            self.vocab = {line.rstrip("\n"): idx for idx, line in enumerate(f)}
+        self.lower_case = lower_case
+        self.max_chars_per_word = max_chars_per_word
+        self.cls_id = self.vocab[CLS_TOKEN]
+        self.sep_id = self.vocab[SEP_TOKEN]
+        self.unk_id = self.vocab[UNK_TOKEN]
+
+    def _normalize(self, char):
+        if not self.lower_case:
+            return char
+        return "".join(c for c in unicodedata.normalize("NFD", char.lower()) if unicodedata.category(c) != "Mn")
+
+    def _words(self, text):
+        """Split text into words, each a list of (normalized char, original index)."""
+        words, word = [], []
+        for idx, char in enumerate(text):
+            if ord(char) in (0, 0xFFFD) or _is_control(char):
+                continue
+            if _is_whitespace(char):
+                if word:
+                    words.append(word)
+                word = []
+                continue
+            normalized = [(c, idx) for c in self._normalize(char)]
+            if _is_punctuation(char) or _is_cjk(char):
+                if word:
+                    words.append(word)
+                words.append(normalized)
+                word = []
+            else:
+                word.extend(normalized)
+        if word:
+            words.append(word)
+        return [word for word in words if word]
+
+    def _wordpiece(self, word):
+        """Return (token id, start, end) of a word, with offsets into the word."""
+        if len(word) > self.max_chars_per_word:
+            return [(self.unk_id, 0, len(word))]
+        pieces, start = [], 0
+        while start < len(word):
+            end = len(word)
+            while end > start:
+                piece = word[start:end] if start == 0 else "##" + word[start:end]
+                if piece in self.vocab:
+                    pieces.append((self.vocab[piece], start, end))
+                    break
+                end -= 1
+            if end == start:
+                return [(self.unk_id, 0, len(word))]
+            start = end
+        return pieces
+
+    def encode(self, text):
+        """Tokenize text as [CLS] tokens [SEP].
+
+        Returns:
+            tuple: (token ids, (start, end) character offsets into text per token;
+            (0, 0) for the special tokens).
+        """
+        ids, offsets = [self.cls_id], [(0, 0)]
+        for word in self._words(text):
+            chars = "".join(c for c, _ in word)
+            for token_id, start, end in self._wordpiece(chars):
+                ids.append(token_id)
+                offsets.append((word[start][1], word[end - 1][1] + 1))
+        ids.append(self.sep_id)
+        offsets.append((0, 0))
+        return ids, offsets
+
+
+def char_spans_to_token_ranges(offsets, spans, text_length):
+    """Map character spans to [first, last + 1) token index ranges.
+
+    Follows Grounding DINO's create_positive_map_from_span: a span starts at
+    the token holding its first character (or one of the next two) and ends at
+    the token holding its last character (or one of the two before). Spans that
+    hit no token are dropped.
+
+    Args:
+        offsets (list): (start, end) character offsets per token, from encode.
+        spans (list): [start, end) character spans.
+        text_length (int): Length of the tokenized text.
+    """
+    char_to_token = [None] * text_length
+    for token_idx, (start, end) in enumerate(offsets):
+        for char in range(start, min(end, text_length)):
+            char_to_token[char] = token_idx
+
+    def lookup(char):
+        return char_to_token[char] if 0 <= char < text_length else None
+
+    ranges = []
+    for beg, end in spans:
+        beg_pos = next((lookup(c) for c in (beg, beg + 1, beg + 2) if lookup(c) is not None), None)
+        end_pos = next((lookup(c) for c in (end - 1, end - 2, end - 3) if lookup(c) is not None), None)
+        if beg_pos is None or end_pos is None:
+            continue
+        ranges.append([beg_pos, end_pos + 1])
+    return ranges
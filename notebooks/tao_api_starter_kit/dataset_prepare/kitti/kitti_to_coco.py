@@ -14,17 +14,22 @@
 
 import os
 import sys
-import cv2
-import csv
+import argparse
+import hashlib
+import multiprocessing
+import numpy as np
 import ujson
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.coco_writer import CocoJsonWriter  # noqa: E402
+from common.image_size import ImageSizeCache  # noqa: E402
+from common.kitti_label import NUM_2D_FIELDS, parse_kitti_label_files  # noqa: E402
 
-classes = set([])
+MANIFEST_VERSION = 2
 
 
-def read_kitti(prefix, label_file):
-    "Function wrapper to read kitti format labels txt file."
-    global classes
+def resolve_kitti_image(prefix, label_file, size_cache):
+    """Return (file_name, height, width) of the image of a label file, or None if it is not a label file."""
     full_label_path = os.path.join(prefix, label_file)
     if not full_label_path.endswith(".txt"):
         return
@@ -33,79 +38,467 @@ def read_kitti(prefix, label_file):
     if os.path.isdir(full_label_path):
         return
 
-    dict_list = []
-
     image_name = full_label_path.replace("/labels", "/images").replace(".txt", ".jpg")
     if not os.path.exists(image_name):
         raise ValueError("Image  : {} does not exist".format(image_name))
-    img = cv2.imread(image_name, 0)
-    height, width = img.shape[:2]
-
-    with open(full_label_path, 'r') as lf:
-        for row in csv.reader(lf, delimiter=' '):
-            classes.add(row[0])
-            dict_list.append({"class_name": row[0],
-                              "file_name": label_file.replace(".txt", ".jpg"),
-                              "height": height,
-                              "width": width,
-                              "bbox": [float(row[4]), float(row[5]), float(row[6]) - float(row[4]), float(row[7]) - float(row[5])]})
-    if (dict_list == []):
-        dict_list = [{"file_name": label_file.replace(".txt", ".jpg"),
-                      "height": height,
-                      "width": width}]
-
-    return dict_list
-
-
-def construct_coco_json(labels_folder):
-    image_id = 0
-    annot_ctr = 0
-
-    labels = []
-    for file in os.listdir(labels_folder):
-        label = read_kitti(labels_folder, file)
-        labels.append(label)
-
-    categories = []
-    class_to_id_mapping = {}
+    height, width = size_cache.get_size(image_name)
+    return label_file.replace(".txt", ".jpg"), height, width
+
+
+_worker_size_cache = None
+
+
+def _init_worker(cache_file):
+    """Load the image size cache once per worker process."""
+    global _worker_size_cache
+    _worker_size_cache = ImageSizeCache(cache_file)
+
+
+def label_file_record(full_label_path):
+    """Return the manifest record (size, mtime and content hash) of a label file."""
+    stat = os.stat(full_label_path)
+    with open(full_label_path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": digest}
+
+
+def read_kitti_chunk(labels_folder, label_files, size_cache, with_records=False):
+    """Read a chunk of label files.
+
+    Returns:
+        frames (list): (label_file, file_name, height, width) of every label file, in input order.
+            Entries that are not label files are dropped.
+        labels (KittiLabels): Objects of the frames' label files.
+        records (list): Manifest record of every frame if with_records is set, else None.
+    """
+    frames = []
+    for file in label_files:
+        image = resolve_kitti_image(labels_folder, file, size_cache)
+        if image:
+            frames.append((file,) + image)
+    # Only the 2D box is converted, so 2D-only label lines are accepted.
+    labels = parse_kitti_label_files([os.path.join(labels_folder, frame[0]) for frame in frames],
+                                     min_fields=NUM_2D_FIELDS)
+    records = None
+    if with_records:
+        records = [label_file_record(os.path.join(labels_folder, frame[0])) for frame in frames]
+    return frames, labels, records
+
+
+def iter_coco_frames(frames, labels):
+    """Convert a chunk read by read_kitti_chunk to COCO boxes.
+
+    Yields:
+        label_file (str): Label file name.
+        image (dict): COCO image without id.
+        instances (list): (class_name, bbox, area) of every object, bbox in xywh.
+    """
+    bbox = labels.objects["bbox"]
+    xywh = np.concatenate((bbox[:, :2], bbox[:, 2:] - bbox[:, :2]), axis=1)
+    areas = (xywh[:, 2] * xywh[:, 3]).tolist()
+    bboxes = xywh.tolist()
+    names = labels.names()
+    for idx, (label_file, file_name, height, width) in enumerate(frames):
+        start, end = labels.offsets[idx], labels.offsets[idx + 1]
+        image = {"file_name": file_name, "height": height, "width": width}
+        yield label_file, image, list(zip(names[start:end], bboxes[start:end], areas[start:end]))
+
+
+def _read_kitti_chunk_worker(task):
+    """Pool entry point for read_kitti_chunk, also returning newly probed image sizes."""
+    labels_folder, label_files, with_records = task
+    frames, labels, records = read_kitti_chunk(labels_folder, label_files, _worker_size_cache, with_records)
+    updates = _worker_size_cache.updates
+    _worker_size_cache.updates = {}
+    return frames, labels, records, updates
+
+
+def iter_kitti_chunks(splits, size_cache, workers=1, with_records=False, max_chunk_size=1000):
+    """Read the label files of several splits chunk by chunk, in one pass.
+
+    Args:
+        splits (list): (labels_folder, label_files) of every split.
+
+    Yields:
+        split (int): Index of the split the chunk belongs to.
+        The (frames, labels, records) result of read_kitti_chunk. Chunks of a split
+        are yielded in the order of its label_files.
+    """
+    num_files = sum(len(label_files) for _, label_files in splits)
+    chunk_size = max(1, min(max_chunk_size, num_files // (workers * 8)))
+    tasks, task_splits = [], []
+    for split, (labels_folder, label_files) in enumerate(splits):
+        for i in range(0, len(label_files), chunk_size):
+            tasks.append((labels_folder, label_files[i:i + chunk_size], with_records))
+            task_splits.append(split)
+    if workers > 1:
+        # The workers only read the cache; new entries are merged back here.
+        size_cache.save()
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(size_cache.cache_file,)) as pool:
+            results = pool.imap(_read_kitti_chunk_worker, tasks)
+            for split, (frames, labels, records, updates) in zip(task_splits, results):
+                size_cache.merge(updates)
+                yield (split, frames, labels, records)
+    else:
+        for split, (task_folder, task_files, _) in zip(task_splits, tasks):
+            yield (split,) + read_kitti_chunk(task_folder, task_files, size_cache, with_records)
+
+
+def kitti_to_coco_annotation(bbox, area, image_id, annotation_id, category_id):
+    """Build a COCO annotation."""
+    return {"bbox": bbox,
+            "image_id": image_id,
+            "id": annotation_id,
+            "category_id": category_id,
+            "bbox_mode": 1,
+            "segmentation": [],
+            "iscrowd": 0,
+            "area": area}
+
+
+def write_categories(writer, classes):
+    """Write the categories array for sorted class names."""
+    writer.begin_array("categories")
     for idx, object_class in enumerate(classes):
-        class_to_id_mapping[object_class] = idx + 1
-        categories.append({"supercategory": object_class, "id": idx + 1, "name": object_class})
-    coco_json = {"images": [], "annotations": [], "categories": categories}
+        writer.write({"supercategory": object_class, "id": idx + 1, "name": object_class})
+    writer.end_array()
 
-    for label in labels:
-        if not (label and len(label)):
-            continue
-        coco_json["images"].append({"file_name": label[0]["file_name"], "height": label[0]["height"], "width": label[0]["width"], "id": image_id})
-        for instance in label:
-            if ("bbox" in instance.keys()):
-                coco_json["annotations"].append({"bbox": instance["bbox"],
-                                                 "image_id": image_id,
-                                                 "id": annot_ctr,
-                                                 "category_id": class_to_id_mapping[instance["class_name"]],
-                                                 "bbox_mode": 1,
-                                                 "segmentation": [],
-                                                 "iscrowd": 0,
-                                                 "area": float(instance["bbox"][2] * instance["bbox"][3])})
+
+def write_coco_jsons(splits, size_cache, workers=1, indent=4, manifests=None):
+    """Convert KITTI label folders to COCO JSON files sharing one category map.
+
+    All splits are read in a single pass over one worker pool. Images are written
+    as labels are parsed, while annotations are spilled to a temporary file until
+    the category map is known, so memory use does not grow with the dataset.
+    Label files are processed in sorted filename order and categories are numbered
+    in sorted class name order, so the ids do not depend on the number of workers.
+
+    Args:
+        splits (list): (labels_folder, output_path) of every split.
+        manifests (list): If given, one dict per split, filled with the label file
+            manifest used by update_coco_jsons.
+
+    Returns:
+        classes (list): Sorted class names; the category id of classes[i] is i + 1.
+    """
+    image_ids = [0] * len(splits)
+    annot_ctrs = [0] * len(splits)
+    manifest_files = [{} for _ in splits]
+    split_classes = [set() for _ in splits]
+    writers, spills = [], []
+    for _, output_path in splits:
+        writers.append(CocoJsonWriter(output_path, indent=indent))
+        spills.append(open(output_path + ".annotations.tmp", "w+", encoding="utf-8"))
+        writers[-1].begin_array("images")
+
+    split_files = [(labels_folder, sorted(os.listdir(labels_folder))) for labels_folder, _ in splits]
+    for split, frames, labels, records in iter_kitti_chunks(split_files, size_cache, workers,
+                                                            with_records=manifests is not None):
+        writer, spill = writers[split], spills[split]
+        image_id, annot_ctr = image_ids[split], annot_ctrs[split]
+        split_classes[split].update(labels.class_names)
+        for idx, (label_file, image, instances) in enumerate(iter_coco_frames(frames, labels)):
+            image["id"] = image_id
+            writer.write(image)
+            annotation_ids = []
+            for class_name, bbox, area in instances:
+                # category_id holds the class name until all classes are known.
+                spill.write(ujson.dumps(kitti_to_coco_annotation(bbox, area, image_id, annot_ctr, class_name)))
+                spill.write("\n")
+                annotation_ids.append(annot_ctr)
                 annot_ctr += 1
-        image_id += 1
-    return coco_json
+            if records:
+                manifest_files[split][label_file] = dict(records[idx], image_id=image_id, annotation_ids=annotation_ids)
+            image_id += 1
+        image_ids[split], annot_ctrs[split] = image_id, annot_ctr
+
+    classes = sorted(set().union(*split_classes))
+    class_to_id_mapping = {object_class: idx + 1 for idx, object_class in enumerate(classes)}
+    for writer, spill in zip(writers, spills):
+        writer.end_array()
+        writer.begin_array("annotations")
+        spill.seek(0)
+        for line in spill:
+            annotation = ujson.loads(line)
+            annotation["category_id"] = class_to_id_mapping[annotation["category_id"]]
+            writer.write(annotation)
+        writer.end_array()
+        write_categories(writer, classes)
+        writer.close()
+        spill.close()
+        os.remove(spill.name)
+
+    if manifests is not None:
+        for split, manifest in enumerate(manifests):
+            manifest.update({"version": MANIFEST_VERSION, "next_image_id": image_ids[split],
+                             "next_annotation_id": annot_ctrs[split], "files": manifest_files[split],
+                             "classes": classes, "split_classes": sorted(split_classes[split])})
+    return classes
+
+
+def load_manifest(manifest_path):
+    """Load a label manifest, or return None if it is missing or outdated."""
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = ujson.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
 
 
-label_folder = sys.argv[1]
-coco_json = construct_coco_json(label_folder)
+def save_manifest(manifest, manifest_path):
+    """Atomically write a label manifest."""
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        ujson.dump(manifest, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
 
-current_str = ujson.dumps(coco_json, indent=4)
-with open(sys.argv[2] + "/annotations.json", "w") as json_out_file:
-    json_out_file.write(current_str)
 
-label_map_extension = sys.argv[3]
-with open(f"{sys.argv[2]}/label_map.{label_map_extension}", "w") as label_map_file:
-    for idx, class_name in enumerate(classes):
-        if label_map_extension == "yaml":
-            label_map_file.write(f"{idx+1}: '{class_name}'\n")
+def find_dirty_label_files(labels_folder, manifest):
+    """Compare a label folder against its manifest.
+
+    Label files whose size or mtime changed are hashed; files that were only
+    touched get their manifest record refreshed in place.
+
+    Returns:
+        label_files (list): Sorted label files currently in the folder.
+        dirty_files (list): Added or modified label files.
+        removed_files (set): Label files in the manifest that no longer exist.
+    """
+    old_files = manifest["files"]
+    label_files = sorted(f for f in os.listdir(labels_folder)
+                         if f.endswith(".txt") and not os.path.isdir(os.path.join(labels_folder, f)))
+    dirty_files = []
+    for file in label_files:
+        entry = old_files.get(file)
+        if entry is None:
+            dirty_files.append(file)
+            continue
+        stat = os.stat(os.path.join(labels_folder, file))
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            continue
+        record = label_file_record(os.path.join(labels_folder, file))
+        if record["sha1"] == entry["sha1"]:
+            # Touched but not modified.
+            entry.update(record)
+        else:
+            dirty_files.append(file)
+    removed_files = set(old_files) - set(label_files)
+    return label_files, dirty_files, removed_files
+
+
+def patch_coco_entries(output_path, manifest, label_files, parsed):
+    """Rebuild the image and annotation entries of a split from its old COCO JSON and re-parsed files.
+
+    Annotations are returned with class names as category_id and the manifest is
+    updated in place with the new ids.
+
+    Returns:
+        entries (list): (image, annotations) for every label file, in label_files order.
+        classes (set): Class names in use.
+    """
+    with open(output_path, "r", encoding="utf-8") as f:
+        coco_json = ujson.load(f)
+    id_to_class = {category["id"]: category["name"] for category in coco_json["categories"]}
+    images = {image["id"]: image for image in coco_json["images"]}
+    image_annotations = {}
+    for annotation in coco_json["annotations"]:
+        image_annotations.setdefault(annotation["image_id"], []).append(annotation)
+    del coco_json
+
+    old_files = manifest["files"]
+    next_image_id = manifest["next_image_id"]
+    next_annotation_id = manifest["next_annotation_id"]
+    new_files = {}
+    entries = []
+    classes = set()
+    for file in label_files:
+        entry = old_files.get(file)
+        if file not in parsed:
+            annotations = image_annotations.get(entry["image_id"], [])
+            for annotation in annotations:
+                annotation["category_id"] = id_to_class[annotation["category_id"]]
+            classes.update(annotation["category_id"] for annotation in annotations)
+            entries.append((images[entry["image_id"]], annotations))
+            new_files[file] = entry
+            continue
+
+        image, instances, record = parsed[file]
+        if entry is None:
+            image_id = next_image_id
+            next_image_id += 1
+            reusable_ids = []
         else:
-            label_map_file.write(f"{class_name}\n")
-        label_map_file.flush()
+            image_id = entry["image_id"]
+            reusable_ids = entry["annotation_ids"]
+        image["id"] = image_id
+        annotations = []
+        for class_name, bbox, area in instances:
+            if len(annotations) < len(reusable_ids):
+                annotation_id = reusable_ids[len(annotations)]
+            else:
+                annotation_id = next_annotation_id
+                next_annotation_id += 1
+            annotations.append(kitti_to_coco_annotation(bbox, area, image_id, annotation_id, class_name))
+            classes.add(class_name)
+        entries.append((image, annotations))
+        new_files[file] = dict(record, image_id=image_id, annotation_ids=[a["id"] for a in annotations])
+
+    manifest.update({"next_image_id": next_image_id, "next_annotation_id": next_annotation_id, "files": new_files})
+    return entries, classes
+
+
+def update_coco_jsons(splits, manifest_paths, size_cache, workers=1, indent=4):
+    """Incrementally update COCO JSON files written by write_coco_jsons.
+
+    Only label files that were added, changed or removed since the manifests were
+    written are parsed, in one pass over all splits. Images of unchanged label
+    files keep their image and annotation ids, changed label files keep their
+    image id and reuse their old annotation ids, and new ids are never reused
+    after removals. Category ids are renumbered in sorted class name order across
+    all splits, as in a full conversion. Falls back to a full conversion if any
+    split has no usable manifest.
+
+    Unlike write_coco_jsons, a split that is rewritten has its previous COCO JSON
+    loaded whole, so memory use grows with the size of that split.
+
+    Args:
+        splits (list): (labels_folder, output_path) of every split.
+        manifest_paths (list): Manifest file of every split.
+
+    Returns:
+        classes (list): Sorted class names; the category id of classes[i] is i + 1.
+    """
+    manifests = [load_manifest(manifest_path) for manifest_path in manifest_paths]
+    if any(manifest is None for manifest in manifests) or \
+            not all(os.path.exists(output_path) for _, output_path in splits):
+        manifests = [{} for _ in splits]
+        classes = write_coco_jsons(splits, size_cache, workers, indent, manifests=manifests)
+        for manifest, manifest_path in zip(manifests, manifest_paths):
+            save_manifest(manifest, manifest_path)
+        return classes
+
+    scans = [find_dirty_label_files(labels_folder, manifest) for (labels_folder, _), manifest in zip(splits, manifests)]
+    changed = [bool(dirty_files or removed_files) for _, dirty_files, removed_files in scans]
+    if not any(changed):
+        for manifest, manifest_path in zip(manifests, manifest_paths):
+            save_manifest(manifest, manifest_path)
+        return manifests[0]["classes"]
+
+    parsed = [{} for _ in splits]
+    dirty_splits = [(labels_folder, dirty_files) for (labels_folder, _), (_, dirty_files, _) in zip(splits, scans)]
+    for split, frames, labels, records in iter_kitti_chunks(dirty_splits, size_cache, workers, with_records=True):
+        for (label_file, image, instances), record in zip(iter_coco_frames(frames, labels), records):
+            parsed[split][label_file] = (image, instances, record)
+
+    split_entries = [None] * len(splits)
+    split_classes = [set(manifest["split_classes"]) for manifest in manifests]
+    for split, ((_, output_path), manifest, (label_files, _, _)) in enumerate(zip(splits, manifests, scans)):
+        if changed[split]:
+            split_entries[split], split_classes[split] = patch_coco_entries(output_path, manifest, label_files,
+                                                                            parsed[split])
+    classes = sorted(set().union(*split_classes))
+    class_to_id_mapping = {object_class: idx + 1 for idx, object_class in enumerate(classes)}
+
+    for split, ((_, output_path), manifest, manifest_path) in enumerate(zip(splits, manifests, manifest_paths)):
+        if changed[split] or classes != manifest["classes"]:
+            entries = split_entries[split]
+            if entries is None:
+                # Unchanged split whose category ids moved.
+                entries, _ = patch_coco_entries(output_path, manifest, scans[split][0], {})
+            with CocoJsonWriter(output_path + ".tmp", indent=indent) as writer:
+                writer.begin_array("images")
+                for image, _ in entries:
+                    writer.write(image)
+                writer.end_array()
+                writer.begin_array("annotations")
+                for _, annotations in entries:
+                    for annotation in annotations:
+                        annotation["category_id"] = class_to_id_mapping[annotation["category_id"]]
+                        writer.write(annotation)
+                writer.end_array()
+                write_categories(writer, classes)
+            os.replace(output_path + ".tmp", output_path)
+        manifest.update({"classes": classes, "split_classes": sorted(split_classes[split])})
+        save_manifest(manifest, manifest_path)
+    return classes
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        "Convert KITTI labels to COCO annotations.",
+        usage="%(prog)s labels_folder output_dir [labels_folder output_dir ...] label_map_extension [options]"
+    )
+    parser.add_argument(
+        "paths",
+        type=str, nargs="+",
+        help="One (KITTI label directory, output directory) pair per split, followed by the label map "
+             "extension (yaml or txt). All splits share one category map."
+    )
+    parser.add_argument(
+        "--label_map_dir",
+        type=str, default=None,
+        help="Write the shared label map only to this directory instead of every output directory."
+    )
+    parser.add_argument(
+        "--size_cache",
+        type=str, default=None,
+        help="Image size cache file. Defaults to .image_size_cache.json in the first output directory."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int, default=1,
+        help="Number of processes used to read label files and probe images."
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write annotations.json without indentation."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-parse label files changed since the last run, tracked in <output_dir>/annotations_manifest.json. "
+             "The previous annotations.json of a changed split is loaded whole into memory."
+    )
+    args = parser.parse_args()
+    if len(args.paths) < 3 or len(args.paths) % 2 == 0:
+        parser.error("expected labels_folder output_dir pairs followed by label_map_extension")
+    args.label_map_extension = args.paths[-1]
+    args.splits = list(zip(args.paths[:-1:2], args.paths[1:-1:2]))
+    return args
+
+
+def write_label_map(output_dir, classes, label_map_extension):
+    """Write the label map of sorted class names."""
+    with open(f"{output_dir}/label_map.{label_map_extension}", "w") as label_map_file:
+        for idx, class_name in enumerate(classes):
+            if label_map_extension == "yaml":
+                label_map_file.write(f"{idx+1}: '{class_name}'\n")
+            else:
+                label_map_file.write(f"{class_name}\n")
+            label_map_file.flush()
+
+
+def main():
+    args = parse_args()
+    output_dirs = [output_dir for _, output_dir in args.splits]
+    size_cache = ImageSizeCache(args.size_cache or os.path.join(output_dirs[0], ".image_size_cache.json"))
+    splits = [(labels_folder, os.path.join(output_dir, "annotations.json"))
+              for labels_folder, output_dir in args.splits]
+    indent = 0 if args.compact else 4
+    if args.incremental:
+        manifest_paths = [os.path.join(output_dir, "annotations_manifest.json") for output_dir in output_dirs]
+        classes = update_coco_jsons(splits, manifest_paths, size_cache, workers=args.workers, indent=indent)
+    else:
+        classes = write_coco_jsons(splits, size_cache, workers=args.workers, indent=indent)
+    size_cache.save()
+
+    for output_dir in ([args.label_map_dir] if args.label_map_dir else output_dirs):
+        write_label_map(output_dir, classes, args.label_map_extension)
+
+    print(len(classes))
+
 
-print(len(classes))
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,10 @@ import random
 import json
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.coco_writer import dump_json_arrays  # noqa: E402
+from common.json_stream import iter_json_array, iter_json_events  # noqa: E402
+
 
 """Extract a subset of images from COCO dataset"""
 """Usage: python3 extract_subset.py <images_path> <annotation_path> <output_dir> <num_images> <is_val>"""
@@ -33,21 +37,31 @@ num_images = int(sys.argv[5]) if len(sys.argv) > 5 else 100 # default random ext
 
 print(f"Extracting {num_images} images from {images_path} and saving to {output_dir}")
 
-# Load annotations
-with open(annotation_path, 'r') as f:
-    annotations = json.load(f)
-
-# Get all image IDs
-image_ids = [img['id'] for img in annotations['images']]
+# Get all image IDs. The annotation file is streamed so that only the
+# selected subset is ever held in memory.
+image_ids = [img['id'] for img in iter_json_array(annotation_path, 'images')]
 
 # Randomly select num_images image IDs
-selected_ids = random.sample(image_ids, num_images)
+selected_ids = set(random.sample(image_ids, num_images))
+
+# collect the selected images and their annotations
+selected_images, selected_annotations, selected_categories = [], [], []
+label_map = {}
+for key, event, value in iter_json_events(annotation_path, {'images', 'annotations', 'categories'}):
+    if event != 'item':
+        continue
+    if key == 'images':
+        if value['id'] in selected_ids:
+            selected_images.append(value)
+    elif key == 'annotations':
+        if value['image_id'] in selected_ids:
+            selected_annotations.append(value)
+            label_map[value['category_id']] = value['id']
+    else:
+        selected_categories.append(value)
 
 # copy the selected images to the output directory
-selected_image_paths = []
-for img in annotations['images']:
-    if img['id'] in selected_ids:
-        selected_image_paths.append(img['file_name'])
+selected_image_paths = [img['file_name'] for img in selected_images]
 
 os.makedirs(f"{output_dir}/images", exist_ok=True)
 for file_name in selected_image_paths:
@@ -55,28 +69,15 @@ for file_name in selected_image_paths:
     dst_path = os.path.join(f"{output_dir}/images", file_name)
     os.system(f'cp {src_path} {dst_path}')
 
-# extract annotations for the selected images
-selected_annotations = []
-for ann in annotations['annotations']:
-    if ann['image_id'] in selected_ids:
-        selected_annotations.append(ann)
 # Save the selected annotations to a new JSON file while keeping original format
-selected_images = [img for img in annotations['images'] if img['id'] in selected_ids]
-selected_categories = annotations['categories']
-output_annotations = {
-    'images': selected_images,
-    'annotations': selected_annotations,
-    'categories': selected_categories
-}
-
-with open(os.path.join(output_dir, os.path.basename(annotation_path)), 'w') as f:
-    json.dump(output_annotations, f)
+# (and compression, which follows the file extension)
+dump_json_arrays(os.path.join(output_dir, os.path.basename(annotation_path)), [
+    ('images', selected_images),
+    ('annotations', selected_annotations),
+    ('categories', selected_categories)
+])
 
 # extract label_map if is_val is True
 if is_val:
-    label_map = {}
-    for ann in annotations['annotations']:
-        if ann['image_id'] in selected_ids:
-            label_map[ann['category_id']] = ann['id']
     with open(os.path.join(output_dir, 'label_map.json'), 'w') as f:
         json.dump(label_map, f)
@@ -17,14 +17,17 @@ Converts Retail Product Checkout (https://www.kaggle.com/datasets/diyer22/retail
 """
 
 
-import os, zipfile
+import os, sys, zipfile
 import glob
 import cv2
-from pycocotools.coco import COCO
 from tqdm import tqdm
 import numpy as np
 import shutil
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.coco_index import load_coco_index  # noqa: E402
+from common.coco_index_cache import load_coco_index_cached  # noqa: E402
+
 def create_reference_set(dataset_dir, ref_dir, ref_num = 100):
     os.makedirs(ref_dir, exist_ok=True)
     classes = os.listdir(dataset_dir)
@@ -92,6 +95,8 @@ data_root_dir = os.path.join(os.environ['DATA_DIR'],"metric_learning_recognition
 path_to_zip_file = os.path.join(data_root_dir,"retail-product-checkout-dataset.zip")
 directory_to_extract_to = os.path.join(data_root_dir, "retail-product-checkout-dataset")
 processed_classification_dir = os.path.join(data_root_dir,"retail-product-checkout-dataset_classification_demo")
+# optional cache of parsed annotation indexes, reused across reruns
+coco_index_cache_dir = os.environ.get('COCO_INDEX_CACHE_DIR')
 
 ## unzip dataset
 if not os.path.exists(processed_classification_dir):
@@ -111,21 +116,24 @@ for dataset in ["train", "val", "test"]:
         os.makedirs(output_dir)
     ## load coco dataset
     print(f"Loading COCO {dataset} dataset...")
-    coco_label = COCO(annotation_file)
+    if coco_index_cache_dir:
+        coco_label = load_coco_index_cached(annotation_file, coco_index_cache_dir)
+    else:
+        coco_label = load_coco_index(annotation_file)
+    categories = {cat["id"]: cat for cat in coco_label.categories}
+    bboxes = coco_label.ann_bboxes.tolist()
+    class_ids = coco_label.ann_category_ids.tolist()
 
     # crop images to classification data
-    for img_object in tqdm(coco_label.dataset["images"]):
-        image_path = os.path.join(dataset_dir, img_object["file_name"])
+    for img_row in tqdm(range(coco_label.num_images)):
+        image_path = os.path.join(dataset_dir, coco_label.file_names.get(img_row))
         
         # remove top view images
         if "camera2" in image_path:
             continue
-        image_id = img_object["id"]
-        annotation_ids = coco_label.getAnnIds(imgIds=image_id)
-        for annot in coco_label.loadAnns(annotation_ids):
-            bbox = annot["bbox"]
-            class_id = annot["category_id"]
-            category = coco_label.loadCats(class_id)[0]
+        for ann_row in coco_label.image_annotation_rows(img_row).tolist():
+            bbox = bboxes[ann_row]
+            category = categories[class_ids[ann_row]]
             class_name = category["supercategory"] + "_" + category["name"]
             crop_images(image_path, bbox, class_name, output_dir)
 
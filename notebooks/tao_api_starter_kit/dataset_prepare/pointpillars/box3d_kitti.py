@@ -0,0 +1,217 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Vectorized 3D box geometry for KITTI objects.
+
+Boxes are (N, 7) arrays in one of two layouts:
+    camera: [x, y, z, l, h, w, ry], bottom center in rect camera coordinates (y down),
+        as in KITTI label files.
+    lidar: [x, y, z, dx, dy, dz, heading], box center in LiDAR coordinates, as in
+        the labels written by gen_lidar_labels.py.
+"""
+
+import numpy as np
+
+# Corner order of Object3d.generate_corners3d: four bottom corners, then four top corners.
+CAMERA_CORNER_SIGNS = np.array([
+    [1, 0, 1], [1, 0, -1], [-1, 0, -1], [-1, 0, 1],
+    [1, -1, 1], [1, -1, -1], [-1, -1, -1], [-1, -1, 1],
+], dtype=np.float64)
+LIDAR_CORNER_SIGNS = np.array([
+    [1, 1, -1], [1, -1, -1], [-1, -1, -1], [-1, 1, -1],
+    [1, 1, 1], [1, -1, 1], [-1, -1, 1], [-1, 1, 1],
+], dtype=np.float64) / 2
+# Counter-clockwise BEV rectangle in box coordinates.
+BEV_CORNER_SIGNS = np.array([[1, 1], [-1, 1], [-1, -1], [1, -1]], dtype=np.float64) / 2
+
+
+def boxes3d_camera_to_corners3d(boxes):
+    """Return the (N, 8, 3) corners of camera boxes, as Object3d.generate_corners3d of every box.
+
+    Args:
+        boxes (np.ndarray): (N, 7) [x, y, z, l, h, w, ry] camera boxes.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    l, h, w, ry = boxes[:, 3:4], boxes[:, 4:5], boxes[:, 5:6], boxes[:, 6]  # noqa: E741
+    corners = np.stack([CAMERA_CORNER_SIGNS[:, 0] * (l / 2),
+                        CAMERA_CORNER_SIGNS[:, 1] * h,
+                        CAMERA_CORNER_SIGNS[:, 2] * (w / 2)], axis=1)  # (N, 3, 8)
+    cos, sin = np.cos(ry), np.sin(ry)
+    R = np.zeros((len(boxes), 3, 3))
+    R[:, 0, 0] = cos
+    R[:, 0, 2] = sin
+    R[:, 1, 1] = 1
+    R[:, 2, 0] = -sin
+    R[:, 2, 2] = cos
+    # A stacked matmul rounds like the per-object np.dot, so the corners are identical.
+    return np.matmul(R, corners).transpose(0, 2, 1) + boxes[:, None, 0:3]
+
+
+def boxes3d_lidar_to_corners3d(boxes):
+    """Return the (N, 8, 3) corners of LiDAR boxes; corners 0-3 are the bottom face.
+
+    Args:
+        boxes (np.ndarray): (N, 7) [x, y, z, dx, dy, dz, heading] LiDAR boxes.
+    """
+    boxes = np.asarray(boxes)
+    local = LIDAR_CORNER_SIGNS[None] * boxes[:, None, 3:6]  # (N, 8, 3)
+    cos, sin = np.cos(boxes[:, 6:7]), np.sin(boxes[:, 6:7])
+    return np.stack([cos * local[..., 0] - sin * local[..., 1] + boxes[:, 0:1],
+                     sin * local[..., 0] + cos * local[..., 1] + boxes[:, 1:2],
+                     local[..., 2] + boxes[:, 2:3]], axis=-1)
+
+
+def boxes3d_camera_to_lidar(boxes, calib):
+    """Convert camera boxes to LiDAR boxes, as gen_lidar_labels.py converts labels.
+
+    The bottom center is moved to LiDAR coordinates with calib.rect_to_lidar and
+    lifted by h / 2, and ry becomes heading = -pi / 2 - ry.
+    """
+    boxes = np.asarray(boxes)
+    loc_lidar = calib.rect_to_lidar(boxes[:, 0:3].astype(np.float32)).astype(np.float64)
+    loc_lidar[:, 2] += boxes[:, 4] / 2.
+    return np.concatenate([loc_lidar, boxes[:, [3, 5, 4]], -np.pi / 2. - boxes[:, 6:7]], axis=1)
+
+
+def project_to_image(points, P2):
+    """Project rect camera points of any leading shape (..., 3) with a (3, 4) camera matrix.
+
+    Returns:
+        tuple: ((..., 2) image coordinates, (...) depth).
+    """
+    points = np.asarray(points)
+    img_pts = points @ P2[:, :3].T + P2[:, 3]
+    return img_pts[..., :2] / img_pts[..., 2:3], img_pts[..., 2]
+
+
+def corners3d_to_img_boxes(corners3d, P2):
+    """Project (N, 8, 3) rect camera corners to image boxes.
+
+    Returns:
+        tuple: ((N, 4) [x1, y1, x2, y2] boxes, (N, 8, 2) projected corners).
+    """
+    corners_img, _ = project_to_image(corners3d, P2)
+    boxes = np.concatenate([corners_img.min(axis=1), corners_img.max(axis=1)], axis=1)
+    return boxes, corners_img
+
+
+def boxes3d_bev_corners(boxes):
+    """Return the (N, 4, 2) counter-clockwise BEV corners of LiDAR boxes."""
+    boxes = np.asarray(boxes, dtype=np.float64)
+    local = BEV_CORNER_SIGNS[None] * boxes[:, None, 3:5]
+    cos, sin = np.cos(boxes[:, 6:7]), np.sin(boxes[:, 6:7])
+    return np.stack([cos * local[..., 0] - sin * local[..., 1] + boxes[:, 0:1],
+                     sin * local[..., 0] + cos * local[..., 1] + boxes[:, 1:2]], axis=-1)
+
+
+def _cross(a, b):
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def _inside(points, polygons, eps):
+    """(A, B, K) mask of the K points of pair (a, b) inside the counter-clockwise polygon b."""
+    edges = np.roll(polygons, -1, axis=1) - polygons  # (B, 4, 2)
+    rel = points[:, :, :, None, :] - polygons[None, :, None, :, :]  # (A, B, K, 4, 2)
+    return (_cross(edges[None, :, None], rel) >= -eps).all(axis=-1)
+
+
+def _bev_intersection_area(corners_a, corners_b, eps=1e-9):
+    """(A, B) intersection areas of counter-clockwise convex quadrilaterals.
+
+    The intersection polygon of every pair is made of the corners of each box
+    inside the other one and the edge crossings. The candidates are sorted by
+    angle around their centroid and measured with the shoelace formula.
+    """
+    num_a, num_b = len(corners_a), len(corners_b)
+    a_in_b = _inside(np.broadcast_to(corners_a[:, None], (num_a, num_b, 4, 2)), corners_b, eps)
+    b_in_a = _inside(np.broadcast_to(corners_b[:, None], (num_b, num_a, 4, 2)), corners_a, eps).swapaxes(0, 1)
+
+    # Edge crossings: p + t r meets q + u s.
+    p = corners_a[:, None, :, None, :]  # (A, 1, 4, 1, 2)
+    r = (np.roll(corners_a, -1, axis=1) - corners_a)[:, None, :, None, :]
+    q = corners_b[None, :, None, :, :]  # (1, B, 1, 4, 2)
+    s = (np.roll(corners_b, -1, axis=1) - corners_b)[None, :, None, :, :]
+    denom = _cross(r, s)
+    parallel = np.abs(denom) < eps
+    denom = np.where(parallel, 1.0, denom)
+    t = _cross(q - p, s) / denom
+    u = _cross(q - p, r) / denom
+    crossing_valid = ~parallel & (t >= -eps) & (t <= 1 + eps) & (u >= -eps) & (u <= 1 + eps)
+    crossings = p + t[..., None] * r  # (A, B, 4, 4, 2)
+
+    points = np.concatenate([np.broadcast_to(corners_a[:, None], (num_a, num_b, 4, 2)),
+                             np.broadcast_to(corners_b[None], (num_a, num_b, 4, 2)),
+                             crossings.reshape(num_a, num_b, 16, 2)], axis=2)  # (A, B, 24, 2)
+    valid = np.concatenate([a_in_b, b_in_a, crossing_valid.reshape(num_a, num_b, 16)], axis=2)
+
+    count = valid.sum(axis=2)
+    center = (points * valid[..., None]).sum(axis=2) / np.maximum(count, 1)[..., None]
+    angle = np.arctan2(points[..., 1] - center[..., 1:2], points[..., 0] - center[..., 0:1])
+    order = np.argsort(np.where(valid, angle, np.inf), axis=2)
+    points = np.take_along_axis(points, order[..., None], axis=2)
+    valid = np.take_along_axis(valid, order, axis=2)
+    # Invalid slots repeat the first point, so they add nothing and close the polygon.
+    points = np.where(valid[..., None], points, points[:, :, :1])
+    area = 0.5 * np.abs(_cross(points, np.roll(points, -1, axis=2)).sum(axis=2))
+    return np.where(count >= 3, area, 0.0)
+
+
+def bev_iou(boxes_a, boxes_b, max_pairs=1 << 18):
+    """Return the (N, M) bird's eye view IoU matrix of two sets of rotated LiDAR boxes.
+
+    Args:
+        boxes_a (np.ndarray): (N, 7) LiDAR boxes.
+        boxes_b (np.ndarray): (M, 7) LiDAR boxes.
+        max_pairs (int): Box pairs evaluated at a time, to bound memory use.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 7)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 7)
+    corners_a, corners_b = boxes3d_bev_corners(boxes_a), boxes3d_bev_corners(boxes_b)
+    area_a = boxes_a[:, 3] * boxes_a[:, 4]
+    area_b = boxes_b[:, 3] * boxes_b[:, 4]
+    iou = np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float64)
+    if not iou.size:
+        return iou
+    rows = max(1, max_pairs // len(boxes_b))
+    for start in range(0, len(boxes_a), rows):
+        inter = _bev_intersection_area(corners_a[start:start + rows], corners_b)
+        union = area_a[start:start + rows, None] + area_b[None] - inter
+        iou[start:start + rows] = inter / np.maximum(union, 1e-12)
+    return iou
+
+
+def points_in_boxes(points, boxes, max_pairs=1 << 24):
+    """Return the (N, P) mask of the points inside each LiDAR box.
+
+    Args:
+        points (np.ndarray): (P, 3 or more) LiDAR points; only x, y, z are used.
+        boxes (np.ndarray): (N, 7) LiDAR boxes.
+        max_pairs (int): Box-point pairs evaluated at a time, to bound memory use.
+    """
+    points = np.asarray(points)[:, 0:3]
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 7)
+    mask = np.zeros((len(boxes), len(points)), dtype=bool)
+    if not mask.size:
+        return mask
+    rows = max(1, max_pairs // len(points))
+    for start in range(0, len(boxes), rows):
+        chunk = boxes[start:start + rows]
+        shift = points[None] - chunk[:, None, 0:3]  # (n, P, 3)
+        cos, sin = np.cos(chunk[:, 6:7]), np.sin(chunk[:, 6:7])
+        local_x = shift[..., 0] * cos + shift[..., 1] * sin
+        local_y = -shift[..., 0] * sin + shift[..., 1] * cos
+        mask[start:start + rows] = ((np.abs(local_x) <= chunk[:, 3:4] / 2) &
+                                    (np.abs(local_y) <= chunk[:, 4:5] / 2) &
+                                    (np.abs(shift[..., 2]) <= chunk[:, 5:6] / 2))
+    return mask
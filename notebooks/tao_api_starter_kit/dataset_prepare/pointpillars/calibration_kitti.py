@@ -14,14 +14,43 @@
 
 """Calibration of KITTI dataset."""
 
+import collections
+import os
+import sys
+import threading
+
 import numpy as np
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.frame_shards import FrameShards, is_shard_dir  # noqa: E402
+
+CALIB_KEYS = ('P2', 'P3', 'R0', 'Tr_velo2cam')
+
+# Projection scratch buffers, one set per thread shared by all Calibration instances,
+# so cached calibrations hold only their matrices.
+_workspaces = threading.local()
+
+
+def _workspace(name, rows, cols, dtype):
+    """Return a (rows, cols) array of the calling thread reused across calls; only grows when rows does."""
+    buf = getattr(_workspaces, name, None)
+    if buf is None or buf.shape[0] < rows or buf.shape[1] != cols or buf.dtype != dtype:
+        buf = np.empty((max(rows, 1024), cols), dtype=dtype)
+        if name == 'hom':
+            buf[:, -1] = 1
+        setattr(_workspaces, name, buf)
+    return buf[:rows]
+
 
 def get_calib_from_file(calib_file):
     """Get calibration from file."""
     with open(calib_file) as f:
         lines = f.readlines()
+    return parse_calib_lines(lines)
+
 
+def parse_calib_lines(lines):
+    """Get calibration from the lines of a KITTI calib file."""
     obj = lines[2].strip().split(' ')[1:]
     P2 = np.array(obj, dtype=np.float32)
     obj = lines[3].strip().split(' ')[1:]
@@ -38,7 +67,13 @@ def get_calib_from_file(calib_file):
 
 
 class Calibration(object):
-    """Calibration class."""
+    """Calibration class.
+
+    The rect <-> lidar transforms are built once as 4 x 4 homogeneous
+    matrices. Points are projected through a homogeneous workspace that is
+    reused across calls and instances (one per thread), and every projection
+    accepts out= buffers, so a frame is transformed without temporary allocations.
+    """
 
     def __init__(self, calib_file):
         """Initialize."""
@@ -59,6 +94,30 @@ class Calibration(object):
         self.tx = self.P2[0, 3] / (-self.fu)
         self.ty = self.P2[1, 3] / (-self.fv)
 
+        R0_ext = np.eye(4, dtype=np.float32)
+        R0_ext[:3, :3] = self.R0
+        V2C_ext = np.eye(4, dtype=np.float32)
+        V2C_ext[:3, :] = self.V2C
+        self.lidar_to_rect_ext = np.dot(R0_ext, V2C_ext)  # (4, 4) lidar -> rect
+        # Right-multiplied (4, k) forms of the transforms, for row-vector points. They are computed
+        # and laid out exactly as the per-call versions were, so the float32 results are unchanged.
+        self._lidar_to_rect_T = np.dot(self.V2C.T, self.R0.T)  # (4, 3)
+        self._rect_to_lidar_T = np.linalg.inv(self.lidar_to_rect_ext.T)  # (4, 4)
+        self._rect_to_img_T = self.P2.T  # (4, 3)
+        self.rect_to_lidar_ext = self._rect_to_lidar_T.T  # (4, 4) rect -> lidar
+        # P2 @ R0 @ Tr_velo_to_cam, plus the rect depth row that rect_to_img divides by,
+        # so lidar_to_img projects in one matmul. Composed in float64, then rounded once.
+        lidar_to_rect64 = np.dot(R0_ext.astype(np.float64), V2C_ext.astype(np.float64))
+        self.lidar_to_img_ext = np.vstack([np.dot(self.P2.astype(np.float64), lidar_to_rect64),
+                                           lidar_to_rect64[2:3]]).astype(np.float32)  # (4, 4)
+        self._lidar_to_img_T = self.lidar_to_img_ext.T
+
+    def _hom(self, pts):
+        """Return pts (N, 3) in homogeneous coordinates, in the reused workspace."""
+        pts_hom = _workspace('hom', pts.shape[0], 4, np.result_type(pts.dtype, np.float32))
+        pts_hom[:, :3] = pts
+        return pts_hom
+
     def cart_to_hom(self, pts):
         """
         :param pts: (N, 3 or 2)
@@ -67,49 +126,60 @@ class Calibration(object):
         pts_hom = np.hstack((pts, np.ones((pts.shape[0], 1), dtype=np.float32)))
         return pts_hom
 
-    def rect_to_lidar(self, pts_rect):
+    def rect_to_lidar(self, pts_rect, out=None):
         """
-        :param pts_lidar: (N, 3)
-        :return pts_rect: (N, 3)
+        :param pts_rect: (N, 3)
+        :param out: optional (N, 3) output buffer
+        :return pts_lidar: (N, 3)
         """
-        pts_rect_hom = self.cart_to_hom(pts_rect)  # (N, 4)
-        R0_ext = np.hstack((self.R0, np.zeros((3, 1), dtype=np.float32)))  # (3, 4)
-        R0_ext = np.vstack((R0_ext, np.zeros((1, 4), dtype=np.float32)))  # (4, 4)
-        R0_ext[3, 3] = 1
-        V2C_ext = np.vstack((self.V2C, np.zeros((1, 4), dtype=np.float32)))  # (4, 4)
-        V2C_ext[3, 3] = 1
+        pts_rect_hom = self._hom(pts_rect)  # (N, 4)
+        pts_lidar = _workspace('lidar', pts_rect_hom.shape[0], 4,
+                               np.result_type(pts_rect_hom, self._rect_to_lidar_T))
+        np.dot(pts_rect_hom, self._rect_to_lidar_T, out=pts_lidar)
+        if out is None:
+            return pts_lidar[:, 0:3].copy()
+        out[...] = pts_lidar[:, 0:3]
+        return out
 
-        pts_lidar = np.dot(pts_rect_hom, np.linalg.inv(np.dot(R0_ext, V2C_ext).T))
-        return pts_lidar[:, 0:3]
-
-    def lidar_to_rect(self, pts_lidar):
+    def lidar_to_rect(self, pts_lidar, out=None):
         """
         :param pts_lidar: (N, 3)
+        :param out: optional (N, 3) output buffer
         :return pts_rect: (N, 3)
         """
-        pts_lidar_hom = self.cart_to_hom(pts_lidar)
-        pts_rect = np.dot(pts_lidar_hom, np.dot(self.V2C.T, self.R0.T))
-        # pts_rect = reduce(np.dot, (pts_lidar_hom, self.V2C.T, self.R0.T))
-        return pts_rect
+        return np.dot(self._hom(pts_lidar), self._lidar_to_rect_T, out=out)
 
-    def rect_to_img(self, pts_rect):
+    def rect_to_img(self, pts_rect, out=None, depth_out=None):
         """
         :param pts_rect: (N, 3)
+        :param out: optional (N, 2) output buffer for pts_img
+        :param depth_out: optional (N,) output buffer for pts_rect_depth
         :return pts_img: (N, 2)
         """
-        pts_rect_hom = self.cart_to_hom(pts_rect)
-        pts_2d_hom = np.dot(pts_rect_hom, self.P2.T)
-        pts_img = (pts_2d_hom[:, 0:2].T / pts_rect_hom[:, 2]).T  # (N, 2)
-        pts_rect_depth = pts_2d_hom[:, 2] - self.P2.T[3, 2]  # depth in rect camera coord
+        pts_rect_hom = self._hom(pts_rect)
+        pts_2d_hom = _workspace('img', pts_rect_hom.shape[0], 3,
+                                np.result_type(pts_rect_hom, self._rect_to_img_T))
+        np.dot(pts_rect_hom, self._rect_to_img_T, out=pts_2d_hom)
+        pts_img = np.divide(pts_2d_hom[:, 0:2], pts_rect_hom[:, 2:3], out=out)  # (N, 2)
+        pts_rect_depth = np.subtract(pts_2d_hom[:, 2], self.P2.T[3, 2], out=depth_out)  # depth in rect camera coord
         return pts_img, pts_rect_depth
 
-    def lidar_to_img(self, pts_lidar):
+    def lidar_to_img(self, pts_lidar, out=None, depth_out=None):
         """
+        Project with the pre-multiplied lidar_to_img_ext. The result equals
+        rect_to_img(lidar_to_rect(pts_lidar)) up to float32 rounding.
+
         :param pts_lidar: (N, 3)
+        :param out: optional (N, 2) output buffer for pts_img
+        :param depth_out: optional (N,) output buffer for pts_rect_depth
         :return pts_img: (N, 2)
         """
-        pts_rect = self.lidar_to_rect(pts_lidar)
-        pts_img, pts_depth = self.rect_to_img(pts_rect)
+        pts_lidar_hom = self._hom(pts_lidar)
+        pts_2d_hom = _workspace('img4', pts_lidar_hom.shape[0], 4,
+                                np.result_type(pts_lidar_hom, self._lidar_to_img_T))
+        np.dot(pts_lidar_hom, self._lidar_to_img_T, out=pts_2d_hom)
+        pts_img = np.divide(pts_2d_hom[:, 0:2], pts_2d_hom[:, 3:4], out=out)  # (N, 2)
+        pts_depth = np.subtract(pts_2d_hom[:, 2], self.P2.T[3, 2], out=depth_out)  # depth in rect camera coord
         return pts_img, pts_depth
 
     def img_to_rect(self, u, v, depth_rect):
@@ -143,3 +213,103 @@ class Calibration(object):
         boxes_corner = np.concatenate((x.reshape(-1, 8, 1), y.reshape(-1, 8, 1)), axis=2)
 
         return boxes, boxes_corner
+
+
+class CalibrationStore(object):
+    """Deduplicated calibrations of a KITTI calib directory in one .npz file.
+
+    The store holds the distinct P2, P3, R0 and Tr_velo2cam matrices stacked
+    along the first axis, the sorted frame names and the calibration index of
+    every frame. Calibration instances are built on demand and the most
+    recently used ones are kept, so frames sharing a calibration share one
+    instance and its precomputed transforms.
+    """
+
+    def __init__(self, store_file, max_cached=64):
+        """Initialize.
+
+        Args:
+            store_file (str): .npz file written by CalibrationStore.build.
+            max_cached (int): Number of Calibration instances kept.
+        """
+        with np.load(store_file) as store:
+            self.calibs = {key: store[key] for key in CALIB_KEYS}
+            self.frames = store['frames']
+            self.calib_index = store['calib_index']
+        self.max_cached = max_cached
+        self._cache = collections.OrderedDict()
+
+    @staticmethod
+    def build(calib_dir, store_file):
+        """Scan calib_dir once and write its deduplicated calibrations to store_file.
+
+        Files with identical content are parsed once; files that parse to the
+        same matrices share one entry.
+
+        Returns:
+            tuple: (number of frames, number of distinct calibrations).
+        """
+        frames = sorted(name[:-4] for name in os.listdir(calib_dir) if name.endswith('.txt'))
+        by_content, by_value, calib_index = {}, {}, np.empty(len(frames), dtype=np.int32)
+        matrices = {key: [] for key in CALIB_KEYS}
+        for idx, frame in enumerate(frames):
+            with open(os.path.join(calib_dir, frame + '.txt'), 'rb') as f:
+                content = f.read()
+            if content not in by_content:
+                calib = parse_calib_lines(content.decode().splitlines())
+                value = b''.join(calib[key].tobytes() for key in CALIB_KEYS)
+                if value not in by_value:
+                    by_value[value] = len(by_value)
+                    for key in CALIB_KEYS:
+                        matrices[key].append(calib[key])
+                by_content[content] = by_value[value]
+            calib_index[idx] = by_content[content]
+
+        with open(store_file, 'wb') as f:
+            np.savez(f, frames=np.array(frames, dtype=str), calib_index=calib_index,
+                     **{key: np.array(matrices[key], dtype=np.float32).reshape((-1,) + shape)
+                        for key, shape in zip(CALIB_KEYS, ((3, 4), (3, 4), (3, 3), (3, 4)))})
+        return len(frames), len(by_value)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def index_of(self, frame):
+        """Return the calibration index of a frame name, e.g. "000123"."""
+        pos = int(np.searchsorted(self.frames, frame))
+        if pos == len(self.frames) or self.frames[pos] != frame:
+            raise KeyError(f"Frame {frame} is not in the calibration store")
+        return int(self.calib_index[pos])
+
+    def calib_dict(self, frame):
+        """Return the calibration dict of a frame, as get_calib_from_file."""
+        idx = self.index_of(frame)
+        return {key: self.calibs[key][idx] for key in CALIB_KEYS}
+
+    def get(self, frame):
+        """Return the Calibration of a frame, reusing a cached instance."""
+        idx = self.index_of(frame)
+        calib = self._cache.get(idx)
+        if calib is None:
+            calib = Calibration({key: self.calibs[key][idx] for key in CALIB_KEYS})
+            self._cache[idx] = calib
+            if len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(idx)
+        return calib
+
+
+def calibration_loader(calib_path):
+    """Return a function from frame name to Calibration.
+
+    Args:
+        calib_path (str): Directory of per-frame calib .txt files, an .npz
+            CalibrationStore built from one, or a directory of frame shards.
+    """
+    if os.path.isfile(calib_path):
+        return CalibrationStore(calib_path).get
+    if is_shard_dir(calib_path):
+        shards = FrameShards(calib_path)
+        return lambda frame: Calibration(parse_calib_lines(shards.read(frame, 'calib').decode().splitlines()))
+    return lambda frame: Calibration(os.path.join(calib_path, frame + '.txt'))
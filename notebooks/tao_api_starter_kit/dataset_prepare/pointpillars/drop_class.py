@@ -17,28 +17,59 @@
 import os
 import sys
 
+import numpy as np
 
-def drop_class(label_dir, classes):
-    """drop label by class names."""
-    labels = os.listdir(label_dir)
-    labels = [os.path.join(label_dir, x) for x in labels]
-    for gt in labels:
-        print("Processing ", gt)
-        with open(gt) as f:
-            lines = f.readlines()
-            lines_ret = []
-            for line in lines:
-                ls = line.strip()
-                line = ls.split()
-                if line[0] in classes:
-                    print("Dropping ", line[0])
-                    continue
-                else:
-                    lines_ret.append(ls)
-        with open(gt, "w") as fo:
-            out = '\n'.join(lines_ret)
-            fo.write(out)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.kitti_index import KittiLabelIndex  # noqa: E402
+
+
+def drop_class_from_file(label_file, classes):
+    """Remove the objects of classes from a label file, rewriting it only if one is dropped.
+
+    Returns:
+        tuple: (number of dropped objects, new file size or None if the file is unchanged).
+    """
+    with open(label_file) as f:
+        lines = [line.strip() for line in f]
+    lines_ret = [line for line in lines if not line or line.split()[0] not in classes]
+    if len(lines_ret) == len(lines):
+        return 0, None
+    out = '\n'.join(lines_ret)
+    with open(label_file, "w") as fo:
+        fo.write(out)
+    return len(lines) - len(lines_ret), len(out.encode())
+
+
+def drop_class(label_dir, classes, index_file=None):
+    """drop label by class names.
+
+    With an index built by gen_label_index.py only the files holding one of
+    the classes are opened, and the index is updated with their new counts.
+    """
+    classes = set(classes)
+    if index_file:
+        index = KittiLabelIndex.load(index_file)
+        columns = index.class_columns(classes)
+        rows = np.flatnonzero(index.frames_with_classes(classes)).tolist()
+        labels = [(index.frames[row] + ".txt", row) for row in rows]
+        num_files = len(index)
+    else:
+        labels = [(label, None) for label in os.listdir(label_dir)]
+        num_files = len(labels)
+    num_dropped = num_changed = 0
+    for label, row in labels:
+        dropped, size = drop_class_from_file(os.path.join(label_dir, label), classes)
+        if size is None:
+            continue
+        num_dropped += dropped
+        num_changed += 1
+        if row is not None:
+            index.counts[row, columns] = 0
+            index.sizes[row] = size
+    if index_file and num_changed:
+        index.save(index_file)
+    print(f"Dropped {num_dropped} objects of {', '.join(sorted(classes))} from {num_changed} of {num_files} label files")
 
 
 if __name__ == "__main__":
-    drop_class(sys.argv[1], sys.argv[2].split(','))
+    drop_class(sys.argv[1], sys.argv[2].split(','), sys.argv[3] if len(sys.argv) > 3 else None)
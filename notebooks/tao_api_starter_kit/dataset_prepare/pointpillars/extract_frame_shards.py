@@ -0,0 +1,49 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Restore the KITTI directory layout of frame shards written by obtain_subset.py --shard-dir."""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.frame_shards import FrameShards  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Extract frame shards into calib, image_2, label_2 and velodyne directories.")
+    parser.add_argument(
+        "-s", "--shard_dir",
+        type=str, required=True,
+        help="Directory of frame shards and their index.json"
+    )
+    parser.add_argument(
+        "-o", "--output_dir",
+        type=str, required=True,
+        help="Output directory, e.g. training"
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int, default=1,
+        help="Number of processes extracting shards"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    shards = FrameShards(args.shard_dir)
+    num_files = shards.extract(args.output_dir, args.workers)
+    print(f"Extracted {num_files} files of {len(shards)} frames to {args.output_dir}")
@@ -0,0 +1,40 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Consolidate a KITTI calib directory into one deduplicated calibration store."""
+
+import argparse
+
+from calibration_kitti import CalibrationStore
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Build a deduplicated calibration store from a calib directory.")
+    parser.add_argument(
+        "-c", "--calib_dir",
+        type=str, required=True,
+        help="Calibration file directory"
+    )
+    parser.add_argument(
+        "-o", "--output_file",
+        type=str, required=True,
+        help="Output calibration store (.npz), accepted as --calib_dir by gen_lidar_points.py and gen_lidar_labels.py"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    num_frames, num_calibs = CalibrationStore.build(args.calib_dir, args.output_file)
+    print(f"Stored {num_calibs} distinct calibrations of {num_frames} frames in {args.output_file}")
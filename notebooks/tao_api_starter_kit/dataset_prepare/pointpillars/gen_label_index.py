@@ -0,0 +1,44 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Scan a KITTI label directory once into a label index for drop_class, kitti_split and obtain_subset."""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.kitti_index import KittiLabelIndex  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Build a per-frame class count index of a KITTI label directory.")
+    parser.add_argument(
+        "-l", "--label_dir",
+        type=str, required=True,
+        help="Camera label directory, e.g. training/label_2"
+    )
+    parser.add_argument(
+        "-o", "--output_file",
+        type=str, required=True,
+        help="Output label index (.npz)"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    index = KittiLabelIndex.build(args.label_dir)
+    index.save(args.output_file)
+    print(f"Indexed {len(index)} label files with classes {', '.join(index.class_names)} in {args.output_file}")
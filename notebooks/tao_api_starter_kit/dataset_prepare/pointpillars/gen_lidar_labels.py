@@ -15,12 +15,18 @@
 # Copyright (c) 2022, NVIDIA CORPORATION.  All rights reserved.
 
 import os
+import sys
 import argparse
+import multiprocessing
 
 import numpy as np
 
-from object3d_kitti import get_objects_from_label
-from calibration_kitti import Calibration
+from box3d_kitti import boxes3d_camera_to_lidar
+from calibration_kitti import calibration_loader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.frame_shards import FrameShards, is_shard_dir  # noqa: E402
+from common.kitti_label import parse_kitti_label_files  # noqa: E402
 
 
 def parse_args():
@@ -28,41 +34,132 @@ def parse_args():
     parser.add_argument(
         "-l", "--label_dir",
         type=str, required=True,
-        help="Camera label directory."
+        help="Camera label directory, or a directory of frame shards."
     )
     parser.add_argument(
         "-c", "--calib_dir",
         type=str, required=True,
-        help="Calibration file directory"
+        help="Calibration file directory, a calibration store built by gen_calib_store.py, or frame shards"
     )
     parser.add_argument(
         "-o", "--output_dir",
         type=str, required=True,
         help="Output LiDAR label directory"
     )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int, default=1,
+        help="Number of processes converting label files"
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int, default=256,
+        help="Label files parsed together in one batch"
+    )
     return parser.parse_args()
 
 
-def generate_lidar_labels(label_dir, calib_dir, output_dir):
-    """Generate LiDAR labels from KITTI Camera labels."""
-    for lab in os.listdir(label_dir):
-        lab_file = os.path.join(label_dir, lab)
-        obj_list = get_objects_from_label(lab_file)
-        calib_file = os.path.join(calib_dir, lab)
-        calib = Calibration(calib_file)
-        loc = np.concatenate([obj.loc.reshape(1, 3) for obj in obj_list], axis=0)
-        loc_lidar = calib.rect_to_lidar(loc)
-        # update obj3d.loc
+LIDAR_LABEL_FORMAT = "%s %.2f %d %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f\n"
+
+
+def lidar_label_text(names, objects, calib):
+    """Return the LiDAR label file text of the camera label objects of one frame.
+
+    All locations go through a single calib.rect_to_lidar call; the bottom center
+    is lifted to the 3D center and rotation_y becomes rotation_z, see
+    boxes3d_camera_to_lidar.
+
+    Args:
+        names (list): Class name of every object.
+        objects (np.ndarray): KITTI_LABEL_DTYPE objects of the frame.
+        calib (Calibration): Calibration of the frame.
+    """
+    if not len(objects):
+        return ""
+    h, w, l = objects["dimensions"].T  # noqa: E741
+    boxes = np.column_stack([objects["location"], l, h, w, objects["rotation_y"]])
+    lidar_boxes = boxes3d_camera_to_lidar(boxes, calib)
+    box2d = objects["bbox"].astype(np.float32)
+    rows = zip(names, objects["truncation"].tolist(), objects["occlusion"].astype(int).tolist(),
+               objects["alpha"].tolist(), *box2d.T.tolist(), *objects["dimensions"].T.tolist(),
+               *lidar_boxes[:, 0:3].T.tolist(), lidar_boxes[:, 6].tolist())
+    return "".join(LIDAR_LABEL_FORMAT % row for row in rows)
+
+
+def shard_label_reader(label_dir):
+    """Return a function reading a label file name from frame shards, or None if label_dir is a plain directory."""
+    if not is_shard_dir(label_dir):
+        return None
+    shards = FrameShards(label_dir)
+    return lambda lab: shards.read(lab[:-4], "label_2").decode()
+
+
+def convert_label_files(label_files, output_dir, load_calib, read_file=None):
+    """Convert camera label files, parsed in one batch, to LiDAR label files of the same name.
+
+    Every output file is written with a single call; a frame without objects
+    gives an empty file.
+
+    Args:
+        label_files (list): Label file paths, or file names read with read_file.
+        output_dir (str): Output LiDAR label directory.
+        load_calib (callable): Function from frame name to Calibration.
+        read_file (callable): Function returning the text of a label file, see parse_kitti_label_files.
+
+    Returns:
+        int: Number of files written.
+    """
+    labels = parse_kitti_label_files(label_files, read_file=read_file)
+    names = labels.names()
+    for idx, label_file in enumerate(label_files):
+        lab = os.path.basename(label_file)
+        start, end = labels.offsets[idx], labels.offsets[idx + 1]
+        text = lidar_label_text(names[start:end], labels.objects[start:end], load_calib(lab[:-4])) \
+            if end > start else ""
         with open(os.path.join(output_dir, lab), "w") as lf:
-            for idx, lc in enumerate(loc_lidar):
-                # bottom center to 3D center
-                obj_list[idx].loc = (lc + np.array([0., 0., obj_list[idx].h / 2.]))
-                # rotation_y to rotation_z
-                obj_list[idx].ry = -np.pi / 2. - obj_list[idx].ry
-                lf.write(obj_list[idx].to_kitti_format())
-                lf.write('\n')
+            lf.write(text)
+    return len(label_files)
+
+
+_worker_load_calib = None
+_worker_read_file = None
+
+
+def _init_worker(calib_dir, label_dir):
+    global _worker_load_calib, _worker_read_file
+    _worker_load_calib = calibration_loader(calib_dir)
+    _worker_read_file = shard_label_reader(label_dir)
+
+
+def _convert_label_files_worker(label_files, output_dir):
+    """Pool entry point for convert_label_files."""
+    return convert_label_files(label_files, output_dir, _worker_load_calib, _worker_read_file)
+
+
+def generate_lidar_labels(label_dir, calib_dir, output_dir, workers=1, batch_size=256):
+    """Generate LiDAR labels from KITTI Camera labels.
+
+    Label files are parsed batch_size at a time, and with workers > 1 the
+    batches are converted on a process pool. The output files do not depend
+    on either setting. label_dir and calib_dir may be directories of frame
+    shards, read without extracting them.
+    """
+    if is_shard_dir(label_dir):
+        label_files = FrameShards(label_dir).file_names("label_2")
+    else:
+        label_files = [os.path.join(label_dir, lab) for lab in os.listdir(label_dir)]
+    batch_size = max(batch_size, 1)
+    batches = [(label_files[start:start + batch_size], output_dir)
+               for start in range(0, len(label_files), batch_size)]
+    if workers > 1:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(calib_dir, label_dir)) as pool:
+            return sum(pool.starmap(_convert_label_files_worker, batches, chunksize=1))
+
+    load_calib = calibration_loader(calib_dir)
+    read_file = shard_label_reader(label_dir)
+    return sum(convert_label_files(files, output_dir, load_calib, read_file) for files, _ in batches)
 
 
 if __name__ == "__main__":
     args = parse_args()
-    generate_lidar_labels(args.label_dir, args.calib_dir, args.output_dir)
+    generate_lidar_labels(args.label_dir, args.calib_dir, args.output_dir, args.workers, args.batch_size)
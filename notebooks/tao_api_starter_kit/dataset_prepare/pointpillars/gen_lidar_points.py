@@ -15,11 +15,20 @@
 # Copyright (c) 2022, NVIDIA CORPORATION.  All rights reserved.
 
 import os
+import sys
+import time
+import zlib
+import queue
 import argparse
+import threading
+import multiprocessing
 
 import numpy as np
-from skimage import io
-from calibration_kitti import Calibration
+from calibration_kitti import calibration_loader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.frame_shards import FrameShards, is_shard_dir  # noqa: E402
+from common.image_size import ImageSizeCache, read_image_size  # noqa: E402
 
 
 def parse_args():
@@ -27,23 +36,43 @@ def parse_args():
     parser.add_argument(
         "-p", "--points_dir",
         type=str, required=True,
-        help="LIDAR points directory."
+        help="LIDAR points directory, or a directory of frame shards."
     )
     parser.add_argument(
         "-c", "--calib_dir",
         type=str, required=True,
-        help="Calibration file directory"
+        help="Calibration file directory, a calibration store built by gen_calib_store.py, or frame shards"
     )
     parser.add_argument(
         "-o", "--output_dir",
         type=str, required=True,
-        help="Output LiDAR points directory"
+        help="Output LiDAR points directory; may be the points directory to crop in place"
     )
     parser.add_argument(
         "-i",
         "--image_dir",
         type=str, required=True,
-        help="image directory"
+        help="image directory, or a directory of frame shards"
+    )
+    parser.add_argument(
+        "-s", "--size_cache",
+        type=str, default=None,
+        help="Optional image size cache file reused across runs"
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Check every written file against a CRC-32 of the cropped points"
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int, default=1,
+        help="Number of processes cropping frames; reads and writes run in their own threads"
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int, default=0,
+        help="Project and filter clouds in blocks of this many points to bound memory; 0 takes whole clouds"
     )
     return parser.parse_args()
 
@@ -57,27 +86,283 @@ def get_fov_flag(pts_rect, img_shape, calib):
     return pts_valid_flag
 
 
-def generate_lidar_points(points_dir, calib_dir, output_dir, image_dir):
-    """Limit LiDAR points to FOV range."""
-    for pts in os.listdir(points_dir):
-        pts_file = os.path.join(points_dir, pts)
-        points = np.fromfile(pts_file, dtype=np.float32).reshape(-1, 4)
-        calib_file = os.path.join(calib_dir, pts[:-4] + ".txt")
-        calib = Calibration(calib_file)
-        pts_rect = calib.lidar_to_rect(points[:, 0:3])
-        img_file = os.path.join(image_dir, pts[:-4] + ".png")
-        img_shape = np.array(io.imread(img_file).shape[:2], dtype=np.int32)
-        fov_flag = get_fov_flag(pts_rect, img_shape, calib)
-        points = points[fov_flag]
-        points.tofile(os.path.join(output_dir, pts))
-        # double check
-        points_cp = np.fromfile(os.path.join(output_dir, pts), dtype=np.float32).reshape(-1, 4)
-        assert np.equal(points, points_cp).all()
+def load_points(pts_file):
+    """Memory-map a KITTI .bin point cloud as (N, 4) float32."""
+    if os.path.getsize(pts_file) == 0:
+        return np.empty((0, 4), dtype=np.float32)
+    return np.memmap(pts_file, dtype=np.float32, mode="r").reshape(-1, 4)
+
+
+def points_reader(points_dir):
+    """Return a function mapping a point cloud file name of points_dir to its memory-mapped (N, 4) cloud.
+
+    points_dir is a velodyne directory or a directory of frame shards, whose
+    clouds are mapped straight from the shard files.
+    """
+    if is_shard_dir(points_dir):
+        shards = FrameShards(points_dir)
+        return lambda pts: shards.memmap(pts[:-4], "velodyne", np.float32).reshape(-1, 4)
+    return lambda pts: load_points(os.path.join(points_dir, pts))
+
+
+def list_points(points_dir):
+    """Return the point cloud file names of a velodyne directory or a directory of frame shards."""
+    if is_shard_dir(points_dir):
+        return FrameShards(points_dir).file_names("velodyne")
+    # Temporary files of an interrupted in-place run are left out.
+    return [name for name in os.listdir(points_dir) if not name.endswith(".tmp")]
+
+
+def image_shape_loader(image_dir, image_sizes):
+    """Return a function mapping a frame name to its (height, width) image shape.
+
+    Args:
+        image_dir (str): image_2 directory of .png files, or a directory of frame shards.
+        image_sizes (ImageSizeCache): Cache of the sizes of image files.
+    """
+    if is_shard_dir(image_dir):
+        shards = FrameShards(image_dir)
+        return lambda frame: np.array(read_image_size(shards.open(frame, "image_2"), frame), dtype=np.int32)
+    return lambda frame: np.array(image_sizes.get_size(os.path.join(image_dir, frame + ".png")), dtype=np.int32)
+
+
+def file_crc32(path, chunk_size=8 << 20):
+    """Return the CRC-32 of a file, read in chunks."""
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def write_point_chunks(chunks, output_file, verify=False):
+    """Write point arrays to output_file one after another; with verify, compare the file to their CRC-32.
+
+    The arrays are written to a temporary file that then replaces output_file,
+    so output_file may be the memory-mapped input of the chunks.
+    """
+    crc = 0
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        for points in chunks:
+            points = np.ascontiguousarray(points)
+            points.tofile(f)
+            crc = zlib.crc32(points, crc)
+    if verify and file_crc32(tmp_file) != crc:
+        raise IOError(f"Verification of {output_file} failed")
+    os.replace(tmp_file, output_file)
+
+
+def write_points(points, output_file, verify=False):
+    """Write points to output_file; with verify, compare the file to a CRC-32 of the buffer."""
+    write_point_chunks([points], output_file, verify)
+
+
+def iter_fov_chunks(points, calib, img_shape, chunk_size):
+    """Yield the points of a (N, 4) cloud inside the FOV, chunk_size points at a time.
+
+    Each block is projected and masked in buffers allocated once per cloud, so
+    the temporaries of get_fov_flag are bounded by chunk_size instead of the
+    cloud size. The surviving points are the same as get_fov_flag selects.
+    """
+    dtype = np.result_type(points.dtype, np.float32)
+    pts_rect = np.empty((chunk_size, 3), dtype=dtype)
+    pts_img = np.empty((chunk_size, 2), dtype=dtype)
+    pts_rect_depth = np.empty(chunk_size, dtype=dtype)
+    flag = np.empty(chunk_size, dtype=bool)
+    val_flag = np.empty(chunk_size, dtype=bool)
+    for start in range(0, len(points), chunk_size):
+        block = points[start:start + chunk_size]
+        n = len(block)
+        calib.lidar_to_rect(block[:, 0:3], out=pts_rect[:n])
+        calib.rect_to_img(pts_rect[:n], out=pts_img[:n], depth_out=pts_rect_depth[:n])
+        np.greater_equal(pts_rect_depth[:n], 0, out=flag[:n])
+        for axis, size in ((0, img_shape[1]), (1, img_shape[0])):
+            np.greater_equal(pts_img[:n, axis], 0, out=val_flag[:n])
+            flag[:n] &= val_flag[:n]
+            np.less(pts_img[:n, axis], size, out=val_flag[:n])
+            flag[:n] &= val_flag[:n]
+        yield block[flag[:n]]
+
+
+def crop_frame(points, calib, img_shape, chunk_size=0):
+    """Return the points of a (N, 4) cloud that project into an image of img_shape.
+
+    A chunk_size > 0 filters the cloud block by block, see iter_fov_chunks.
+    """
+    if chunk_size > 0:
+        return np.concatenate([points[:0]] + list(iter_fov_chunks(points, calib, img_shape, chunk_size)))
+    pts_rect = calib.lidar_to_rect(points[:, 0:3])
+    fov_flag = get_fov_flag(pts_rect, img_shape, calib)
+    # Only the points inside the FOV are copied out of a mapped file.
+    return points[fov_flag]
+
+
+class StageCounter(object):
+    """Frames, bytes and busy time of one pipeline stage."""
+
+    def __init__(self, name):
+        """Initialize."""
+        self.name = name
+        self.frames = 0
+        self.nbytes = 0
+        self.seconds = 0.0
+
+    def add(self, nbytes, seconds):
+        """Count one frame of nbytes that kept the stage busy for seconds."""
+        self.frames += 1
+        self.nbytes += nbytes
+        self.seconds += seconds
+
+    def __str__(self):
+        busy = max(self.seconds, 1e-9)
+        return (f"{self.name}: {self.frames} frames, {self.nbytes / 1e6:.1f} MB in {self.seconds:.1f}s busy "
+                f"({self.frames / busy:.1f} frames/s, {self.nbytes / 1e6 / busy:.1f} MB/s)")
+
+
+_worker_load_calib = None
+_worker_read_points = None
+_worker_chunk_size = 0
+
+
+def _init_worker(calib_dir, points_dir, chunk_size):
+    global _worker_load_calib, _worker_read_points, _worker_chunk_size
+    _worker_load_calib = calibration_loader(calib_dir)
+    _worker_read_points = points_reader(points_dir)
+    _worker_chunk_size = chunk_size
+
+
+def _crop_frame_worker(pts, img_shape):
+    """Pool entry point mapping a cloud and cropping it, also returning its size and the time spent."""
+    start = time.perf_counter()
+    points = _worker_read_points(pts)
+    cropped = crop_frame(points, _worker_load_calib(pts[:-4]), img_shape, _worker_chunk_size)
+    return cropped, points.nbytes, time.perf_counter() - start
+
+
+def _generate_lidar_points_parallel(frames, points_dir, image_shape, calib_dir, output_dir,
+                                    verify, workers, max_inflight, chunk_size=0):
+    """Crop frames on a process pool, with a submitting thread and a writer thread.
+
+    The submitting thread probes the image size of every frame and sends its
+    file name, in order, blocking once max_inflight frames are queued. Each
+    worker memory-maps the cloud itself and crops it chunk_size points at a
+    time, so only the cropped points cross processes. Results are handed to
+    the writer in submission order, so the output is the same as the serial
+    path with bounded memory use.
+    """
+    counters = [StageCounter(name) for name in ("probe", "crop", "write")]
+    probe_counter, crop_counter, write_counter = counters
+    pending = queue.Queue(max_inflight)
+    writes = queue.Queue(max_inflight)
+    stop = threading.Event()
+    errors = []
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(calib_dir, points_dir, chunk_size)) as pool:
+        def read():
+            try:
+                for pts in frames:
+                    if stop.is_set():
+                        break
+                    start = time.perf_counter()
+                    img_shape = image_shape(pts[:-4])
+                    probe_counter.add(0, time.perf_counter() - start)
+                    result = pool.apply_async(_crop_frame_worker, (pts, img_shape))
+                    pending.put((pts, result))
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                pending.put(None)
+
+        def write():
+            while True:
+                item = writes.get()
+                if item is None:
+                    return
+                if stop.is_set():
+                    continue
+                pts, points = item
+                start = time.perf_counter()
+                try:
+                    write_points(points, os.path.join(output_dir, pts), verify)
+                except BaseException as e:
+                    errors.append(e)
+                    stop.set()
+                write_counter.add(points.nbytes, time.perf_counter() - start)
+
+        threads = [threading.Thread(target=read, daemon=True), threading.Thread(target=write, daemon=True)]
+        for thread in threads:
+            thread.start()
+        start = time.perf_counter()
+        item = ()
+        try:
+            while True:
+                item = pending.get()
+                if item is None or stop.is_set():
+                    break
+                pts, result = item
+                points, nbytes, seconds = result.get()
+                crop_counter.add(nbytes, seconds)
+                writes.put((pts, points))
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            writes.put(None)
+            # Unblock the reader if it is waiting on a full queue.
+            while item is not None:
+                item = pending.get()
+            for thread in threads:
+                thread.join()
+    if errors:
+        raise errors[0]
+
+    elapsed = time.perf_counter() - start
+    for counter in counters:
+        print(counter)
+    print(f"total: {write_counter.frames} frames in {elapsed:.1f}s "
+          f"({write_counter.frames / max(elapsed, 1e-9):.1f} frames/s)")
+
+
+def generate_lidar_points(points_dir, calib_dir, output_dir, image_dir, size_cache=None, verify=False, workers=1,
+                          chunk_size=0):
+    """Limit LiDAR points to FOV range.
+
+    With chunk_size > 0 the serial path streams every mapped cloud block by
+    block straight to its output file, so memory use does not grow with the
+    cloud size. With workers > 1 every worker maps and chunks its clouds the
+    same way and only the cropped points are sent back. Each of points_dir,
+    calib_dir and image_dir may be a directory of frame shards, read without
+    extracting it.
+    """
+    image_sizes = ImageSizeCache(size_cache)
+    frames = list_points(points_dir)
+    image_shape = image_shape_loader(image_dir, image_sizes)
+    if workers > 1:
+        _generate_lidar_points_parallel(frames, points_dir, image_shape, calib_dir, output_dir,
+                                        verify, workers, 4 * workers, chunk_size)
+        image_sizes.save()
+        return
+
+    load_calib = calibration_loader(calib_dir)
+    read_points = points_reader(points_dir)
+    for pts in frames:
+        points = read_points(pts)
+        calib = load_calib(pts[:-4])
+        img_shape = image_shape(pts[:-4])
+        output_file = os.path.join(output_dir, pts)
+        if chunk_size > 0:
+            write_point_chunks(iter_fov_chunks(points, calib, img_shape, chunk_size), output_file, verify)
+        else:
+            write_points(crop_frame(points, calib, img_shape), output_file, verify)
+    image_sizes.save()
 
 
 if __name__ == "__main__":
     args = parse_args()
     generate_lidar_points(
         args.points_dir, args.calib_dir,
-        args.output_dir, args.image_dir
+        args.output_dir, args.image_dir,
+        args.size_cache, args.verify, args.workers,
+        args.chunk_size
     )
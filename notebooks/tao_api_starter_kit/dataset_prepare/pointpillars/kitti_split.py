@@ -17,12 +17,48 @@
 import os
 import sys
 
+import numpy as np
 
-def split(list_file, lidar, label, output_lidar, output_label):
-    """train/val split of the KITTI dataset."""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.kitti_index import KittiLabelIndex  # noqa: E402
+
+
+def split(list_file, lidar, label, output_lidar, output_label, index_file=None, output_index_file=None):
+    """train/val split of the KITTI dataset.
+
+    With a label index built by gen_label_index.py, the listed frames are
+    looked up in the index instead of listing both directories. The index is
+    updated to the frames left in label, and the moved frames are written to
+    output_index_file if given. A stale index is reported with a warning:
+    listed frames missing from the index are moved but not indexed, and listed
+    frames of the index without a label file only have their lidar moved.
+    """
     with open(list_file) as lf:
-        file_names = lf.readlines()
-    file_names = [f.strip() for f in file_names]
+        file_names = set(f.strip() for f in lf if f.strip())
+    if index_file:
+        index = KittiLabelIndex.load(index_file)
+        unindexed = sorted(name for name in file_names if name not in index)
+        if unindexed:
+            print(f"Warning: label index {index_file} is stale; {len(unindexed)} listed frames are not in it "
+                  f"and are moved without being indexed. Rebuild it with gen_label_index.py.")
+        rows = np.array(sorted(index.row(name) for name in file_names if name in index), dtype=np.int64)
+        # Check every label file before moving any, so a stale index cannot leave the split half done.
+        present = np.array([os.path.exists(os.path.join(label, frame + ".txt")) for frame in index.frames[rows]],
+                           dtype=bool)
+        if not present.all():
+            print(f"Warning: label index {index_file} is stale; {int((~present).sum())} listed frames have "
+                  f"no label file in {label} and only their lidar is moved. Rebuild it with gen_label_index.py.")
+        for frame in index.frames[rows[present]].tolist() + unindexed:
+            if os.path.exists(os.path.join(label, frame + ".txt")):
+                os.rename(os.path.join(label, frame + ".txt"), os.path.join(output_label, frame + ".txt"))
+        for frame in sorted(file_names):
+            if os.path.exists(os.path.join(lidar, frame + ".bin")):
+                os.rename(os.path.join(lidar, frame + ".bin"), os.path.join(output_lidar, frame + ".bin"))
+        if output_index_file:
+            index.select(rows[present]).save(output_index_file)
+        # Frames without a label file are dropped from the index as well.
+        index.select(np.setdiff1d(np.arange(len(index)), rows)).save(index_file)
+        return
     for li in os.listdir(lidar):
         if li[:-4] in file_names:
             os.rename(os.path.join(lidar, li), os.path.join(output_lidar, li))
@@ -32,4 +68,4 @@ def split(list_file, lidar, label, output_lidar, output_label):
 
 
 if __name__ == "__main__":
-    split(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5])
+    split(*sys.argv[1:8])
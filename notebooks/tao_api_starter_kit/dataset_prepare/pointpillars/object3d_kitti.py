@@ -13,8 +13,20 @@
 # limitations under the License.
 
 """3D object KITTI utils."""
+import os
+import sys
+
 import numpy as np
 
+from box3d_kitti import boxes3d_camera_to_corners3d
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.kitti_label import parse_kitti_label_files  # noqa: E402
+
+TYPE_TO_ID = {'Car': 1, 'Pedestrian': 2, 'Cyclist': 3, 'Van': 4}
+LEVEL_STRS = ('Easy', 'Moderate', 'Hard', 'UnKnown')  # indexed by level, -1 is UnKnown
+KITTI_FORMAT = '%s %.2f %d %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f'
+
 
 def get_objects_from_label(label_file):
     """Get objects from label."""
@@ -26,10 +38,9 @@ def get_objects_from_label(label_file):
 
 def cls_type_to_id(cls_type):
     """Convert class type to ID."""
-    type_to_id = {'Car': 1, 'Pedestrian': 2, 'Cyclist': 3, 'Van': 4}
-    if cls_type not in type_to_id.keys():
+    if cls_type not in TYPE_TO_ID.keys():
         return -1
-    return type_to_id[cls_type]
+    return TYPE_TO_ID[cls_type]
 
 
 class Object3d(object):
@@ -55,6 +66,29 @@ class Object3d(object):
         self.level_str = None
         self.level = self.get_kitti_obj_level()
 
+    @classmethod
+    def from_batch(cls, batch, idx):
+        """Return row idx of an Object3dBatch as an Object3d.
+
+        box2d and loc are views into the batch arrays; the other fields are copies.
+        """
+        obj = cls.__new__(cls)
+        obj.src = None
+        obj.cls_type = batch.class_names[batch.class_codes[idx]]
+        obj.cls_id = int(batch.cls_id[idx])
+        obj.truncation = float(batch.truncation[idx])
+        obj.occlusion = float(batch.occlusion[idx])
+        obj.alpha = float(batch.alpha[idx])
+        obj.box2d = batch.box2d[idx]
+        obj.h, obj.w, obj.l = batch.hwl[idx].tolist()
+        obj.loc = batch.loc[idx]
+        obj.dis_to_cam = batch.dis_to_cam[idx]
+        obj.ry = float(batch.ry[idx])
+        obj.score = float(batch.score[idx])
+        obj.level = int(batch.level[idx])
+        obj.level_str = LEVEL_STRS[obj.level]
+        return obj
+
     def get_kitti_obj_level(self):
         """Get KITTI object difficult level."""
         height = float(self.box2d[3]) - float(self.box2d[1]) + 1
@@ -97,7 +131,124 @@ class Object3d(object):
 
     def to_kitti_format(self):
         """Convert to KITTI format."""
-        kitti_str = '%s %.2f %d %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f %.2f' \
+        kitti_str = KITTI_FORMAT \
             % (self.cls_type, self.truncation, int(self.occlusion), self.alpha, self.box2d[0], self.box2d[1],
                self.box2d[2], self.box2d[3], self.h, self.w, self.l, self.loc[0], self.loc[1], self.loc[2], self.ry)
         return kitti_str
+
+
+class Object3dBatch(object):
+    """KITTI objects in columnar arrays, one row per object.
+
+    cls_id, dis_to_cam and the difficulty level of all objects are computed
+    at once on construction. box2d, loc and dis_to_cam are float32 as in
+    Object3d; the fields Object3d keeps as Python floats are float64, so the
+    values, levels and to_kitti_format output are the same as Object3d's.
+    Indexing with an integer returns an Object3d view of the row.
+    """
+
+    def __init__(self, class_codes, class_names, truncation, occlusion, alpha, box2d, hwl, loc, ry, score=None):
+        """Initialize.
+
+        Args:
+            class_codes (np.ndarray): (N,) int index into class_names of every object.
+            class_names (list): Class name of every class code.
+            truncation, occlusion, alpha, ry, score (np.ndarray): (N,) values; score defaults to -1.
+            box2d (np.ndarray): (N, 4) x1, y1, x2, y2.
+            hwl (np.ndarray): (N, 3) height, width, length.
+            loc (np.ndarray): (N, 3) bottom center in camera coordinates.
+        """
+        self.class_codes = np.ascontiguousarray(class_codes, dtype=np.int32)
+        self.class_names = list(class_names)
+        self.truncation = np.ascontiguousarray(truncation, dtype=np.float64)
+        self.occlusion = np.ascontiguousarray(occlusion, dtype=np.float64)
+        self.alpha = np.ascontiguousarray(alpha, dtype=np.float64)
+        self.box2d = np.ascontiguousarray(box2d, dtype=np.float32).reshape(-1, 4)
+        self.hwl = np.ascontiguousarray(hwl, dtype=np.float64).reshape(-1, 3)
+        self.loc = np.ascontiguousarray(loc, dtype=np.float32).reshape(-1, 3)
+        self.ry = np.ascontiguousarray(ry, dtype=np.float64)
+        self.score = np.full(len(self.ry), -1.0) if score is None else np.ascontiguousarray(score, dtype=np.float64)
+
+        class_ids = np.array([TYPE_TO_ID.get(name, -1) for name in self.class_names], dtype=np.int32)
+        self.cls_id = class_ids[self.class_codes]
+        # float32 squares summed in float64, as the dot product behind np.linalg.norm of one row.
+        self.dis_to_cam = np.sqrt(np.square(self.loc).astype(np.float64).sum(axis=1).astype(np.float32))
+        self.level = self.get_kitti_obj_level()
+
+    @classmethod
+    def from_kitti_labels(cls, labels):
+        """Build a batch from the objects of a common.kitti_label.KittiLabels."""
+        objects = labels.objects
+        return cls(objects['class_code'], labels.class_names, objects['truncation'], objects['occlusion'],
+                   objects['alpha'], objects['bbox'], objects['dimensions'], objects['location'],
+                   objects['rotation_y'], objects['score'])
+
+    @classmethod
+    def from_label_files(cls, label_files):
+        """Parse label files in bulk into one batch.
+
+        Returns:
+            tuple: (Object3dBatch, (len(label_files) + 1,) offsets; the objects of
+            label_files[i] are rows offsets[i]:offsets[i + 1]).
+        """
+        labels = parse_kitti_label_files(label_files)
+        return cls.from_kitti_labels(labels), labels.offsets
+
+    @classmethod
+    def from_label_file(cls, label_file):
+        """Parse one label file into a batch."""
+        return cls.from_label_files([label_file])[0]
+
+    def __len__(self):
+        return len(self.class_codes)
+
+    def __getitem__(self, idx):
+        return Object3d.from_batch(self, idx)
+
+    def __iter__(self):
+        return (self[idx] for idx in range(len(self)))
+
+    @property
+    def cls_type(self):
+        """Class name of every object."""
+        return [self.class_names[code] for code in self.class_codes.tolist()]
+
+    @property
+    def level_str(self):
+        """Difficulty level name of every object."""
+        return [LEVEL_STRS[level] for level in self.level.tolist()]
+
+    def get_kitti_obj_level(self):
+        """Get KITTI object difficult levels: 0 Easy, 1 Moderate, 2 Hard, -1 UnKnown."""
+        height = self.box2d[:, 3].astype(np.float64) - self.box2d[:, 1].astype(np.float64) + 1
+        easy = (height >= 40) & (self.truncation <= 0.15) & (self.occlusion <= 0)
+        moderate = (height >= 25) & (self.truncation <= 0.3) & (self.occlusion <= 1)
+        hard = (height >= 25) & (self.truncation <= 0.5) & (self.occlusion <= 2)
+        return np.select([easy, moderate, hard], [0, 1, 2], -1).astype(np.int8)
+
+    def select(self, rows):
+        """Return the batch of the objects selected by an index array or boolean mask."""
+        return Object3dBatch(self.class_codes[rows], self.class_names, self.truncation[rows], self.occlusion[rows],
+                             self.alpha[rows], self.box2d[rows], self.hwl[rows], self.loc[rows], self.ry[rows],
+                             self.score[rows])
+
+    def boxes3d_camera(self):
+        """Return the (N, 7) [x, y, z, l, h, w, ry] camera boxes, see box3d_kitti."""
+        return np.concatenate([self.loc.astype(np.float64), self.hwl[:, [2, 0, 1]], self.ry[:, None]], axis=1)
+
+    def generate_corners3d(self):
+        """Return the (N, 8, 3) corners of all objects in camera coordinates, as Object3d.generate_corners3d."""
+        return boxes3d_camera_to_corners3d(self.boxes3d_camera())
+
+    def to_kitti_format(self):
+        """Convert every object to a KITTI label line, as Object3d.to_kitti_format."""
+        rows = zip(self.cls_type, self.truncation.tolist(), self.occlusion.astype(int).tolist(), self.alpha.tolist(),
+                   self.box2d.tolist(), self.hwl.tolist(), self.loc.tolist(), self.ry.tolist())
+        return [KITTI_FORMAT % (cls_type, truncation, occlusion, alpha, x1, y1, x2, y2, h, w, l, x, y, z, ry)
+                for cls_type, truncation, occlusion, alpha, (x1, y1, x2, y2), (h, w, l), (x, y, z), ry in rows]  # noqa: E741
+
+    def write_kitti(self, label_file):
+        """Write the objects as a KITTI label file in one call; an empty batch writes an empty file."""
+        lines = self.to_kitti_format()
+        with open(label_file, 'w') as f:
+            f.write(''.join(line + '\n' for line in lines))
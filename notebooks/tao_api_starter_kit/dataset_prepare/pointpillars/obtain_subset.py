@@ -15,12 +15,23 @@
 """Obtain subset of pointpillars data"""
 import argparse
 import os
+import shutil
+import sys
 from tqdm import tqdm
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.frame_shards import DEFAULT_FRAMES_PER_SHARD, export_frame_shards, list_frame_files  # noqa: E402
+from common.kitti_index import KittiLabelIndex  # noqa: E402
+
 """
 Usage:
 python obtain_subset.py --source-data-dir=/home/user/data/training --out-data-dir=/home/user/subset_data/training/ --training True --num-images=100
 python obtain_subset.py --source-data-dir=/home/user/data/testing --out-data-dir=/home/user/subset_data/testing/ --num-images=100
+python obtain_subset.py --source-data-dir=/home/user/data/training --out-data-dir=/home/user/subset_data/training/ \
+    --training True --num-images=100 --label-index=/home/user/data/training/label_2_index.npz \
+    --classes=Pedestrian,Cyclist
+python obtain_subset.py --source-data-dir=/home/user/data/training --shard-dir=/home/user/subset_shards/training/ \
+    --training True --num-images=100
 """
 
 def main():
@@ -29,7 +40,17 @@ def main():
     parser.add_argument("--out-data-dir", type=str)
     parser.add_argument("--training", type=bool, default=False)
     parser.add_argument("--num-images", type=int)
+    parser.add_argument("--label-index", type=str, default=None,
+                        help="Label index built by gen_label_index.py, used to select frames without listing image_2")
+    parser.add_argument("--classes", type=str, default=None,
+                        help="Comma separated classes the frames of the subset are spread over; needs --label-index")
+    parser.add_argument("--shard-dir", type=str, default=None,
+                        help="Pack the subset into frame shards in this directory instead of copying to "
+                             "--out-data-dir; restore it with extract_frame_shards.py")
+    parser.add_argument("--frames-per-shard", type=int, default=DEFAULT_FRAMES_PER_SHARD)
     args = parser.parse_args()
+    if args.classes and not args.label_index:
+        parser.error("--classes needs --label-index")
     
     source_data_dir = args.source_data_dir
     out_data_dir = args.out_data_dir
@@ -51,36 +72,34 @@ def main():
         print("Download and extract kitti velodyne")
         exit()
 
-    if not os.path.exists(out_data_dir):
-        os.makedirs(out_data_dir)
-
-    if not os.path.exists(os.path.join(out_data_dir,"calib")):
-        os.makedirs(os.path.join(out_data_dir,"calib"))
-    if not os.path.exists(os.path.join(out_data_dir,"image_2")):
-        os.makedirs(os.path.join(out_data_dir,"image_2"))
-    if training_flag:
-      if not os.path.exists(os.path.join(out_data_dir,"label_2")):
-          os.makedirs(os.path.join(out_data_dir,"label_2"))
-    if not os.path.exists(os.path.join(out_data_dir,"velodyne")):
-        os.makedirs(os.path.join(out_data_dir,"velodyne"))
-
-    all_ids = os.listdir(os.path.join(source_data_dir,"image_2"))
+    subdirs = ["calib", "image_2"] + (["label_2"] if training_flag else []) + ["velodyne"]
+    if not args.shard_dir:
+        for subdir in subdirs:
+            os.makedirs(os.path.join(out_data_dir, subdir), exist_ok=True)
 
-    selected_ids = all_ids[:num_images]
-    selected_ids = [id.replace('.png', '') for id in selected_ids]
+    if args.label_index:
+        classes = args.classes.split(',') if args.classes else None
+        selected_ids = KittiLabelIndex.load(args.label_index).select_subset(num_images, classes)
+    else:
+        all_ids = os.listdir(os.path.join(source_data_dir,"image_2"))
+        selected_ids = all_ids[:num_images]
+        selected_ids = [id.replace('.png', '') for id in selected_ids]
 
     print(selected_ids)
 
+    if args.shard_dir:
+        num_shards = export_frame_shards(source_data_dir, selected_ids, args.shard_dir, args.frames_per_shard, subdirs)
+        print(f"Packed {len(selected_ids)} frames into {num_shards} shards in {args.shard_dir}")
+        return
+
+    # Every subdir is listed once and files are copied by exact name.
+    files = list_frame_files(source_data_dir, subdirs)
     for id in tqdm(selected_ids):
-        calib = source_data_dir + "/calib/" + str(id) + "*"
-        os.system("cp " + calib + " " + out_data_dir + "/calib/")
-        image = source_data_dir + "/image_2/" + str(id) + "*"
-        os.system("cp " + image + " " + out_data_dir + "/image_2/")
-        if training_flag:
-          label = source_data_dir + "/label_2/" + str(id) + "*"
-          os.system("cp " + label + " " + out_data_dir + "/label_2/")
-        velodyne = source_data_dir + "/velodyne/" + str(id) + "*"
-        os.system("cp " + velodyne + " " + out_data_dir + "/velodyne/")
+        for subdir in subdirs:
+            if id in files[subdir]:
+                shutil.copyfile(os.path.join(source_data_dir, subdir, files[subdir][id]),
+                                os.path.join(out_data_dir, subdir, files[subdir][id]))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,68 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of CocoIndex boxes on files mixing integer and float boxes."""
+
+import json
+import os
+import sys
+
+import pytest
+
+DATASET_PREPARE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DATASET_PREPARE)
+sys.path.insert(0, os.path.join(DATASET_PREPARE, "coco"))
+from common.coco_index import load_coco_index  # noqa: E402
+from common.coco_index_cache import load_coco_index_cached  # noqa: E402
+from coco_to_odvg import OdvgRecordBuilder  # noqa: E402
+
+DATASET = {
+    "images": [{"id": 1, "file_name": "a.jpg", "height": 100, "width": 120}],
+    "annotations": [
+        {"id": 1, "image_id": 1, "category_id": 3, "bbox": [78, 47, 14, 13], "area": 182, "iscrowd": 0},
+        {"id": 2, "image_id": 1, "category_id": 3, "bbox": [1.5, 2, 3, 4.25], "area": 12.75, "iscrowd": 0},
+        {"id": 3, "image_id": 1, "category_id": 3, "bbox": [5.0, 6.0, 7.0, 8.0], "area": 56.0, "iscrowd": 0},
+    ],
+    "categories": [{"id": 3, "name": "car"}],
+}
+
+
+@pytest.fixture(params=["in_memory", "streaming", "cached"])
+def coco(tmp_path, request):
+    path = tmp_path / "annotations.json"
+    path.write_text(json.dumps(DATASET))
+    if request.param == "cached":
+        return load_coco_index_cached(str(path), str(tmp_path / "cache"))
+    return load_coco_index(str(path), streaming=request.param == "streaming")
+
+
+def assert_same_values(values, expected):
+    assert values == expected
+    assert [type(v) for v in values] == [type(v) for v in expected]
+
+
+def test_ann_dict_keeps_box_types(coco):
+    anns = coco.loadAnns([1, 2, 3])
+    assert_same_values(anns[0]["bbox"], [78, 47, 14, 13])
+    # A box holding any float is returned with floats only.
+    assert_same_values(anns[1]["bbox"], [1.5, 2.0, 3.0, 4.25])
+    assert_same_values(anns[2]["bbox"], [5.0, 6.0, 7.0, 8.0])
+
+
+def test_odvg_keeps_box_types(coco):
+    builder = OdvgRecordBuilder(coco, False, names={3: "car"}, labels=[0, 0, 0])
+    instances = builder.record(0)["detection"]["instances"]
+    assert_same_values(instances[0]["bbox"], [78, 47, 92, 60])
+    assert_same_values(instances[1]["bbox"], [1.5, 2.0, 4.5, 6.25])
+    assert_same_values(instances[2]["bbox"], [5.0, 6.0, 12.0, 14.0])
@@ -0,0 +1,52 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the streaming JSON reader at chunk sizes that split values."""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.json_stream import iter_json_array, iter_json_events  # noqa: E402
+
+DOCUMENT = {
+    "a": [12.5, 3.25, 1e5, 7, -0.5e-3, 1E+2, 0, -12, 123456789.125],
+    "images": [{"id": 1, "bbox": [1, 2.5, 30, 4e1]}, {"id": 22, "bbox": []}],
+    "b": -1.5,
+    "c": 42,
+}
+
+
+@pytest.fixture(params=[" ", "\n  "], ids=["compact", "spaced"])
+def json_path(tmp_path, request):
+    path = tmp_path / "numbers.json"
+    path.write_text(json.dumps(DOCUMENT).replace(" ", request.param))
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 5, 7, 11])
+def test_numeric_arrays_split_across_chunks(json_path, chunk_size):
+    members = {}
+    for key, event, value in iter_json_events(json_path, chunk_size=chunk_size):
+        if event == "start_array":
+            members[key] = []
+        elif event == "item":
+            members[key].append(value)
+        elif event == "value":
+            members[key] = value
+    assert members == DOCUMENT
+    assert list(iter_json_array(json_path, "a", chunk_size=chunk_size)) == DOCUMENT["a"]
@@ -0,0 +1,82 @@
+# Copyright (c) 2025, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Round-trip tests of the COCO to Parquet export and import."""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from coco.coco_to_parquet import convert_coco_to_parquet  # noqa: E402
+from coco.parquet_to_coco import convert_parquet_to_coco, load_coco_index_parquet, load_parquet_dataset  # noqa: E402
+
+DATASET = {
+    "info": {"description": "round trip", "year": 2025},
+    "licenses": [{"id": 1, "name": "CC BY 4.0", "url": ""}],
+    "images": [
+        {"id": 1, "file_name": "a.jpg", "height": 100, "width": 120, "license": 1},
+        {"id": 2, "file_name": "b.jpg", "caption": "a car on a road"},
+    ],
+    "annotations": [
+        {"id": 1, "image_id": 1, "category_id": 3, "bbox": [78, 47, 14, 13], "area": 182.0, "iscrowd": 0,
+         "segmentation": [[78, 47, 92, 47, 92, 60]]},
+        {"id": 2, "image_id": 1, "category_id": 3, "bbox": [1.5, 2.0, 3.0, 4.25], "iscrowd": 1},
+        {"id": 3, "image_id": 2, "bbox": [5.0, 6.0, 7.0, 8.0], "area": 56.0, "tokens_positive": [[2, 5]],
+         "score": 0.5},
+        {"id": 4, "image_id": 2, "category_id": 1},
+    ],
+    "categories": [{"id": 1, "name": "road"}, {"id": 3, "name": "car", "supercategory": "vehicle"}],
+}
+
+
+def assert_same(value, expected):
+    """Compare JSON values, including int against float types."""
+    assert type(value) is type(expected)
+    if isinstance(expected, dict):
+        assert value.keys() == expected.keys()
+        for key in expected:
+            assert_same(value[key], expected[key])
+    elif isinstance(expected, list):
+        assert len(value) == len(expected)
+        for item, expected_item in zip(value, expected):
+            assert_same(item, expected_item)
+    else:
+        assert value == expected
+
+
+@pytest.fixture(params=[False, True], ids=["in_memory", "streaming"])
+def parquet_dir(tmp_path, request):
+    path = tmp_path / "instances.json"
+    path.write_text(json.dumps(DATASET))
+    return convert_coco_to_parquet(str(path), str(tmp_path), streaming=request.param)
+
+
+def test_load_parquet_dataset_round_trip(parquet_dir):
+    assert_same(load_parquet_dataset(parquet_dir), DATASET)
+
+
+def test_parquet_to_coco_round_trip(parquet_dir, tmp_path):
+    output_path = str(tmp_path / "out" / "instances.json")
+    convert_parquet_to_coco(parquet_dir, output_path)
+    with open(output_path, "r", encoding="utf-8") as f:
+        assert_same(json.load(f), DATASET)
+
+
+def test_parquet_index_keeps_integer_boxes(parquet_dir):
+    coco = load_coco_index_parquet(parquet_dir)
+    assert_same(coco.loadAnns([1, 2])[0]["bbox"], [78, 47, 14, 13])
+    assert coco.metadata == {"info": DATASET["info"], "licenses": DATASET["licenses"]}
@@ -37,19 +37,21 @@ def generate_lidar_labels(label_dir, calib_dir, output_dir):
     for lab in os.listdir(label_dir):
         lab_file = os.path.join(label_dir, lab)
         obj_list = get_objects_from_label(lab_file)
-        calib_file = os.path.join(calib_dir, lab)
-        calib = Calibration(calib_file)
-        loc = np.concatenate([obj.loc.reshape(1, 3) for obj in obj_list], axis=0)
-        loc_lidar = calib.rect_to_lidar(loc)
-        # update obj3d.loc
-        with open(os.path.join(output_dir, lab), "w") as lf:
-            for idx, lc in enumerate(loc_lidar):
+        lines = []
+        # A frame without objects gives an empty label file.
+        if obj_list:
+            calib_file = os.path.join(calib_dir, lab)
+            calib = Calibration(calib_file)
+            loc = np.concatenate([obj.loc.reshape(1, 3) for obj in obj_list], axis=0)
+            loc_lidar = calib.rect_to_lidar(loc)
+            for obj, lc in zip(obj_list, loc_lidar):
                 # bottom center to 3D center
-                obj_list[idx].loc = (lc + np.array([0., 0., obj_list[idx].h / 2.]))
+                obj.loc = lc + np.array([0., 0., obj.h / 2.])
                 # rotation_y to rotation_z
-                obj_list[idx].ry = -np.pi / 2. - obj_list[idx].ry
-                lf.write(obj_list[idx].to_kitti_format())
-                lf.write('\n')
+                obj.ry = -np.pi / 2. - obj.ry
+                lines.append(obj.to_kitti_format() + '\n')
+        with open(os.path.join(output_dir, lab), "w") as lf:
+            lf.write(''.join(lines))
 
 
 if __name__ == "__main__":
@@ -1,21 +1,59 @@
 """
 Convert the 2d object detection labels from 200-class format to binary class format
 """
-import json, os
+import json, os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.json_stream import JsonStreamReader  # noqa: E402
+
+
+def convert_to_binary(input_label_file, output_label_file):
+    """Stream the annotation file member by member and array element by element.
+
+    The output is identical to loading the file, replacing the categories and
+    the category ids, and dumping it with json.dump.
+    """
+    binary_categories = [{'id': 1, 'name': 'retail object'}]
+    with open(input_label_file) as f_in, open(output_label_file, 'w') as f_out:
+        stream = JsonStreamReader(f_in, 1 << 20)
+        stream.expect("{")
+        f_out.write("{")
+        has_categories = False
+        num_members = 0
+        while stream.peek() != "}":
+            key = stream.value()
+            stream.expect(":")
+            f_out.write((", " if num_members else "") + json.dumps(key) + ": ")
+            num_members += 1
+            if key == 'categories':
+                stream.value()
+                f_out.write(json.dumps(binary_categories))
+                has_categories = True
+            elif stream.skip("["):
+                f_out.write("[")
+                num_items = 0
+                while stream.peek() != "]":
+                    item = stream.value()
+                    if key == 'annotations':
+                        item['category_id'] = 1
+                    f_out.write((", " if num_items else "") + json.dumps(item))
+                    num_items += 1
+                    stream.skip(",")
+                stream.expect("]")
+                f_out.write("]")
+            else:
+                f_out.write(json.dumps(stream.value()))
+            stream.skip(",")
+        if not has_categories:
+            f_out.write((", " if num_members else "") + '"categories": ' + json.dumps(binary_categories))
+        f_out.write("}")
+
 
 for dataset in ["train", "val", "test"]:
     print(f"Processing {dataset} dataset")
     input_label_file=os.path.join(os.getenv('HOST_DATA_DIR'),'retail_object_detection',f'instances_{dataset}2019.json')
     output_label_file=os.path.join(os.getenv('HOST_DATA_DIR'),'retail_object_detection',f'binary_{dataset}2019.json')
 
-    with open(input_label_file) as f:
-        data = json.load(f)
-
-    data['categories'] = [{'id': 1, 'name': 'retail object'}]
-    for ann in data['annotations']:
-        ann['category_id'] = 1
-
-    with open(output_label_file, 'w') as f:
-        json.dump(data, f)
+    convert_to_binary(input_label_file, output_label_file)
 
-print("Done!")
\ No newline at end of file
+print("Done!")
@@ -3,14 +3,32 @@ Converts Retail Product Checkout (https://www.kaggle.com/datasets/diyer22/retail
 """
 
 
-import os, zipfile
+import os, sys, zipfile
 import glob
 import cv2
-from pycocotools.coco import COCO
 from tqdm import tqdm
 import numpy as np
 import shutil
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.json_stream import iter_json_events  # noqa: E402
+
+
+def load_checkout_annotations(annotation_file):
+    """Stream a COCO file into its images, its categories by id and the (bbox, category id) of every image id."""
+    images, categories, image_anns = [], {}, {}
+    for key, event, value in iter_json_events(annotation_file, {"images", "annotations", "categories"}):
+        if event != "item":
+            continue
+        if key == "images":
+            images.append({"id": value["id"], "file_name": value["file_name"]})
+        elif key == "annotations":
+            image_anns.setdefault(value["image_id"], []).append((value["bbox"], value["category_id"]))
+        else:
+            categories[value["id"]] = value
+    return images, categories, image_anns
+
+
 def create_task_sets(dataset_dir, output_dir):
     # each class has 120 images in train set
     os.makedirs(output_dir, exist_ok=True)
@@ -117,22 +135,18 @@ for dataset in ["train"]:
         os.makedirs(output_dir)
     ## load coco dataset
     print(f"Loading COCO {dataset} dataset...")
-    coco_label = COCO(annotation_file)
+    images, categories, image_anns = load_checkout_annotations(annotation_file)
 
     # crop images to classification data
     print(f"Cropping {dataset} dataset...")
-    for img_object in tqdm(coco_label.dataset["images"]):
+    for img_object in tqdm(images):
         image_path = os.path.join(dataset_dir, img_object["file_name"])
         
         # remove top view images
         if "camera2" in image_path:
             continue
-        image_id = img_object["id"]
-        annotation_ids = coco_label.getAnnIds(imgIds=image_id)
-        for annot in coco_label.loadAnns(annotation_ids):
-            bbox = annot["bbox"]
-            class_id = annot["category_id"]
-            category = coco_label.loadCats(class_id)[0]
+        for bbox, class_id in image_anns.get(img_object["id"], []):
+            category = categories[class_id]
             class_name = category["supercategory"] + "_" + category["name"]
             crop_images(image_path, bbox, class_name, output_dir)
 